@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Startup guard for mock/synthetic runs.
+
+Imports src.run_loop in a fresh interpreter, builds the provider stack and loads the
+synthetic splits the way `python -m src.run_loop --mode baseline` does, then fails if
+any heavy dependency (provider SDKs, datasets/pandas/pyarrow, numpy, tiktoken) got
+imported or startup exceeds the time budget.
+
+    python scripts/check_startup.py --max-seconds 1.0
+"""
+
+import argparse
+import json
+import pathlib
+import subprocess
+import sys
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ["openai", "anthropic", "datasets", "pandas", "pyarrow", "numpy", "tiktoken", "torch"]
+
+PROBE = r"""
+import sys, time, json, yaml
+t0 = time.perf_counter()
+from src.run_loop import make_provider, load_split
+cfg = yaml.safe_load(open({config!r}))
+cfg["model"]["provider"] = "mock"
+cfg["dataset"]["name"] = "synthetic"
+cfg.setdefault("cache", {{}})["enabled"] = False
+provider = make_provider(cfg)
+for split in ("train", "dev", "test"):
+    load_split(cfg, split)
+elapsed = time.perf_counter() - t0
+print(json.dumps({{"elapsed_sec": elapsed, "modules": sorted({{m.split(".")[0] for m in sys.modules}})}}))
+"""
+
+
+def probe(config: str) -> tuple[dict, str]:
+    """Run the startup path once in a fresh interpreter; returns its report and the -X importtime log."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE.format(config=config)],
+                          cwd=REPO_ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        sys.exit(f"startup probe failed (exit {proc.returncode})")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def slowest_imports(importtime_log: str, top: int) -> list[tuple[int, str]]:
+    """(cumulative microseconds, module) for the costliest imports made by the probe or its direct imports."""
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, raw_name = line[len("import time:"):].split("|")
+        depth = (len(raw_name) - len(raw_name.lstrip()) - 1) // 2
+        if depth <= 1:
+            rows.append((int(cumulative), raw_name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Guard startup time and heavy imports for mock/synthetic runs")
+    ap.add_argument("--config", type=str, default="configs/config.yaml")
+    ap.add_argument("--max-seconds", type=float, default=1.0, help="budget for imports + provider + synthetic data")
+    ap.add_argument("--repeat", type=int, default=3, help="best of N fresh interpreters")
+    ap.add_argument("--top", type=int, default=10, help="slowest top-level imports to report")
+    args = ap.parse_args()
+
+    reports = [probe(args.config) for _ in range(max(1, args.repeat))]
+    best, log = min(reports, key=lambda r: r[0]["elapsed_sec"])
+    heavy = [m for m in HEAVY_MODULES if m in best["modules"]]
+
+    print(f"Startup (best of {len(reports)}): {best['elapsed_sec']:.3f}s (budget {args.max_seconds:.3f}s)")
+    print("Slowest top-level imports:")
+    for micros, name in slowest_imports(log, args.top):
+        print(f"  {micros / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if heavy:
+        print(f"❌ Heavy modules imported for a mock/synthetic run: {', '.join(heavy)}")
+        failed = True
+    if best["elapsed_sec"] > args.max_seconds:
+        print("❌ Startup exceeded budget")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("✅ Startup OK")
+
+
+if __name__ == "__main__":
+    main()
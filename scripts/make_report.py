@@ -87,23 +87,28 @@ def calculate_cost_metrics(df: pd.DataFrame, runs_dir: pathlib.Path):
     return df
 
 def plot_pareto(runs_dir: pathlib.Path, out_path: pathlib.Path):
-    # Find latest GEPA run; look for round1/variants.json
+    # Find latest GEPA run; plot its candidate pool (all rounds), else round1/variants.json
     gepa_runs = sorted([p for p in runs_dir.iterdir() if p.name.endswith("_gepa")], reverse=True)
     if not gepa_runs:
         return
     latest = gepa_runs[0]
+    pool_path = latest / "pool.json"
     var_path = latest / "round1" / "variants.json"
-    if not var_path.exists():
+    if pool_path.exists():
+        df = pd.DataFrame(json.loads(pool_path.read_text())["candidates"])
+    elif var_path.exists():
+        df = pd.DataFrame(json.loads(var_path.read_text())["variants"])
+    else:
+        return
+    if df.empty:
         return
-    j = json.loads(var_path.read_text())
-    df = pd.DataFrame(j["variants"])
     fig = plt.figure()
     plt.scatter(df["avg_tokens_out"], df["accuracy"])
     for _, r in df.iterrows():
         plt.text(r["avg_tokens_out"], r["accuracy"], r["name"])
     plt.xlabel("Avg output tokens (dev)")
     plt.ylabel("Accuracy (dev)")
-    plt.title("Variant Pareto Scatter (GEPA round 1)")
+    plt.title("Variant Pareto Scatter (GEPA)")
     fig.savefig(out_path)
 
 def main():
@@ -2,12 +2,23 @@
 """
 Comprehensive Evaluation Script for All 6 Datasets
 Runs baseline, self-refine, and GEPA modes across all datasets
+
+All dataset x mode jobs run concurrently in this process (src.matrix): they share one
+provider stack (rate limits, retries, cache), identical calls are made once (the last
+evaluation.shared_memo_size outputs are remembered for the run), and the consolidated
+summary lands in <runs_dir>/<timestamp>_matrix/matrix.json.
 """
 
+import sys
 import subprocess
 import time
 import pathlib
+import yaml
 from datetime import datetime
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from src.matrix import run_matrix, print_matrix
 
 # Configuration for each dataset
 DATASETS = [
@@ -100,66 +111,30 @@ def main():
     print(f"🎯 Total datasets: {len(DATASETS)}")
     print(f"🔧 Total modes: {len(MODES)}")
     print(f"📊 Total evaluations: {len(DATASETS) * len(MODES)}")
+    load_dotenv()
     
-    results = {}
+    config = yaml.safe_load(open("configs/config.yaml"))
     
+    # Step 1: Run the whole dataset x mode matrix concurrently; each dataset is loaded
+    # once, with its own split sizes
+    datasets = {d["name"]: {"n_train": d["n_train"], "n_dev": d["n_dev"], "n_test": d["n_test"]} for d in DATASETS}
+    start_time = time.time()
+    jobs = run_matrix(config, datasets, MODES)
+    print(f"⏱️  Matrix time: {time.time() - start_time:.2f}s")
+    matrix_dir = jobs[0].run_dir.parent.parent
+    
+    # Step 2: Generate a report per dataset from exactly the runs this matrix produced
     for dataset in DATASETS:
         dataset_name = dataset["name"]
-        print(f"\n{'#'*80}")
-        print(f"📚 Processing Dataset: {dataset_name}")
-        print(f"📝 Description: {dataset['description']}")
-        print(f"{'#'*80}")
-        
-        results[dataset_name] = {}
-        
-        # Step 1: Setup data
-        setup_cmd = f"python scripts/setup_data.py --dataset {dataset_name} --n_train {dataset['n_train']} --n_dev {dataset['n_dev']} --n_test {dataset['n_test']}"
-        success, output = run_command(setup_cmd, f"Setup data for {dataset_name}")
-        
-        if not success:
-            print(f"⚠️  Skipping {dataset_name} due to setup failure")
-            continue
-        
-        # Step 2: Run all modes
-        for mode in MODES:
-            print(f"\n🔄 Running {mode.upper()} mode for {dataset_name}")
-            
-            # Update config to use the dataset
-            config_update_cmd = f"sed -i '' 's/name: .*/name: {dataset_name}/' configs/config.yaml"
-            run_command(config_update_cmd, f"Update config for {dataset_name}")
-            
-            # Run evaluation
-            eval_cmd = f"python -m src.run_loop --config configs/config.yaml --mode {mode}"
-            success, output = run_command(eval_cmd, f"{mode.upper()} evaluation for {dataset_name}")
-            
-            if success:
-                results[dataset_name][mode] = "SUCCESS"
-                print(f"✅ {mode.upper()} completed for {dataset_name}")
-            else:
-                results[dataset_name][mode] = "FAILED"
-                print(f"❌ {mode.upper()} failed for {dataset_name}")
-        
-        # Step 3: Generate report for this dataset
-        report_cmd = f"python scripts/make_report.py --runs_dir runs --out report/{dataset_name}_results.md"
+        report_cmd = f"python scripts/make_report.py --runs_dir {matrix_dir / dataset_name} --out report/{dataset_name}_results.md"
         run_command(report_cmd, f"Generate report for {dataset_name}")
     
-    # Step 4: Generate comprehensive report
-    print(f"\n{'#'*80}")
-    print("📊 Generating Comprehensive Report")
-    print(f"{'#'*80}")
-    
-    comprehensive_report_cmd = "python scripts/make_report.py --runs_dir runs --out report/comprehensive_evaluation.md"
-    run_command(comprehensive_report_cmd, "Generate comprehensive evaluation report")
-    
-    # Step 5: Print summary
+    # Step 3: Print summary
     print(f"\n{'#'*80}")
     print("📋 EVALUATION SUMMARY")
     print(f"{'#'*80}")
-    
-    for dataset_name, modes in results.items():
-        print(f"\n📚 {dataset_name.upper()}:")
-        for mode, status in modes.items():
-            print(f"  {mode:12}: {status}")
+    print_matrix(jobs)
+    print(f"\n📊 Consolidated summary: {matrix_dir / 'matrix.json'}")
     
     print(f"\n🎉 Comprehensive evaluation completed!")
     print(f"📅 Finished at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -4,126 +4,44 @@ Multi-Dataset Threshold Experiment Script
 Runs threshold experiments across multiple datasets to find optimal thresholds for each
 """
 
-import subprocess
+import sys
 import time
 import pathlib
 import yaml
 import json
 from datetime import datetime
 from typing import List, Dict, Any
+from dotenv import load_dotenv
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+from src.sweep import SweepRun, sweep, thresholds_for
 
 def load_config(config_path: str) -> Dict[str, Any]:
     """Load configuration from YAML file"""
     with open(config_path, 'r') as f:
         return yaml.safe_load(f)
 
-def run_command(cmd: str, description: str) -> tuple[bool, str]:
-    """Run a command and handle errors gracefully"""
-    print(f"\n{'='*60}")
-    print(f"Running: {description}")
-    print(f"Command: {cmd}")
-    print(f"{'='*60}")
-    
-    try:
-        start_time = time.time()
-        result = subprocess.run(cmd, shell=True, check=True, capture_output=True, text=True)
-        end_time = time.time()
-        
-        print(f"✅ SUCCESS: {description}")
-        print(f"⏱️  Time: {end_time - start_time:.2f}s")
-        if result.stdout:
-            print(f"Output: {result.stdout.strip()}")
-        
-        return True, result.stdout
-        
-    except subprocess.CalledProcessError as e:
-        print(f"❌ FAILED: {description}")
-        print(f"Exit code: {e.returncode}")
-        if e.stdout:
-            print(f"Stdout: {e.stdout}")
-        if e.stderr:
-            print(f"Stderr: {e.stderr}")
-        
-        return False, e.stderr
-
-def setup_data_for_dataset(dataset_name: str, n_dev: int, n_test: int) -> bool:
-    """Setup data for a specific dataset"""
-    setup_cmd = f"python scripts/setup_data.py --dataset {dataset_name} --n_train 0 --n_dev {n_dev} --n_test {n_test}"
-    success, _ = run_command(setup_cmd, f"Setup data for {dataset_name}")
-    return success
+def load_records(path: pathlib.Path) -> List[Dict[str, Any]]:
+    """Load a records.jsonl file (empty if the split was not written)"""
+    if not path.exists():
+        return []
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
 
-def run_single_threshold_experiment(config: Dict[str, Any], threshold: float, dataset_name: str) -> Dict[str, Any]:
-    """Run a single threshold experiment for a specific dataset"""
-    print(f"\n🔬 Running threshold experiment: {threshold:.2f} for {dataset_name}")
-    
-    # Create a temporary config with this threshold and dataset
-    temp_config = config.copy()
-    temp_config['thresholds']['current_threshold'] = threshold
-    temp_config['dataset']['name'] = dataset_name
-    
-    # Save temporary config
-    temp_config_path = f"configs/temp_{dataset_name}_threshold_{threshold:.2f}.yaml"
-    with open(temp_config_path, 'w') as f:
-        yaml.dump(temp_config, f, default_flow_style=False)
-    
-    try:
-        # Run hybrid evaluation with this threshold
-        eval_cmd = f"python -m src.run_loop --config {temp_config_path} --mode hybrid"
-        success, output = run_command(eval_cmd, f"Hybrid evaluation with threshold {threshold:.2f} for {dataset_name}")
-        
-        if success:
-            # Extract results from the run
-            runs_dir = pathlib.Path(config['logging']['runs_dir'])
-            run_dirs = [d for d in runs_dir.iterdir() if d.is_dir() and 'hybrid' in d.name]
-            if run_dirs:
-                latest_run = max(run_dirs, key=lambda x: x.stat().st_mtime)
-                
-                # Load summary
-                summary_path = latest_run / "summary.json"
-                if summary_path.exists():
-                    with open(summary_path, 'r') as f:
-                        summary = json.load(f)
-                    
-                    # Load detailed records for analysis
-                    dev_records_path = latest_run / "dev" / "records.jsonl"
-                    test_records_path = latest_run / "test" / "records.jsonl"
-                    
-                    dev_records = []
-                    test_records = []
-                    
-                    if dev_records_path.exists():
-                        with open(dev_records_path, 'r') as f:
-                            dev_records = [json.loads(line) for line in f]
-                    
-                    if test_records_path.exists():
-                        with open(test_records_path, 'r') as f:
-                            test_records = [json.loads(line) for line in f]
-                    
-                    # Calculate override statistics
-                    override_stats = calculate_override_stats(dev_records + test_records)
-                    
-                    return {
-                        "dataset": dataset_name,
-                        "threshold": threshold,
-                        "success": True,
-                        "dev_accuracy": summary.get("dev_accuracy", 0.0),
-                        "test_accuracy": summary.get("test_accuracy", 0.0),
-                        "dev_avg_tokens_out": summary.get("dev_avg_tokens_out", 0.0),
-                        "test_avg_tokens_out": summary.get("test_avg_tokens_out", 0.0),
-                        "override_stats": override_stats,
-                        "run_dir": str(latest_run)
-                    }
-        
-        return {
-            "dataset": dataset_name,
-            "threshold": threshold,
-            "success": False,
-            "error": output
-        }
-        
-    finally:
-        # Clean up temporary config
-        pathlib.Path(temp_config_path).unlink(missing_ok=True)
+def result_from_run(run: SweepRun) -> Dict[str, Any]:
+    """Turn one sweep run (exact run directory and summary) into a report row"""
+    records = load_records(run.run_dir / "dev" / "records.jsonl") + load_records(run.run_dir / "test" / "records.jsonl")
+    return {
+        "dataset": run.dataset,
+        "threshold": run.threshold,
+        "success": True,
+        "dev_accuracy": run.summary.get("dev_accuracy") or 0.0,
+        "test_accuracy": run.summary.get("test_accuracy") or 0.0,
+        "dev_avg_tokens_out": run.summary.get("dev_avg_tokens_out") or 0.0,
+        "test_avg_tokens_out": run.summary.get("test_avg_tokens_out") or 0.0,
+        "override_stats": calculate_override_stats(records),
+        "run_dir": str(run.run_dir)
+    }
 
 def calculate_override_stats(records: List[Dict[str, Any]]) -> Dict[str, Any]:
     """Calculate statistics about GEPA overrides"""
@@ -153,41 +71,33 @@ def calculate_override_stats(records: List[Dict[str, Any]]) -> Dict[str, Any]:
         "gepa_skip_rate": skipped_gepa / total_examples if total_examples > 0 else 0.0
     }
 
-def run_dataset_threshold_sweep(config: Dict[str, Any], dataset_name: str) -> List[Dict[str, Any]]:
-    """Run threshold sweep for a specific dataset"""
-    print(f"\n{'#'*80}")
-    print(f"🔬 THRESHOLD SWEEP FOR {dataset_name.upper()}")
-    print(f"{'#'*80}")
-    
-    # Get thresholds for this dataset
-    if dataset_name in config['thresholds'].get('dataset_specific', {}):
-        thresholds = config['thresholds']['dataset_specific'][dataset_name]
-        print(f"📊 Using dataset-specific thresholds: {thresholds}")
-    else:
-        thresholds = config['thresholds']['confidence_levels']
-        print(f"📊 Using default thresholds: {thresholds}")
+def run_all_threshold_sweeps(config: Dict[str, Any], datasets: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Sweep every dataset's thresholds in one process, datasets in parallel"""
+    plan = {name: thresholds_for(config, name) for name in datasets}
+    for name, thresholds in plan.items():
+        print(f"📊 {name}: thresholds {thresholds}")
     
-    # Setup data
-    n_dev = config['dataset']['n_dev']
-    n_test = config['dataset']['n_test']
+    # One provider stack for all datasets; each dataset is loaded once and its SR and
+    # GEPA review calls are shared across its thresholds
+    start_time = time.time()
+    runs_by_dataset = sweep(config, plan)
+    print(f"⏱️  Sweep time: {time.time() - start_time:.2f}s")
     
-    if not setup_data_for_dataset(dataset_name, n_dev, n_test):
-        print(f"❌ Failed to setup data for {dataset_name}")
-        return []
-    
-    # Run experiments for each threshold
-    results = []
-    for threshold in thresholds:
-        result = run_single_threshold_experiment(config, threshold, dataset_name)
-        results.append(result)
-        
-        if result['success']:
-            print(f"✅ Threshold {threshold:.2f}: Dev={result['dev_accuracy']:.3f}, Test={result['test_accuracy']:.3f}")
+    all_results = {}
+    for dataset_name, runs in runs_by_dataset.items():
+        print(f"\n{'#'*80}")
+        print(f"🔬 THRESHOLD SWEEP FOR {dataset_name.upper()}")
+        print(f"{'#'*80}")
+        if not runs:
+            print(f"❌ Failed threshold sweep for {dataset_name}")
+            continue
+        results = [result_from_run(run) for run in runs]
+        for result in results:
+            print(f"✅ Threshold {result['threshold']:.2f}: Dev={result['dev_accuracy']:.3f}, Test={result['test_accuracy']:.3f}")
             print(f"   Overrides: {result['override_stats']['overrides']}, Success Rate: {result['override_stats']['override_success_rate']:.3f}")
-        else:
-            print(f"❌ Threshold {threshold:.2f}: Failed - {result.get('error', 'Unknown error')}")
-    
-    return results
+            print(f"   Run dir: {result['run_dir']}")
+        all_results[dataset_name] = results
+    return all_results
 
 def generate_comprehensive_report(all_results: Dict[str, List[Dict[str, Any]]], config: Dict[str, Any]) -> str:
     """Generate a comprehensive report for all datasets and thresholds"""
@@ -297,6 +207,7 @@ def main():
     """Main function to run threshold experiments across multiple datasets"""
     print("🚀 Starting Multi-Dataset Threshold Experiments for Hybrid SR → GEPA")
     print(f"📅 Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    load_dotenv()
     
     # Load configuration
     config_path = "configs/threshold_experiments.yaml"
@@ -316,19 +227,8 @@ def main():
     datasets_to_test = list(dataset_thresholds.keys())
     print(f"📚 Testing {len(datasets_to_test)} datasets: {', '.join(datasets_to_test)}")
     
-    # Run experiments for each dataset
-    all_results = {}
-    for dataset_name in datasets_to_test:
-        print(f"\n{'='*80}")
-        print(f"🎯 PROCESSING DATASET: {dataset_name.upper()}")
-        print(f"{'='*80}")
-        
-        results = run_dataset_threshold_sweep(config, dataset_name)
-        if results:
-            all_results[dataset_name] = results
-            print(f"✅ Completed threshold sweep for {dataset_name}")
-        else:
-            print(f"❌ Failed threshold sweep for {dataset_name}")
+    # Run all datasets and thresholds in this process
+    all_results = run_all_threshold_sweeps(config, datasets_to_test)
     
     if all_results:
         # Generate comprehensive report
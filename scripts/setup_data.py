@@ -148,9 +148,7 @@ def main():
 
     elif args.dataset == "gpqa_diamond":
         from data_loader import load_gpqa_diamond
-        items = []
-        for i in range(args.n_dev + args.n_test):
-            items.append(load_gpqa_diamond("test", 1)[0])  # Load one at a time to avoid duplicates
+        items = load_gpqa_diamond("test", args.n_dev + args.n_test)  # one seeded sample, no duplicates
         import random; random.shuffle(items)
         # Convert MCQ objects to dictionaries
         dev = [{"id": item.id, "context": item.context, "question": item.question, "choices": item.choices, "answer": item.answer} for item in items[:args.n_dev]]
@@ -159,9 +157,7 @@ def main():
 
     elif args.dataset == "agieval_lsat_ar":
         from data_loader import load_agieval_lsat_ar
-        items = []
-        for i in range(args.n_dev + args.n_test):
-            items.append(load_agieval_lsat_ar("test", 1)[0])
+        items = load_agieval_lsat_ar("test", args.n_dev + args.n_test)  # one seeded sample, no duplicates
         import random; random.shuffle(items)
         # Convert MCQ objects to dictionaries
         dev = [{"id": item.id, "context": item.context, "question": item.question, "choices": item.choices, "answer": item.answer} for item in items[:args.n_dev]]
@@ -170,9 +166,7 @@ def main():
 
     elif args.dataset == "agieval_lsat_lr":
         from data_loader import load_agieval_lsat_lr
-        items = []
-        for i in range(args.n_dev + args.n_test):
-            items.append(load_agieval_lsat_lr("test", 1)[0])
+        items = load_agieval_lsat_lr("test", args.n_dev + args.n_test)  # one seeded sample, no duplicates
         import random; random.shuffle(items)
         # Convert MCQ objects to dictionaries
         dev = [{"id": item.id, "context": item.context, "question": item.question, "choices": item.choices, "answer": item.answer} for item in items[:args.n_dev]]
@@ -181,9 +175,7 @@ def main():
 
     elif args.dataset == "agieval_sat_math":
         from data_loader import load_agieval_sat_math
-        items = []
-        for i in range(args.n_dev + args.n_test):
-            items.append(load_agieval_sat_math("test", 1)[0])
+        items = load_agieval_sat_math("test", args.n_dev + args.n_test)  # one seeded sample, no duplicates
         import random; random.shuffle(items)
         # Convert MCQ objects to dictionaries
         dev = [{"id": item.id, "context": item.context, "question": item.question, "choices": item.choices, "answer": item.answer} for item in items[:args.n_dev]]
@@ -0,0 +1,155 @@
+"""
+Adaptive concurrency for evaluation runs.
+
+AIMDController sizes the window of in-flight provider calls: it grows additively
+(about +1 per window of completions) while call latency stays near the best latency
+seen, and halves on throttling (HTTP 429 / rate-limit errors) or timeouts.
+"""
+import time, asyncio, contextlib
+from typing import Dict, Any, List
+from .models.provider import Provider, ProviderWrapper, ModelOutput
+from .models.resilient_client import is_throttle_error, is_timeout_error
+
+
+class AIMDController:
+    def __init__(self, initial: int = 4, min_window: int = 1, max_window: int = 64,
+                 latency_tolerance: float = 1.5, decrease_factor: float = 0.5, ewma_alpha: float = 0.2):
+        self.window = float(initial)
+        self.min_window = min_window
+        self.max_window = max_window
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self.ewma_alpha = ewma_alpha
+        self.in_flight = 0
+        self.ewma_latency = None
+        self.base_latency = None
+        self.last_decrease = 0.0
+        self.peak_window = self.window
+        self.increases = 0
+        self.decreases = 0
+        self.holds = 0
+        self.throttles = 0
+        self.timeouts = 0
+        self.decisions: List[Dict[str, Any]] = []
+        self._cond = None
+        self._cond_loop = None
+
+    def _condition(self) -> asyncio.Condition:
+        # asyncio primitives bind to one loop; each run_eval drives its own
+        loop = asyncio.get_running_loop()
+        if self._cond is None or self._cond_loop is not loop:
+            self._cond = asyncio.Condition()
+            self._cond_loop = loop
+        return self._cond
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_window, int(self.window))
+
+    def _log(self, event: str):
+        # Keep the decision log bounded; window changes are what matter
+        if len(self.decisions) < 500:
+            self.decisions.append({"t": round(time.time(), 3), "event": event, "window": round(self.window, 2),
+                                   "ewma_latency_sec": self.ewma_latency})
+
+    def observe(self, latency_sec: float | None, throttled: bool = False, timed_out: bool = False):
+        now = time.time()
+        if throttled or timed_out:
+            self.throttles += int(throttled)
+            self.timeouts += int(timed_out)
+            # Back off at most once per observed round trip so one burst of 429s halves the window once
+            if now - self.last_decrease >= (self.ewma_latency or 1.0):
+                self.window = max(float(self.min_window), self.window * self.decrease_factor)
+                self.last_decrease = now
+                self.decreases += 1
+                self._log("throttle" if throttled else "timeout")
+            return
+        if latency_sec is None:
+            return
+        self.ewma_latency = latency_sec if self.ewma_latency is None else (
+            self.ewma_alpha * latency_sec + (1 - self.ewma_alpha) * self.ewma_latency)
+        self.base_latency = self.ewma_latency if self.base_latency is None else min(self.base_latency, self.ewma_latency)
+        if self.ewma_latency <= self.base_latency * self.latency_tolerance:
+            before = self.limit
+            self.window = min(float(self.max_window), self.window + 1.0 / self.window)
+            self.peak_window = max(self.peak_window, self.window)
+            if self.limit != before:
+                self.increases += 1
+                self._log("increase")
+        else:
+            # Latency is rising: the provider is queueing, so stop growing
+            self.holds += 1
+
+    async def acquire(self):
+        cond = self._condition()
+        async with cond:
+            await cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self):
+        cond = self._condition()
+        async with cond:
+            self.in_flight -= 1
+            cond.notify_all()
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            await self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window": round(self.window, 2),
+            "peak_window": round(self.peak_window, 2),
+            "min_window": self.min_window,
+            "max_window": self.max_window,
+            "ewma_latency_sec": self.ewma_latency,
+            "base_latency_sec": self.base_latency,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "holds": self.holds,
+            "throttles": self.throttles,
+            "timeouts": self.timeouts,
+            "decisions": self.decisions,
+        }
+
+
+class ControlledProvider(ProviderWrapper):
+    """Runs each provider call inside an AIMDController slot and reports its outcome."""
+
+    def __init__(self, inner: Provider, controller: AIMDController):
+        super().__init__(inner)
+        self.controller = controller
+
+    async def agenerate(self, prompt: str, stop: list[str] | None = None, stop_at_answer: bool = False, json_mode: bool = False,
+                        max_output_tokens: int | None = None) -> ModelOutput:
+        async with self.controller.slot():
+            try:
+                out = await self.inner.agenerate(prompt, stop, stop_at_answer=stop_at_answer, json_mode=json_mode, max_output_tokens=max_output_tokens)
+            except Exception as e:
+                # RetryingProvider reports exhausted 429s/timeouts as ProviderError with flags set
+                self.controller.observe(None, throttled=getattr(e, "throttled", False) or is_throttle_error(e),
+                                        timed_out=getattr(e, "timed_out", False) or is_timeout_error(e))
+                raise
+        usage = out.usage if isinstance(out.usage, dict) else {}
+        if usage.get("cache_hit"):
+            # Cache hits never reach the provider, so their latency says nothing about its load
+            return out
+        self.controller.observe(out.latency_sec, throttled=bool(usage.get("throttled")), timed_out=bool(usage.get("timed_out")))
+        return out
+
+
+def make_controller(eval_cfg: Dict[str, Any]) -> AIMDController | None:
+    """Build the controller from the evaluation: block, or None when adaptive concurrency is off."""
+    ac = eval_cfg.get("adaptive_concurrency", {}) or {}
+    if not ac.get("enabled", False):
+        return None
+    return AIMDController(
+        initial=ac.get("initial", 4),
+        min_window=ac.get("min", 1),
+        max_window=ac.get("max", 64),
+        latency_tolerance=ac.get("latency_tolerance", 1.5),
+    )
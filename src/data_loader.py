@@ -1,7 +1,10 @@
-import json, random, pathlib
-from typing import List, Dict, Any
+import os, json, random, bisect, pathlib, tempfile, threading
+from typing import List, Dict, Any, Callable
 from dataclasses import dataclass
 
+# Bump whenever a normalizer changes what it produces; older cache files are then rebuilt
+CACHE_SCHEMA_VERSION = 2
+
 @dataclass
 class MCQ:
     id: str
@@ -10,6 +13,162 @@ class MCQ:
     choices: list[dict]
     answer: str
 
+def _cache_path(cache_dir: str | pathlib.Path, dataset: str, config: str | None, split: str) -> pathlib.Path:
+    stem = "__".join(part.replace("/", "_") for part in (dataset, config or "default", split))
+    return pathlib.Path(cache_dir) / f"{stem}.json"
+
+_COLUMNS = ("id", "context", "question", "choice_labels", "choice_texts", "answer")
+
+class NormalizedSplit:
+    """One HF split whose rows are normalized to MCQ on first access, by source index.
+
+    datasets.load_dataset only runs when a row that is not in the cache is requested.
+    With cache_dir set, decoded rows live in a columnar JSON file per dataset/config/split
+    (schema version plus the source's HF fingerprint); "valid" is true for decoded rows,
+    false where normalize skips the row and null for rows never decoded, so later runs
+    that sample more rows only decode the difference.
+    """
+    def __init__(self, dataset: str, config: str | None, split: str,
+                 normalize: Callable[[Dict[str, Any], int], MCQ | None], cache_dir: str | pathlib.Path | None = None):
+        self.dataset, self.config, self.split = dataset, config, split
+        self.normalize = normalize
+        self.key = {"dataset": dataset, "config": config, "split": split}
+        self.path = _cache_path(cache_dir, dataset, config, split) if cache_dir else None
+        self.fingerprint = None
+        self.valid: list[bool | None] | None = None
+        self.columns: Dict[str, list] = {}
+        self.decoded: Dict[int, MCQ | None] = {}
+        self.dirty = False
+        self._ds = None
+        if self.path is not None:
+            self._read_cache()
+
+    def _read_cache(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        if data.get("schema_version") != CACHE_SCHEMA_VERSION or data.get("source", {}).get("key") != self.key:
+            return
+        self.fingerprint = data["source"].get("fingerprint")
+        self.valid = data["columns"]["valid"]
+        self.columns = {c: data["columns"][c] for c in _COLUMNS}
+
+    def _open(self):
+        if self._ds is None:
+            from datasets import load_dataset
+            ds = load_dataset(self.dataset, self.config) if self.config else load_dataset(self.dataset)
+            self._ds = ds[self.split]
+            fingerprint = getattr(self._ds, "_fingerprint", None)
+            if self.valid is None or len(self.valid) != len(self._ds) or (self.fingerprint and fingerprint != self.fingerprint):
+                # No cache yet, or the source changed underneath it
+                self.valid = [None] * len(self._ds)
+                self.columns = {c: [None] * len(self._ds) for c in _COLUMNS}
+                self.decoded.clear()
+            self.fingerprint = fingerprint
+        return self._ds
+
+    def __len__(self) -> int:
+        if self.valid is None:
+            self._open()
+        return len(self.valid)
+
+    def row(self, i: int) -> MCQ | None:
+        """The normalized row at source index i (None if normalize skips it)."""
+        if i in self.decoded:
+            return self.decoded[i]
+        if self.valid is not None and self.valid[i] is not None:
+            ex = None
+            if self.valid[i]:
+                c = self.columns
+                choices = [{"label": l, "text": t} for l, t in zip(c["choice_labels"][i], c["choice_texts"][i])]
+                ex = MCQ(id=c["id"][i], context=c["context"][i], question=c["question"][i], choices=choices, answer=c["answer"][i])
+        else:
+            ex = self.normalize(self._open()[i], i)
+            self.valid[i] = ex is not None
+            if ex is not None:
+                for name, value in zip(_COLUMNS, (ex.id, ex.context, ex.question, [c["label"] for c in ex.choices],
+                                                   [c["text"] for c in ex.choices], ex.answer)):
+                    self.columns[name][i] = value
+            self.dirty = True
+        self.decoded[i] = ex
+        return ex
+
+    def save(self):
+        if self.path is None or not self.dirty:
+            return
+        # Splits carved from one source share this file and may be saved from several threads
+        with _path_lock(self.path):
+            self._merge_from_disk()
+            data = {
+                "schema_version": CACHE_SCHEMA_VERSION,
+                "source": {"key": self.key, "fingerprint": self.fingerprint, "num_rows": len(self.valid)},
+                "columns": {"valid": self.valid, **self.columns},
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=self.path.parent, prefix=self.path.name,
+                                             suffix=".tmp", delete=False) as f:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(f.name, self.path)
+        self.dirty = False
+
+    def _merge_from_disk(self):
+        """Adopt rows another writer decoded since this split read the cache, so saving keeps them."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        if (data.get("schema_version") != CACHE_SCHEMA_VERSION or data.get("source", {}).get("key") != self.key
+                or data["source"].get("fingerprint") != self.fingerprint or data["source"].get("num_rows") != len(self.valid)):
+            return
+        disk_valid = data["columns"]["valid"]
+        for i, v in enumerate(disk_valid):
+            if v is not None and self.valid[i] is None:
+                self.valid[i] = v
+                for c in _COLUMNS:
+                    self.columns[c][i] = data["columns"][c][i]
+
+_path_locks: Dict[pathlib.Path, threading.Lock] = {}
+_path_locks_guard = threading.Lock()
+
+def _path_lock(path: pathlib.Path) -> threading.Lock:
+    with _path_locks_guard:
+        return _path_locks.setdefault(pathlib.Path(path).resolve(), threading.Lock())
+
+def sample_order(num_rows: int, seed: int, key: str) -> list[int]:
+    """Deterministic permutation of range(num_rows).
+
+    random.Random hashes string seeds with SHA-512, so the order is the same in every
+    process (unlike hash(), which PYTHONHASHSEED randomizes).
+    """
+    order = list(range(num_rows))
+    random.Random(f"{seed}:{key}").shuffle(order)
+    return order
+
+def sample_rows(source: NormalizedSplit, n: int, seed: int, offset: int = 0) -> list[MCQ]:
+    """Rows [offset, offset+n) of the split's seeded sample, decoding only as many rows as that needs.
+
+    Skipped rows do not count, so carving dev = sample_rows(.., n), test = sample_rows(.., n, offset=n)
+    gives disjoint slices of the same shuffled pool.
+    """
+    out = []
+    if n > 0:
+        for i in sample_order(len(source), seed, f"{source.dataset}/{source.config}/{source.split}"):
+            ex = source.row(i)
+            if ex is None:
+                continue
+            out.append(ex)
+            if len(out) >= offset + n:
+                break
+    source.save()
+    return out[offset:offset + n]
+
+def _carve_offset(split: str, n: int) -> int:
+    # Datasets with a single source split carve dev/test/train from one seeded sample
+    return {"dev": 0, "test": n}.get(split, 2 * n)
+
 def load_synthetic(split_dir: pathlib.Path) -> list[MCQ]:
     path = split_dir
     items = []
@@ -19,93 +178,101 @@ def load_synthetic(split_dir: pathlib.Path) -> list[MCQ]:
                          choices=ex["choices"], answer=ex["answer"]))
     return items
 
-def load_race(split: str, subset: str, n: int) -> list[MCQ]:
+def _norm_race(ex: Dict[str, Any], i: int) -> MCQ:
+    choices = [{"label": chr(ord('A')+i), "text": t} for i, t in enumerate(ex["options"])]
+    return MCQ(id=str(ex["example_id"]), context=ex["article"], question=ex["question"],
+               choices=choices, answer=ex["answer"])
+
+def load_race(split: str, subset: str, n: int, seed: int = 0, cache_dir: str | None = None) -> list[MCQ]:
     # Requires: datasets
-    from datasets import load_dataset
-    ds = load_dataset("EleutherAI/race", subset)[split]
-    # Unify
-    pool = []
-    for ex in ds:
-        choices = [{"label": chr(ord('A')+i), "text": t} for i, t in enumerate(ex["options"])]
-        pool.append(MCQ(id=str(ex["example_id"]), context=ex["article"], question=ex["question"],
-                        choices=choices, answer=ex["answer"]))
-    random.shuffle(pool)
-    return pool[:n]
-
-def load_arc(split: str, difficulty: str, n: int) -> list[MCQ]:
+    return sample_rows(NormalizedSplit("EleutherAI/race", subset, split, _norm_race, cache_dir), n, seed)
+
+def _norm_arc(ex: Dict[str, Any], i: int) -> MCQ:
+    choices = [{"label": c["label"], "text": c["text"]} for c in ex["choices"]]
+    # ARC has no context passage, just question + choices
+    return MCQ(id=str(ex["id"]), context="", question=ex["question"],
+               choices=choices, answer=ex["answerKey"])
+
+def load_arc(split: str, difficulty: str, n: int, seed: int = 0, cache_dir: str | None = None) -> list[MCQ]:
     # Requires: datasets
-    from datasets import load_dataset
     config = "ARC-Easy" if difficulty == "easy" else "ARC-Challenge"
-    ds = load_dataset("allenai/ai2_arc", config)[split]
-    pool = []
-    for ex in ds:
-        choices = [{"label": c["label"], "text": c["text"]} for c in ex["choices"]]
-        # ARC has no context passage, just question + choices
-        pool.append(MCQ(id=str(ex["id"]), context="", question=ex["question"],
-                        choices=choices, answer=ex["answerKey"]))
-    random.shuffle(pool)
-    return pool[:n]
+    return sample_rows(NormalizedSplit("allenai/ai2_arc", config, split, _norm_arc, cache_dir), n, seed)
+
 
+def _norm_mmlu(subj: str):
+    def norm(ex: Dict[str, Any], i: int) -> MCQ:
+        # ex['question'] (str), ex['answer'] (letter "A"/"B"/"C"/"D"), ex['choices'] (list[str])
+        choices = [{"label": chr(ord('A')+i), "text": t} for i, t in enumerate(ex["choices"])]
+        return MCQ(
+            id=f"{subj}:{ex['idx']}" if "idx" in ex else None,  # else load_mmlu uses the pool position
+            context="",  # MMLU generally has no long passage
+            question=ex["question"],
+            choices=choices,
+            answer=ex["answer"]
+        )
+    return norm
 
-def load_mmlu(subjects: list[str], split: str, n: int) -> list[MCQ]:
+def load_mmlu(subjects: list[str], split: str, n: int, seed: int = 0, cache_dir: str | None = None) -> list[MCQ]:
     """
     Load MMLU (hendrycks_test) subjects and return unified MCQ list.
     Notes:
       - Many users treat 'validation' as dev and 'test' as held-out.
-      - Each subject is loaded separately; we then concatenate & sample.
+      - Subjects are concatenated, then a seeded sample is drawn from the combined pool.
     """
-    from datasets import load_dataset
-    pool = []
     # Use 'validation' split for dev; 'test' for test; 'train' rarely used
     hf_split = "validation" if split == "dev" else ("test" if split == "test" else "train")
+    sources, offsets, total = [], [], 0
     for subj in subjects:
-        ds = load_dataset("cais/mmlu", subj)[hf_split]
-        for ex in ds:
-            # ex['question'] (str), ex['answer'] (letter "A"/"B"/"C"/"D"), ex['choices'] (list[str])
-            choices = [{"label": chr(ord('A')+i), "text": t} for i, t in enumerate(ex["choices"])]
-            pool.append(MCQ(
-                id=f"{subj}:{ex.get('idx', len(pool))}",
-                context="",  # MMLU generally has no long passage
-                question=ex["question"],
-                choices=choices,
-                answer=ex["answer"]
-            ))
-    import random
-    random.shuffle(pool)
-    return pool[:n]
-
-
-def load_truthfulqa_mc(split: str, n: int) -> list[MCQ]:
-    from datasets import load_dataset
-    ds = load_dataset("EleutherAI/truthful_qa_mc")["validation"]  # pool
-    rows = []
-    for i, ex in enumerate(ds):
-        # choices may be list[str] or list[dict]; normalize
-        raw_choices = ex.get("choices", [])
-        if isinstance(raw_choices[0], dict):
-            opts = [c.get("text", "") for c in raw_choices]
-        else:
-            opts = list(raw_choices)
-        choices = [{"label": chr(ord('A')+j), "text": t} for j, t in enumerate(opts)]
+        sources.append(NormalizedSplit("cais/mmlu", subj, hf_split, _norm_mmlu(subj), cache_dir))
+        offsets.append(total)
+        total += len(sources[-1])
+    # One seeded order over the concatenated subjects; only the sampled rows are decoded
+    pool = []
+    for g in sample_order(total, seed, f"cais/mmlu/{'+'.join(subjects)}/{hf_split}"):
+        if len(pool) >= n:
+            break
+        k = bisect.bisect_right(offsets, g) - 1
+        ex = sources[k].row(g - offsets[k])
+        if ex is None:
+            continue
+        if ex.id is None:
+            ex.id = f"{subjects[k]}:{g}"  # position in the concatenated pool
+        pool.append(ex)
+    for src in sources:
+        src.save()
+    return pool
 
-        # gold may be 'label' ('A'..'D') or an index
-        gold = ex.get("label", ex.get("answer", ex.get("correct", None)))
-        if isinstance(gold, int):
-            gold_letter = chr(ord('A') + gold)
-        else:
-            gold_letter = str(gold).strip().upper()
 
-        rows.append(MCQ(id=f"tqa:{i}", context="", question=ex["question"], choices=choices, answer=gold_letter))
-    import random; random.shuffle(rows)
+def _norm_truthfulqa_mc(ex: Dict[str, Any], i: int) -> MCQ:
+    # choices may be list[str] or list[dict]; normalize
+    raw_choices = ex.get("choices", [])
+    if isinstance(raw_choices[0], dict):
+        opts = [c.get("text", "") for c in raw_choices]
+    else:
+        opts = list(raw_choices)
+    choices = [{"label": chr(ord('A')+j), "text": t} for j, t in enumerate(opts)]
+
+    # gold may be 'label' ('A'..'D') or an index
+    gold = ex.get("label", ex.get("answer", ex.get("correct", None)))
+    if isinstance(gold, int):
+        gold_letter = chr(ord('A') + gold)
+    else:
+        gold_letter = str(gold).strip().upper()
 
+    return MCQ(id=f"tqa:{i}", context="", question=ex["question"], choices=choices, answer=gold_letter)
+
+def load_truthfulqa_mc(split: str, n: int, seed: int = 0, cache_dir: str | None = None) -> list[MCQ]:
+    pool = NormalizedSplit("EleutherAI/truthful_qa_mc", None, "validation", _norm_truthfulqa_mc, cache_dir)
     # carve dev/test from pool
-    if split == "dev":   return rows[:n]
-    if split == "test":  return rows[n:2*n]
-    return rows[2*n:3*n]
+    return sample_rows(pool, n, seed, offset=_carve_offset(split, n))
+
 
+def _norm_mmlu_pro(ex: Dict[str, Any], i: int) -> MCQ:
+    # MMLU-Pro has 10 choices labeled A-J
+    choices = [{"label": chr(ord('A')+j), "text": t} for j, t in enumerate(ex["options"])]
+    return MCQ(id=f"mmlu_pro:{i}", context="", question=ex["question"], choices=choices, answer=ex["answer"])
 
-def load_mmlu_pro(split: str, n: int) -> list[MCQ]:
-    from datasets import load_dataset
+def load_mmlu_pro(split: str, n: int, seed: int = 0, cache_dir: str | None = None) -> list[MCQ]:
     # MMLU-Pro has 10 choices (A-J) and is harder than standard MMLU
     # MMLU-Pro only has validation and test splits, no train
     if split == "train":
@@ -120,111 +287,92 @@ def load_mmlu_pro(split: str, n: int) -> list[MCQ]:
     else:
         hf_split = split
     
-    ds = load_dataset("TIGER-Lab/MMLU-Pro")[hf_split]
-    items = []
-    for i, ex in enumerate(ds):
-        # MMLU-Pro has 10 choices labeled A-J
-        choices = [{"label": chr(ord('A')+j), "text": t} for j, t in enumerate(ex["options"])]
-        items.append(MCQ(id=f"mmlu_pro:{i}", context="", question=ex["question"], choices=choices, answer=ex["answer"]))
-    import random; random.shuffle(items)
-    return items[:n]
+    return sample_rows(NormalizedSplit("TIGER-Lab/MMLU-Pro", None, hf_split, _norm_mmlu_pro, cache_dir), n, seed)
 
 
-def load_openbookqa(split: str, n: int) -> list[MCQ]:
-    from datasets import load_dataset
-    ds = load_dataset("openbookqa")[split]
-    pool = []
-    for i, ex in enumerate(ds):
-        # dataset provides: question_stem, choices (dict with text/label lists), answerKey
-        choices = [{"label": label, "text": text} for label, text in zip(ex["choices"]["label"], ex["choices"]["text"])]
-        pool.append(MCQ(id=f"obqa:{i}", context="", question=ex["question_stem"], choices=choices, answer=ex["answerKey"]))
-    import random; random.shuffle(pool)
-    return pool[:n]
+def _norm_openbookqa(ex: Dict[str, Any], i: int) -> MCQ:
+    # dataset provides: question_stem, choices (dict with text/label lists), answerKey
+    choices = [{"label": label, "text": text} for label, text in zip(ex["choices"]["label"], ex["choices"]["text"])]
+    return MCQ(id=f"obqa:{i}", context="", question=ex["question_stem"], choices=choices, answer=ex["answerKey"])
 
+def load_openbookqa(split: str, n: int, seed: int = 0, cache_dir: str | None = None) -> list[MCQ]:
+    return sample_rows(NormalizedSplit("openbookqa", None, split, _norm_openbookqa, cache_dir), n, seed)
 
-def load_gpqa_diamond(split: str, n: int) -> list[MCQ]:
-    """Load GPQA-Diamond dataset (extremely challenging STEM questions)"""
-    from datasets import load_dataset
-    ds = load_dataset("fingertap/GPQA-Diamond")["test"]  # only test split available
-    pool = []
-    for i, ex in enumerate(ds):
-        # Parse the question format: question with a), b), c), d) options followed by A. B. C. D. mapping
-        question_text = ex["question"]
-        
-        # Extract the main question and options
-        lines = question_text.split('\n')
-        main_question = lines[0].strip()
-        
-        # Find the options (a), b), c), d) format)
-        options = []
-        for line in lines[1:]:
-            line = line.strip()
-            if line.startswith(('a)', 'b)', 'c)', 'd)')):
-                options.append(line[2:].strip())
-        
-        # Find the A. B. C. D. mapping (e.g., "A. d", "B. a", "C. b", "D. c")
-        mapping = {}
+
+def _norm_gpqa_diamond(ex: Dict[str, Any], i: int) -> MCQ:
+    # Parse the question format: question with a), b), c), d) options followed by A. B. C. D. mapping
+    question_text = ex["question"]
+    
+    # Extract the main question and options
+    lines = question_text.split('\n')
+    main_question = lines[0].strip()
+    
+    # Find the options (a), b), c), d) format)
+    options = []
+    for line in lines[1:]:
+        line = line.strip()
+        if line.startswith(('a)', 'b)', 'c)', 'd)')):
+            options.append(line[2:].strip())
+    
+    # Find the A. B. C. D. mapping (e.g., "A. d", "B. a", "C. b", "D. c")
+    mapping = {}
+    for line in lines:
+        if line.startswith(('A.', 'B.', 'C.', 'D.')):
+            parts = line.split('.')
+            if len(parts) >= 2:
+                letter = parts[0].strip()
+                option_ref = parts[1].strip()
+                mapping[letter] = option_ref
+    
+    # Create choices in A, B, C, D format
+    choices = []
+    
+    # Check if we have the a), b), c), d) format with mapping
+    if options and mapping:
+        for letter in ['A', 'B', 'C', 'D']:
+            if letter in mapping:
+                option_ref = mapping[letter]
+                # Find the corresponding option text
+                if option_ref == 'a' and len(options) > 0:
+                    choices.append({"label": letter, "text": options[0]})
+                elif option_ref == 'b' and len(options) > 1:
+                    choices.append({"label": letter, "text": options[1]})
+                elif option_ref == 'c' and len(options) > 2:
+                    choices.append({"label": letter, "text": options[2]})
+                elif option_ref == 'd' and len(options) > 3:
+                    choices.append({"label": letter, "text": options[3]})
+    
+    # If no choices found, look for direct A. B. C. D. format
+    if not choices:
         for line in lines:
+            line = line.strip()
             if line.startswith(('A.', 'B.', 'C.', 'D.')):
                 parts = line.split('.')
                 if len(parts) >= 2:
                     letter = parts[0].strip()
-                    option_ref = parts[1].strip()
-                    mapping[letter] = option_ref
-        
-        # Create choices in A, B, C, D format
-        choices = []
-        
-        # Check if we have the a), b), c), d) format with mapping
-        if options and mapping:
-            for letter in ['A', 'B', 'C', 'D']:
-                if letter in mapping:
-                    option_ref = mapping[letter]
-                    # Find the corresponding option text
-                    if option_ref == 'a' and len(options) > 0:
-                        choices.append({"label": letter, "text": options[0]})
-                    elif option_ref == 'b' and len(options) > 1:
-                        choices.append({"label": letter, "text": options[1]})
-                    elif option_ref == 'c' and len(options) > 2:
-                        choices.append({"label": letter, "text": options[2]})
-                    elif option_ref == 'd' and len(options) > 3:
-                        choices.append({"label": letter, "text": options[3]})
-        
-        # If no choices found, look for direct A. B. C. D. format
-        if not choices:
-            for line in lines:
-                line = line.strip()
-                if line.startswith(('A.', 'B.', 'C.', 'D.')):
-                    parts = line.split('.')
-                    if len(parts) >= 2:
-                        letter = parts[0].strip()
-                        choice_text = parts[1].strip()
-                        choices.append({"label": letter, "text": choice_text})
-        
-        # Get the correct answer
-        correct_answer = ex["answer"]
-        
-
-        
-        pool.append(MCQ(
-            id=f"gpqa_diamond:{i}",
-            context="",
-            question=main_question,
-            choices=choices,
-            answer=correct_answer
-        ))
+                    choice_text = parts[1].strip()
+                    choices.append({"label": letter, "text": choice_text})
     
-    import random; random.shuffle(pool)
-    return pool[:n]
+    # Get the correct answer
+    correct_answer = ex["answer"]
+    
+    return MCQ(
+        id=f"gpqa_diamond:{i}",
+        context="",
+        question=main_question,
+        choices=choices,
+        answer=correct_answer
+    )
+
+def load_gpqa_diamond(split: str, n: int, seed: int = 0, cache_dir: str | None = None) -> list[MCQ]:
+    """Load GPQA-Diamond dataset (extremely challenging STEM questions)"""
+    # only test split available
+    pool = NormalizedSplit("fingertap/GPQA-Diamond", None, "test", _norm_gpqa_diamond, cache_dir)
+    return sample_rows(pool, n, seed, offset=_carve_offset(split, n))
 
 
-def load_agieval_lsat_ar(split: str, n: int) -> list[MCQ]:
-    """Load AGIEval LSAT Analytical Reasoning dataset"""
-    from datasets import load_dataset
-    ds = load_dataset("hails/agieval-lsat-ar")["test"]  # only test split available
-    pool = []
-    for i, ex in enumerate(ds):
-        # Parse the complex query format
+def _norm_agieval(prefix: str):
+    def norm(ex: Dict[str, Any], i: int) -> MCQ:
         query = ex["query"]
         choices = ex["choices"]
         gold = ex["gold"][0] if ex["gold"] else 0  # gold is a list, take first element
@@ -237,79 +385,74 @@ def load_agieval_lsat_ar(split: str, n: int) -> list[MCQ]:
         # Convert gold index to letter
         correct_answer = chr(ord('A') + gold)
         
-        pool.append(MCQ(
-            id=f"lsat_ar:{i}",
+        return MCQ(
+            id=f"{prefix}:{i}",
             context="",
             question=query,
             choices=choices_formatted,
             answer=correct_answer
-        ))
-    
-    import random; random.shuffle(pool)
-    return pool[:n]
+        )
+    return norm
 
 
-def load_agieval_lsat_lr(split: str, n: int) -> list[MCQ]:
+def load_agieval_lsat_ar(split: str, n: int, seed: int = 0, cache_dir: str | None = None) -> list[MCQ]:
+    """Load AGIEval LSAT Analytical Reasoning dataset"""
+    # only test split available
+    pool = NormalizedSplit("hails/agieval-lsat-ar", None, "test", _norm_agieval("lsat_ar"), cache_dir)
+    return sample_rows(pool, n, seed, offset=_carve_offset(split, n))
+
+
+def load_agieval_lsat_lr(split: str, n: int, seed: int = 0, cache_dir: str | None = None) -> list[MCQ]:
     """Load AGIEval LSAT Logical Reasoning dataset"""
-    from datasets import load_dataset
-    ds = load_dataset("hails/agieval-lsat-lr")["test"]  # only test split available
-    pool = []
-    for i, ex in enumerate(ds):
-        query = ex["query"]
-        choices = ex["choices"]
-        gold = ex["gold"][0] if ex["gold"] else 0
-        
-        choices_formatted = []
-        for j, choice in enumerate(choices):
-            choices_formatted.append({"label": chr(ord('A') + j), "text": choice})
-        
-        correct_answer = chr(ord('A') + gold)
-        
-        pool.append(MCQ(
-            id=f"lsat_lr:{i}",
-            context="",
-            question=query,
-            choices=choices_formatted,
-            answer=correct_answer
-        ))
-    
-    import random; random.shuffle(pool)
-    return pool[:n]
+    # only test split available
+    pool = NormalizedSplit("hails/agieval-lsat-lr", None, "test", _norm_agieval("lsat_lr"), cache_dir)
+    return sample_rows(pool, n, seed, offset=_carve_offset(split, n))
 
 
-def load_agieval_sat_math(split: str, n: int) -> list[MCQ]:
+def load_agieval_sat_math(split: str, n: int, seed: int = 0, cache_dir: str | None = None) -> list[MCQ]:
     """Load AGIEval SAT Math dataset"""
-    from datasets import load_dataset
-    ds = load_dataset("hails/agieval-sat-math")["test"]  # only test split available
-    pool = []
-    for i, ex in enumerate(ds):
-        query = ex["query"]
-        choices = ex["choices"]
-        gold = ex["gold"][0] if ex["gold"] else 0
-        
-        choices_formatted = []
-        for j, choice in enumerate(choices):
-            choices_formatted.append({"label": chr(ord('A') + j), "text": choice})
-        
-        correct_answer = chr(ord('A') + gold)
-        
-        pool.append(MCQ(
-            id=f"sat_math:{i}",
-            context="",
-            question=query,
-            choices=choices_formatted,
-            answer=correct_answer
-        ))
-    
-    import random; random.shuffle(pool)
-    return pool[:n]
+    # only test split available
+    pool = NormalizedSplit("hails/agieval-sat-math", None, "test", _norm_agieval("sat_math"), cache_dir)
+    return sample_rows(pool, n, seed, offset=_carve_offset(split, n))
 
 
-def load_logiqa2(split: str, n: int) -> list[MCQ]:
-    """Load LogiQA 2.0 dataset (massive logical reasoning)"""
-    from datasets import load_dataset
-    ds = load_dataset("datatune/LogiQA2.0")
+def _norm_logiqa2(ex: Dict[str, Any], i: int) -> MCQ | None:
+    # Parse the text field which contains JSON-like structure
+    text = ex["text"]
+    
+    # Extract question and choices from the text
+    # Format varies, but typically has question and multiple choice options
+    lines = text.split('\n')
+    question = ""
+    choices = []
+    answer = None
     
+    # Simple parsing - look for question and choices
+    for line in lines:
+        line = line.strip()
+        if line.startswith('Q:') or line.startswith('Question:'):
+            question = line.split(':', 1)[1].strip()
+        elif line.startswith(('A.', 'B.', 'C.', 'D.')):
+            choice_text = line.split('.', 1)[1].strip()
+            choice_label = line.split('.')[0]
+            choices.append({"label": choice_label, "text": choice_text})
+        elif line.startswith('Answer:'):
+            answer = line.split(':', 1)[1].strip()
+    
+    # If we couldn't parse properly, skip this example
+    if not question or len(choices) < 2 or not answer:
+        return None
+        
+    return MCQ(
+        id=f"logiqa2:{i}",
+        context="",
+        question=question,
+        choices=choices,
+        answer=answer
+    )
+
+def load_logiqa2(split: str, n: int, seed: int = 0, cache_dir: str | None = None) -> list[MCQ]:
+    """Load LogiQA 2.0 dataset (massive logical reasoning)"""
     # Map split names
     if split == "dev":
         hf_split = "validation"
@@ -318,79 +461,33 @@ def load_logiqa2(split: str, n: int) -> list[MCQ]:
     else:
         hf_split = "train"
     
-    pool = []
-    for i, ex in enumerate(ds[hf_split]):
-        # Parse the text field which contains JSON-like structure
-        text = ex["text"]
-        
-        # Extract question and choices from the text
-        # Format varies, but typically has question and multiple choice options
-        lines = text.split('\n')
-        question = ""
-        choices = []
-        answer = None
-        
-        # Simple parsing - look for question and choices
-        for line in lines:
-            line = line.strip()
-            if line.startswith('Q:') or line.startswith('Question:'):
-                question = line.split(':', 1)[1].strip()
-            elif line.startswith(('A.', 'B.', 'C.', 'D.')):
-                choice_text = line.split('.', 1)[1].strip()
-                choice_label = line.split('.')[0]
-                choices.append({"label": choice_label, "text": choice_text})
-            elif line.startswith('Answer:'):
-                answer = line.split(':', 1)[1].strip()
-        
-        # If we couldn't parse properly, skip this example
-        if not question or len(choices) < 2 or not answer:
-            continue
-            
-        pool.append(MCQ(
-            id=f"logiqa2:{i}",
-            context="",
-            question=question,
-            choices=choices,
-            answer=answer
-        ))
-    
-    import random; random.shuffle(pool)
-    return pool[:n]
+    return sample_rows(NormalizedSplit("datatune/LogiQA2.0", None, hf_split, _norm_logiqa2, cache_dir), n, seed)
 
 
-def load_truthfulqa_official(split: str, n: int) -> list[MCQ]:
-    """Load official TruthfulQA multiple choice dataset"""
-    from datasets import load_dataset
-    ds = load_dataset("truthfulqa/truthful_qa", "multiple_choice")["validation"]
+def _norm_truthfulqa_official(ex: Dict[str, Any], i: int) -> MCQ:
+    question = ex["question"]
     
-    pool = []
-    for i, ex in enumerate(ds):
-        question = ex["question"]
-        
-        # Use mc1_targets (first set of choices)
-        mc1 = ex["mc1_targets"]
-        choices = []
-        for j, choice in enumerate(mc1["choices"]):
-            choices.append({"label": chr(ord('A') + j), "text": choice})
-        
-        # Find correct answer (label = 1)
-        correct_idx = mc1["labels"].index(1) if 1 in mc1["labels"] else 0
-        correct_answer = chr(ord('A') + correct_idx)
-        
-        pool.append(MCQ(
-            id=f"truthfulqa:{i}",
-            context="",
-            question=question,
-            choices=choices,
-            answer=correct_answer
-        ))
+    # Use mc1_targets (first set of choices)
+    mc1 = ex["mc1_targets"]
+    choices = []
+    for j, choice in enumerate(mc1["choices"]):
+        choices.append({"label": chr(ord('A') + j), "text": choice})
     
-    import random; random.shuffle(pool)
+    # Find correct answer (label = 1)
+    correct_idx = mc1["labels"].index(1) if 1 in mc1["labels"] else 0
+    correct_answer = chr(ord('A') + correct_idx)
+    
+    return MCQ(
+        id=f"truthfulqa:{i}",
+        context="",
+        question=question,
+        choices=choices,
+        answer=correct_answer
+    )
+
+def load_truthfulqa_official(split: str, n: int, seed: int = 0, cache_dir: str | None = None) -> list[MCQ]:
+    """Load official TruthfulQA multiple choice dataset"""
+    pool = NormalizedSplit("truthfulqa/truthful_qa", "multiple_choice", "validation", _norm_truthfulqa_official, cache_dir)
     
     # Carve dev/test from the pool
-    if split == "dev":
-        return pool[:n]
-    elif split == "test":
-        return pool[n:2*n]
-    else:
-        return pool[2*n:3*n]
+    return sample_rows(pool, n, seed, offset=_carve_offset(split, n))
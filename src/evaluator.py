@@ -1,8 +1,11 @@
-import time, pathlib, json, statistics, re
+import os, time, pathlib, json, re, asyncio, hashlib, tempfile
 from dataclasses import dataclass
 from typing import List, Dict, Any
-from .models.provider import Provider
-from .utils import ensure_dir, write_jsonl, parse_answer_letter
+from .models.provider import Provider, ModelOutput, run_and_close
+from .models.resilient_client import ProviderError
+from .concurrency import AIMDController, ControlledProvider
+from .utils import ensure_dir, write_jsonl, read_jsonl, parse_answer_letter, JsonlAppender
+from .result_store import ResultStore
 
 
 @dataclass
@@ -12,6 +15,7 @@ class Example:
     question: str
     choices: list[dict]
     answer: str
+    perm: list[int] | None = None  # set once choices are in display order: perm[k] = original index of choice k
 
 
 @dataclass
@@ -20,6 +24,8 @@ class EvalResult:
     avg_tokens_out: float | None
     avg_latency_sec: float
     records_path: str
+    n_errors: int = 0
+    stage_metrics: Dict[str, Any] | None = None
 
 
 def render_mcq_prompt(base_prompt: str, ex: Example) -> str:
@@ -36,184 +42,218 @@ Allowed answer letters: {letters}
 End with exactly one line: Answer: <LETTER>"""
 
 
-def run_eval(provider: Provider, base_prompt: str, examples: List[Example], strategy: str = "baseline", self_refine_steps: int = 1, out_dir: str = "runs/tmp") -> EvalResult:
-    ensure_dir(out_dir)
-    rows = []
-    correct = 0
-    tokens_list, latency_list = [], []
+def format_violation(text: str) -> str | None:
+    """Return the final line if it is not exactly 'Answer: <LETTER>', else None."""
+    lines = text.strip().split('\n')
+    if lines:
+        final_line = lines[-1].strip()
+        if not re.match(r'^Answer:\s*[A-J]\s*$', final_line, re.IGNORECASE):
+            return final_line
+    return None
+
+
+def hybrid_token_totals(sr_usage: Any, gepa_usage: Any) -> tuple[int, int, int]:
+    """Hybrid accounting: (SR + GEPA in/out tokens, SR + GEPA out tokens, their sum)."""
+    def _tok(u, key):
+        if isinstance(u, dict):
+            return u.get(key) or 0
+        return 0
+    total_input_tokens = sum(_tok(u, "input_tokens") + _tok(u, "output_tokens") for u in (sr_usage, gepa_usage))
+    total_output_tokens = _tok(sr_usage, "output_tokens") + _tok(gepa_usage, "output_tokens")
+    return total_input_tokens, total_output_tokens, total_input_tokens + total_output_tokens
+
+
+def has_explicit_invalidation(gepa_text: str, threshold_config: Dict[str, Any]) -> bool:
+    """Whether the GEPA review explicitly invalidates the SR answer (required before overriding by default)."""
+    gepa_text_lower = gepa_text.lower()
+    invalidation_keywords = threshold_config.get('invalidation_keywords', [
+        "incorrect", "wrong", "not supported", "invalid", "false", 
+        "misleading", "unsupported", "factually wrong", "logically flawed",
+        "error", "mistake"
+    ])
+    return any(word in gepa_text_lower for word in invalidation_keywords)
+
+
+def threshold_config_from_cfg(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the hybrid threshold_config from an experiment config ({} when it has no thresholds block)."""
+    if 'thresholds' not in cfg:
+        return {}
+    return {
+        'confidence_threshold': cfg['thresholds'].get('current_threshold', 0.80),
+        'conditional_gepa_enabled': cfg.get('conditional_gepa', {}).get('enabled', True),
+        'explicit_invalidation_required': cfg.get('explicit_invalidation', {}).get('required', True),
+        'uncertainty_signals': cfg.get('conditional_gepa', {}).get('uncertainty_signals', [
+            "maybe", "uncertain", "not sure", "could be", "might be", 
+            "possibly", "i think", "i believe", "seems like", "appears to"
+        ]),
+        'min_tokens': cfg.get('conditional_gepa', {}).get('length_thresholds', {}).get('min_tokens', 30),
+        'max_tokens': cfg.get('conditional_gepa', {}).get('length_thresholds', {}).get('max_tokens', 200),
+        'reasoning_indicators': cfg.get('conditional_gepa', {}).get('reasoning_indicators', [
+            "because", "since", "as", "due to", "reason", "logic", 
+            "therefore", "thus", "hence"
+        ]),
+        'invalidation_keywords': cfg.get('explicit_invalidation', {}).get('keywords', [
+            "incorrect", "wrong", "not supported", "invalid", "false", 
+            "misleading", "unsupported", "factually wrong", "logically flawed",
+            "error", "mistake"
+        ])
+    }
+
+
+def calculate_gepa_confidence(gepa_output, sr_output, sr_answer, gepa_answer):
+    """Calculate confidence score for GEPA override decision"""
+    confidence = 0.0
+
+    # Base confidence from output quality
+    if len(gepa_output.strip()) <= 50:  # Very concise
+        confidence += 0.2
+    elif len(gepa_output.strip()) <= 100:  # Moderately concise
+        confidence += 0.15
+
+    # Check if GEPA made a clear correction with reasoning
+    if "correct" in gepa_output.lower() or "wrong" in gepa_output.lower():
+        confidence += 0.25
+
+    # Check if GEPA provided logical reasoning
+    if any(word in gepa_output.lower() for word in ["because", "since", "as", "due to", "reason", "logic"]):
+        confidence += 0.2
+
+    # Check if GEPA is very confident (strong language)
+    if any(word in gepa_output.lower() for word in ["clearly", "obviously", "definitely", "certainly", "must", "should"]):
+        confidence += 0.15
+
+    # Check if GEPA identified a specific flaw in SR's reasoning
+    if any(word in gepa_output.lower() for word in ["flaw", "error", "mistake", "incorrect", "wrong"]):
+        confidence += 0.25
+
+    # Bonus for very specific corrections
+    if "the answer is" in gepa_output.lower() and gepa_answer != sr_answer:
+        confidence += 0.1
+
+    # PHASE 3.4: Additional confidence factors based on analysis
+    # Check for strong disagreement language
+    if any(word in gepa_output.lower() for word in ["incorrect", "wrong", "mistake", "error"]):
+        confidence += 0.15
     
-    for ex in examples:
-        # Choice shuffling for robustness (prevents label memorization)
-        import random
-        rng = random.Random(12345 + hash(ex.id) % 10_000_000)
-        
-        perm = list(range(len(ex.choices)))
-        rng.shuffle(perm)
-        shuffled_choices = [ex.choices[i] for i in perm]
-        
-        # map gold to its new position
-        label_to_idx = {c['label']: idx for idx, c in enumerate(ex.choices)}
-        gold_idx = label_to_idx[ex.answer]
-        new_gold_idx = perm.index(gold_idx)
-        new_gold_letter = chr(ord('A') + new_gold_idx)
-        
-        # verify the mapping is correct
-        assert ex.choices[gold_idx]["text"] == shuffled_choices[new_gold_idx]["text"], f"Choice mapping error: {ex.choices[gold_idx]['text']} != {shuffled_choices[new_gold_idx]['text']}"
-        
-        # create shuffled example for this run
-        ex_for_run = Example(ex.id, ex.context, ex.question,
-                             [{"label": chr(ord('A')+i), "text": c["text"]} for i, c in enumerate(shuffled_choices)],
-                             new_gold_letter)
-        
-
-        
-        # Initialize with generic prompt, will be overridden for hybrid mode
-        prompt = render_mcq_prompt(base_prompt, ex_for_run)
-        rendered = prompt
-        
-        if strategy == "baseline":
-            result = provider.generate(prompt)
-            answer = parse_answer_letter(result.text)
-            
-        elif strategy == "self_refine":
-            # 1) initial
-            r1 = provider.generate(prompt)
-
-            # 2) critique + revise with full context
-            choices_text = "\n".join([f"{c['label']}. {c['text']}" for c in ex.choices])
-            crit = f"""You will critique and revise an answer to a multiple-choice question.
-
-PASSAGE:
-{ex.context or "(no passage)"}
-
-QUESTION:
-{ex.question}
-
-CHOICES:
-{choices_text}
-
-INITIAL ANSWER:
-{r1.text}
-
-Instructions:
-- If the initial answer is already correct and justified, you may keep it.
-- Otherwise, briefly state the likely mistake (one short line).
-- Then output a corrected final line strictly as: Answer: <LETTER>
-Only output at most two short lines and always include the final 'Answer: <LETTER>' line."""
-            r2 = provider.generate(crit)
-            result = r2
-            answer = parse_answer_letter(result.text)
-
-            # Guardrail: if revision didn't yield a letter, fall back to initial
-            if answer is None:
-                answer = parse_answer_letter(r1.text)
-
-            # --- NEW: fair token & latency accounting ---
-            def _tok(u): 
-                if isinstance(u, dict):
-                    return (u.get("input_tokens") or 0, u.get("output_tokens") or 0)
-                return (0, 0)
-
-            in1, out1 = _tok(r1.usage); in2, out2 = _tok(r2.usage)
-            total_in = in1 + in2
-            total_out = out1 + out2
-            total_tokens_all_calls = total_in + total_out
-            total_latency = r1.latency_sec + r2.latency_sec
-                
-        elif strategy == "distill_from_self_refine":
-            # Use Self-Refine's correct traces to distill into a single-call prompt
-            # This is a special mode that runs Self-Refine first, then distills the behavior
-            
-            # 1) Run Self-Refine to get correct traces
-            r1 = provider.generate(prompt)
-            choices_text = "\n".join([f"{c['label']}. {c['text']}" for c in ex.choices])
-            crit = f"""You will critique and revise an answer to a multiple-choice question.
-
-PASSAGE:
-{ex.context or "(no passage)"}
-
-QUESTION:
-{ex.question}
-
-CHOICES:
-{choices_text}
-
-INITIAL ANSWER:
-{r1.text}
-
-Instructions:
-- If the initial answer is already correct and justified, you may keep it.
-- Otherwise, briefly state the likely mistake (one short line).
-- Then output a corrected final line strictly as: Answer: <LETTER>
-Only output at most two short lines and always include the final 'Answer: <LETTER>' line."""
-            r2 = provider.generate(crit)
-            
-            # 2) Distill the behavior into rules
-            distill_prompt = f"""Analyze this Self-Refine correction and extract the implicit rules:
-
-INITIAL ANSWER: {r1.text}
-CORRECTED ANSWER: {r2.text}
-QUESTION: {ex.question}
-CHOICES: {choices_text}
+    # Check for specific answer correction
+    if gepa_answer and sr_answer and gepa_answer != sr_answer:
+        confidence += 0.1
+    
+    # Check for clear reasoning structure
+    if any(word in gepa_output.lower() for word in ["therefore", "thus", "hence", "consequently"]):
+        confidence += 0.1
 
-What rules did the model implicitly follow to fix the error? Make 3-5 concise, enforceable edits (≤3 lines each) that could be appended to the base prompt.
+    return min(confidence, 1.0)
 
-Focus on:
-- Error detection patterns
-- Correction strategies  
-- Format enforcement
-- Reasoning improvements
 
-Output only the rules, one per line, starting with "- "."""
-            
-            distill_result = provider.generate(distill_prompt)
-            
-            # 3) Use the distilled prompt for the final answer
-            enhanced_prompt = prompt + "\n\nDISTILLED RULES:\n" + distill_result.text
-            result = provider.generate(enhanced_prompt)
-            answer = parse_answer_letter(result.text)
-            
-            # Fallback to Self-Refine if distillation fails
-            if answer is None:
-                answer = parse_answer_letter(r2.text)
-                result = r2
-            
-            # Token accounting: count distillation + final call
-            def _tok(u): 
-                if isinstance(u, dict):
-                    return (u.get("input_tokens") or 0, u.get("output_tokens") or 0)
-                return (0, 0)
-            
-            # Count all calls: initial + critique + distillation + final
-            in1, out1 = _tok(r1.usage)
-            in2, out2 = _tok(r2.usage) 
-            in3, out3 = _tok(distill_result.usage)
-            in4, out4 = _tok(result.usage)
-            
-            total_in = in1 + in2 + in3 + in4
-            total_out = out1 + out2 + out3 + out4
-            total_tokens_all_calls = total_in + total_out
-            total_latency = r1.latency_sec + r2.latency_sec + distill_result.latency_sec + result.latency_sec
-                
-        elif strategy == "hybrid":
-            # Hybrid: SR → GEPA Review (2-stage chain)
-            
-            # Token counting helper for hybrid
-            def _tok(u, key, default=0):
-                if isinstance(u, dict):
-                    return u.get(key, default)
-                return default
-            
-            # Build choices text for hybrid prompts
-            choices_text = "\n".join([f"{c['label']}. {c['text']}" for c in ex_for_run.choices])
-            letters = ", ".join([c['label'] for c in ex_for_run.choices])
-            
-            # Dataset-specific prompt tailoring
-            dataset_name = ex.id.split(':')[0] if ':' in ex.id else "unknown"
-            
-            if dataset_name == "truthfulqa":
-                # TruthfulQA: Focus on fact-checking and adversarial trap detection
-                sr_prompt = f"""You are a **fact-checking tutor** specializing in detecting misleading claims.
+def gepa_skip_reasons(sr_text: str, threshold_config: Dict[str, Any]) -> list[str]:
+    """Conditional GEPA gating: return the reasons to skip the review for this SR output (empty = run GEPA)."""
+    reasons = []
+    if not threshold_config.get('conditional_gepa_enabled', True):
+        return reasons
+    sr_text_lower = sr_text.lower()
+    
+    # Check for uncertainty signals
+    uncertainty_signals = threshold_config.get('uncertainty_signals', [
+        "maybe", "uncertain", "not sure", "could be", "might be", 
+        "possibly", "i think", "i believe", "seems like", "appears to"
+    ])
+    if any(signal in sr_text_lower for signal in uncertainty_signals):
+        reasons.append("uncertainty signal")
+    
+    # Check for unusual length
+    sr_word_count = len(sr_text.split())
+    min_tokens = threshold_config.get('min_tokens', 30)
+    max_tokens = threshold_config.get('max_tokens', 200)
+    if sr_word_count < min_tokens or sr_word_count > max_tokens:
+        reasons.append(f"length {sr_word_count} tokens")
+    
+    # Check for lack of reasoning structure
+    reasoning_indicators = threshold_config.get('reasoning_indicators', [
+        "because", "since", "as", "due to", "reason", "logic", 
+        "therefore", "thus", "hence"
+    ])
+    if not any(indicator in sr_text_lower for indicator in reasoning_indicators):
+        reasons.append("no reasoning structure")
+    return reasons
+
+
+def choice_permutation(ex_id: str, n_choices: int, seed: int = 0) -> list[int]:
+    """Display order for an example's choices: original indices sorted by sha256(seed, id, index).
+
+    Unlike hash(), this is the same in every process, so rendered prompts (and anything
+    keyed on them, like the response cache) are reproducible across runs.
+    """
+    return sorted(range(n_choices), key=lambda j: hashlib.sha256(f"{seed}:{ex_id}:{j}".encode("utf-8")).digest())
+
+
+def apply_permutation(ex: Example, perm: list[int]) -> Example:
+    """Copy of ex with its choices in perm order, relabelled A, B, ... and the gold letter moved with them."""
+    gold_label = ex.answer
+    choices, answer = [], None
+    for k, i in enumerate(perm):
+        label = chr(ord('A') + k)
+        choices.append({"label": label, "text": ex.choices[i]["text"]})
+        if ex.choices[i]["label"] == gold_label:
+            answer = label
+    if answer is None:
+        raise ValueError(f"Gold answer {ex.answer!r} of {ex.id} is not one of its choice labels")
+    return Example(ex.id, ex.context, ex.question, choices, answer, perm=list(perm))
+
+
+def shuffle_examples(examples: List[Example], seed: int = 0, path: str | pathlib.Path | None = None) -> List[Example]:
+    """Put every example's choices in its stable display order (choice shuffling prevents label memorization).
+
+    With path set, the permutations for this split are read from / written to a JSON file
+    ({"seed": .., "perms": {id: perm}}) so they are computed once per dataset split.
+    """
+    perms: Dict[str, list[int]] = {}
+    if path is not None:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            # Missing or unreadable: permutations are derived from the id, so just recompute them
+            data = {}
+        if isinstance(data, dict) and data.get("seed") == seed:
+            perms = data.get("perms", {})
+    changed = False
+    out = []
+    for ex in examples:
+        perm = perms.get(ex.id)
+        if perm is None or len(perm) != len(ex.choices):
+            perm = perms[ex.id] = choice_permutation(ex.id, len(ex.choices), seed)
+            changed = True
+        out.append(apply_permutation(ex, perm))
+    if path is not None and changed:
+        path = pathlib.Path(path)
+        ensure_dir(path.parent)
+        # Several processes may load the same split: write a unique temp file and swap it in
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=path.parent, prefix=path.name,
+                                         suffix=".tmp", delete=False) as f:
+            json.dump({"seed": seed, "perms": perms}, f)
+        os.replace(f.name, path)
+    return out
+
+
+def _example_for_run(ex: Example) -> Example:
+    # Examples from load_split arrive shuffled; others get their stable default order here
+    return ex if ex.perm is not None else apply_permutation(ex, choice_permutation(ex.id, len(ex.choices)))
+
+
+def _hybrid_prompts(ex: Example, ex_for_run: Example) -> tuple[str, str]:
+    """Dataset-tailored SR prompt and GEPA review template ({{SR_OUTPUT}} placeholder) for the hybrid strategy."""
+    
+    # Build choices text for hybrid prompts
+    choices_text = "\n".join([f"{c['label']}. {c['text']}" for c in ex_for_run.choices])
+    letters = ", ".join([c['label'] for c in ex_for_run.choices])
+    
+    # Dataset-specific prompt tailoring
+    dataset_name = ex.id.split(':')[0] if ':' in ex.id else "unknown"
+    
+    if dataset_name == "truthfulqa":
+        # TruthfulQA: Focus on fact-checking and adversarial trap detection
+        sr_prompt = f"""You are a **fact-checking tutor** specializing in detecting misleading claims.
 
 For each multiple-choice question:
 1) Restate the question briefly.
@@ -247,10 +287,8 @@ CHOICES:
 
 Allowed answer letters: {letters}
 End with exactly one line: Answer: <LETTER>"""
-                # Update rendered for logging
-                rendered = sr_prompt
-                
-                gepa_review_prompt = f"""You are a **fact-checking auditor** reviewing an answer for accuracy.
+        
+        gepa_review_prompt = f"""You are a **fact-checking auditor** reviewing an answer for accuracy.
 
 Task:
 1) Verify the chosen answer is factually correct and well-supported.
@@ -280,9 +318,9 @@ CHOICES:
 
 Allowed answer letters: {letters}"""
 
-            elif dataset_name == "lsat_lr":
-                # LSAT-LR: Focus on logical reasoning and flaw detection
-                sr_prompt = f"""You are a **logical reasoning tutor** specializing in argument analysis.
+    elif dataset_name == "lsat_lr":
+        # LSAT-LR: Focus on logical reasoning and flaw detection
+        sr_prompt = f"""You are a **logical reasoning tutor** specializing in argument analysis.
 
 For each multiple-choice question:
 1) Restate the question briefly.
@@ -316,10 +354,8 @@ CHOICES:
 
 Allowed answer letters: {letters}
 End with exactly one line: Answer: <LETTER>"""
-                # Update rendered for logging
-                rendered = sr_prompt
-                
-                gepa_review_prompt = f"""You are a **logical reasoning auditor** reviewing an answer for soundness.
+        
+        gepa_review_prompt = f"""You are a **logical reasoning auditor** reviewing an answer for soundness.
 
 Task:
 1) Verify the chosen answer follows logically from the reasoning.
@@ -349,11 +385,11 @@ CHOICES:
 
 Allowed answer letters: {letters}"""
 
-            else:
-                # Generic: Adapt based on whether passage exists
-                if ex.context and ex.context.strip() and ex.context != "No passage provided":
-                    # With passage: Use evidence-based reasoning
-                    sr_prompt = f"""You are a **reading and science tutor**.
+    else:
+        # Generic: Adapt based on whether passage exists
+        if ex.context and ex.context.strip() and ex.context != "No passage provided":
+            # With passage: Use evidence-based reasoning
+            sr_prompt = f"""You are a **reading and science tutor**.
 
 For each multiple-choice question:
 1) Restate the question briefly.
@@ -379,9 +415,9 @@ CHOICES:
 
 Allowed answer letters: {letters}
 End with exactly one line: Answer: <LETTER>"""
-                else:
-                    # Without passage: Use logical reasoning
-                    sr_prompt = f"""You are a **logical reasoning tutor**.
+        else:
+            # Without passage: Use logical reasoning
+            sr_prompt = f"""You are a **logical reasoning tutor**.
 
 For each multiple-choice question:
 1) Restate the question briefly.
@@ -404,12 +440,10 @@ CHOICES:
 
 Allowed answer letters: {letters}
 End with exactly one line: Answer: <LETTER>"""
-                
-                # Update rendered for logging
-                rendered = sr_prompt
-                
-                # Generic GEPA review
-                gepa_review_prompt = f"""You are reviewing an answer from a tutor for a multiple-choice question.
+        
+        
+        # Generic GEPA review
+        gepa_review_prompt = f"""You are reviewing an answer from a tutor for a multiple-choice question.
 
 Task:
 1) Verify the chosen answer is well-reasoned and correct.
@@ -431,266 +465,564 @@ CHOICES:
 {choices_text}
 
 Allowed answer letters: {letters}"""
-
-            sr_result = provider.generate(sr_prompt)
-            sr_tokens = _tok(sr_result.usage, "input_tokens", 0) + _tok(sr_result.usage, "output_tokens", 0)
-            
-            # Format GEPA review prompt with actual SR output
-            gepa_review_prompt_formatted = gepa_review_prompt.replace("{{SR_OUTPUT}}", sr_result.text)
-            
-            # Stage 2: GEPA reviews SR's output and acts as logic auditor
-            gepa_result = provider.generate(gepa_review_prompt_formatted)
-            gepa_tokens = _tok(gepa_result.usage, "input_tokens", 0) + _tok(gepa_result.usage, "output_tokens", 0)
-            
-            # Format lock: Auto-correct GEPA output parsing violations
-            sr_answer = parse_answer_letter(sr_result.text)
-            gepa_answer = parse_answer_letter(gepa_result.text)
-            
-                        # Enhanced error recovery with intelligent confidence scoring
-            def calculate_gepa_confidence(gepa_output, sr_output, sr_answer, gepa_answer):
-                """Calculate confidence score for GEPA override decision"""
-                confidence = 0.0
-
-                # Base confidence from output quality
-                if len(gepa_output.strip()) <= 50:  # Very concise
-                    confidence += 0.2
-                elif len(gepa_output.strip()) <= 100:  # Moderately concise
-                    confidence += 0.15
-
-                # Check if GEPA made a clear correction with reasoning
-                if "correct" in gepa_output.lower() or "wrong" in gepa_output.lower():
-                    confidence += 0.25
-
-                # Check if GEPA provided logical reasoning
-                if any(word in gepa_output.lower() for word in ["because", "since", "as", "due to", "reason", "logic"]):
-                    confidence += 0.2
-
-                # Check if GEPA is very confident (strong language)
-                if any(word in gepa_output.lower() for word in ["clearly", "obviously", "definitely", "certainly", "must", "should"]):
-                    confidence += 0.15
-
-                # Check if GEPA identified a specific flaw in SR's reasoning
-                if any(word in gepa_output.lower() for word in ["flaw", "error", "mistake", "incorrect", "wrong"]):
-                    confidence += 0.25
-
-                # Bonus for very specific corrections
-                if "the answer is" in gepa_output.lower() and gepa_answer != sr_answer:
-                    confidence += 0.1
-
-                # PHASE 3.4: Additional confidence factors based on analysis
-                # Check for strong disagreement language
-                if any(word in gepa_output.lower() for word in ["incorrect", "wrong", "mistake", "error"]):
-                    confidence += 0.15
-                
-                # Check for specific answer correction
-                if gepa_answer and sr_answer and gepa_answer != sr_answer:
-                    confidence += 0.1
-                
-                # Check for clear reasoning structure
-                if any(word in gepa_output.lower() for word in ["therefore", "thus", "hence", "consequently"]):
-                    confidence += 0.1
-
-                return min(confidence, 1.0)
-            
-            # Calculate confidence for GEPA override
-            gepa_confidence = calculate_gepa_confidence(gepa_result.text, sr_result.text, sr_answer, gepa_answer)
-            
-            # PHASE 4: Enhanced Threshold Management with Conditional Execution
-            # Load threshold configuration if available
-            threshold_config = getattr(provider, 'threshold_config', {})
-            confidence_threshold = threshold_config.get('confidence_threshold', 0.80)  # Default fallback
-            conditional_gepa_enabled = threshold_config.get('conditional_gepa_enabled', True)
-            explicit_invalidation_required = threshold_config.get('explicit_invalidation_required', True)
-            
-            # Conditional GEPA execution: Skip if SR output shows uncertainty
-            should_skip_gepa = False
-            if conditional_gepa_enabled:
-                sr_text_lower = sr_result.text.lower()
-                
-                # Check for uncertainty signals
-                uncertainty_signals = threshold_config.get('uncertainty_signals', [
-                    "maybe", "uncertain", "not sure", "could be", "might be", 
-                    "possibly", "i think", "i believe", "seems like", "appears to"
-                ])
-                
-                if any(signal in sr_text_lower for signal in uncertainty_signals):
-                    should_skip_gepa = True
-                    print(f"GEPA SKIPPED (uncertainty signal): {ex.id}")
-                
-                # Check for unusual length
-                sr_tokens = len(sr_result.text.split())
-                min_tokens = threshold_config.get('min_tokens', 30)
-                max_tokens = threshold_config.get('max_tokens', 200)
-                
-                if sr_tokens < min_tokens or sr_tokens > max_tokens:
-                    should_skip_gepa = True
-                    print(f"GEPA SKIPPED (length {sr_tokens} tokens): {ex.id}")
-                
-                # Check for lack of reasoning structure
-                reasoning_indicators = threshold_config.get('reasoning_indicators', [
-                    "because", "since", "as", "due to", "reason", "logic", 
-                    "therefore", "thus", "hence"
-                ])
-                
-                if not any(indicator in sr_text_lower for indicator in reasoning_indicators):
-                    should_skip_gepa = True
-                    print(f"GEPA SKIPPED (no reasoning structure): {ex.id}")
-            
-            if should_skip_gepa:
-                # Skip GEPA execution - use SR's answer directly
-                result = sr_result
-                answer = sr_answer
-                gepa_confidence = 0.0  # Mark as skipped
-                print(f"GEPA execution skipped for {ex.id}, using SR: {sr_answer}")
-            elif gepa_answer is not None and gepa_answer != sr_answer:
-                # GEPA made a change - use it if it's valid AND confident enough
-                if any(gepa_answer == c['label'] for c in ex_for_run.choices):
-                    # Enhanced threshold management with dataset-specific overrides
-                    if gepa_confidence >= confidence_threshold:
-                        # Check explicit invalidation if required
-                        if explicit_invalidation_required:
-                            gepa_text_lower = gepa_result.text.lower()
-                            invalidation_keywords = threshold_config.get('invalidation_keywords', [
-                                "incorrect", "wrong", "not supported", "invalid", "false", 
-                                "misleading", "unsupported", "factually wrong", "logically flawed",
-                                "error", "mistake"
-                            ])
-                            explicit_invalidation = any(word in gepa_text_lower for word in invalidation_keywords)
-                            
-                            if explicit_invalidation:
-                                result = gepa_result
-                                answer = gepa_answer
-                                print(f"GEPA OVERRIDE (conf: {gepa_confidence:.2f}, threshold: {confidence_threshold:.2f}, explicit invalidation): {sr_answer} → {gepa_answer} for {ex.id}")
-                            else:
-                                # High confidence but no explicit invalidation - stick with SR
-                                result = sr_result
-                                answer = sr_answer
-                                print(f"GEPA high confidence ({gepa_confidence:.2f}) but no explicit invalidation, using SR: {sr_answer} for {ex.id}")
-                        else:
-                            # Explicit invalidation not required - use GEPA if confident enough
+    return sr_prompt, gepa_review_prompt
+
+
+def _finish_row(ex: Example, answer: str | None, result: ModelOutput, usage_data: Any, latency_sec: float, rendered: str) -> Dict[str, Any]:
+    """Score the final output against the gold letter of the example as displayed (ex_for_run)."""
+    # Format linter: mark non-compliant outputs as incorrect even if letter is right
+    format_compliant = True
+    if answer is not None:
+        violation = format_violation(result.text)
+        if violation is not None:
+            format_compliant = False
+            print(f"Format violation in {ex.id}: '{violation}'")
+    
+    is_correct = 1 if (answer == ex.answer and format_compliant) else 0
+
+    row = {
+        "id": ex.id,
+        "answer_gold": ex.answer,
+        "answer_pred": answer,
+        "correct": is_correct,
+        "latency_sec": latency_sec,
+        "usage": usage_data,
+        "raw_text": result.text,
+        "prompt_rendered": rendered
+    }
+    return row
+
+
+async def _ahybrid_sr_stage(provider: Provider, ex: Example) -> Dict[str, Any]:
+    """Hybrid stage 1: the SR call plus the gating decision on its output."""
+    ex_for_run = _example_for_run(ex)
+    sr_prompt, gepa_review_prompt = _hybrid_prompts(ex, ex_for_run)
+    sr_result = await provider.agenerate(sr_prompt, stop_at_answer=True)
+
+    # Conditional GEPA execution: decide on the SR output alone, before paying for the review call
+    threshold_config = getattr(provider, 'threshold_config', {})
+    skip_reasons = gepa_skip_reasons(sr_result.text, threshold_config)
+    for reason in skip_reasons:
+        print(f"GEPA SKIPPED ({reason}): {ex.id}")
+    return {"ex": ex, "ex_for_run": ex_for_run, "sr_prompt": sr_prompt, "gepa_review_prompt": gepa_review_prompt,
+            "sr_result": sr_result, "skip_reasons": skip_reasons}
+
+
+async def _ahybrid_review_stage(provider: Provider, state: Dict[str, Any]) -> Dict[str, Any]:
+    """Hybrid stage 2: the GEPA review (unless gated off) and the override decision; returns the record row."""
+    ex, ex_for_run, sr_result = state["ex"], state["ex_for_run"], state["sr_result"]
+    gepa_review_prompt = state["gepa_review_prompt"]
+    sr_answer = parse_answer_letter(sr_result.text)
+
+    # PHASE 4: Enhanced Threshold Management with Conditional Execution
+    # Load threshold configuration if available
+    threshold_config = getattr(provider, 'threshold_config', {})
+    confidence_threshold = threshold_config.get('confidence_threshold', 0.80)  # Default fallback
+    explicit_invalidation_required = threshold_config.get('explicit_invalidation_required', True)
+    should_skip_gepa = bool(state["skip_reasons"])
+
+    if should_skip_gepa:
+        # Skip GEPA execution - use SR's answer directly
+        gepa_result = ModelOutput(text="", usage={"input_tokens": 0, "output_tokens": 0}, latency_sec=0.0)
+        gepa_answer = None
+        result = sr_result
+        answer = sr_answer
+        gepa_confidence = 0.0  # Mark as skipped
+        print(f"GEPA execution skipped for {ex.id}, using SR: {sr_answer}")
+    else:
+        # Format GEPA review prompt with actual SR output
+        gepa_review_prompt_formatted = gepa_review_prompt.replace("{{SR_OUTPUT}}", sr_result.text)
+        
+        # Stage 2: GEPA reviews SR's output and acts as logic auditor
+        gepa_result = await provider.agenerate(gepa_review_prompt_formatted, stop_at_answer=True)
+        
+        # Format lock: Auto-correct GEPA output parsing violations
+        gepa_answer = parse_answer_letter(gepa_result.text)
+        
+        # Calculate confidence for GEPA override
+        gepa_confidence = calculate_gepa_confidence(gepa_result.text, sr_result.text, sr_answer, gepa_answer)
+        
+        if gepa_answer is not None and gepa_answer != sr_answer:
+            # GEPA made a change - use it if it's valid AND confident enough
+            if any(gepa_answer == c['label'] for c in ex_for_run.choices):
+                # Enhanced threshold management with dataset-specific overrides
+                if gepa_confidence >= confidence_threshold:
+                    # Check explicit invalidation if required
+                    if explicit_invalidation_required:
+                        if has_explicit_invalidation(gepa_result.text, threshold_config):
                             result = gepa_result
                             answer = gepa_answer
-                            print(f"GEPA OVERRIDE (conf: {gepa_confidence:.2f}, threshold: {confidence_threshold:.2f}): {sr_answer} → {gepa_answer} for {ex.id}")
+                            print(f"GEPA OVERRIDE (conf: {gepa_confidence:.2f}, threshold: {confidence_threshold:.2f}, explicit invalidation): {sr_answer} → {gepa_answer} for {ex.id}")
+                        else:
+                            # High confidence but no explicit invalidation - stick with SR
+                            result = sr_result
+                            answer = sr_answer
+                            print(f"GEPA high confidence ({gepa_confidence:.2f}) but no explicit invalidation, using SR: {sr_answer} for {ex.id}")
                     else:
-                        # Below confidence threshold - stick with SR
-                        result = sr_result
-                        answer = sr_answer
-                        print(f"GEPA below threshold ({gepa_confidence:.2f} < {confidence_threshold:.2f}), using SR: {sr_answer} for {ex.id}")
+                        # Explicit invalidation not required - use GEPA if confident enough
+                        result = gepa_result
+                        answer = gepa_answer
+                        print(f"GEPA OVERRIDE (conf: {gepa_confidence:.2f}, threshold: {confidence_threshold:.2f}): {sr_answer} → {gepa_answer} for {ex.id}")
                 else:
-                    # GEPA's answer is invalid, fall back to SR
+                    # Below confidence threshold - stick with SR
                     result = sr_result
                     answer = sr_answer
-                    print(f"GEPA invalid answer '{gepa_answer}', using SR: {sr_answer} for {ex.id}")
+                    print(f"GEPA below threshold ({gepa_confidence:.2f} < {confidence_threshold:.2f}), using SR: {sr_answer} for {ex.id}")
             else:
-                # No change or GEPA couldn't parse - use SR's answer
+                # GEPA's answer is invalid, fall back to SR
                 result = sr_result
                 answer = sr_answer
-                if gepa_answer is None:
-                    print(f"GEPA couldn't parse answer, using SR: {sr_answer} for {ex.id}")
-                else:
-                    print(f"GEPA no change, using SR: {sr_answer} for {ex.id}")
-            
-            # Calculate total tokens for both stages
-            total_input_tokens = sr_tokens + gepa_tokens
-            total_output_tokens = _tok(sr_result.usage, "output_tokens", 0) + _tok(gepa_result.usage, "output_tokens", 0)
-            total_tokens_all_calls = total_input_tokens + total_output_tokens
-            
-            # Calculate total latency
-            total_latency = sr_result.latency_sec + gepa_result.latency_sec
-            
-            # Store both outputs for analysis
-            sr_output = sr_result.text
-            gepa_output = gepa_result.text
-                
+                print(f"GEPA invalid answer '{gepa_answer}', using SR: {sr_answer} for {ex.id}")
         else:
-            raise ValueError(f"Unknown strategy: {strategy}")
+            # No change or GEPA couldn't parse - use SR's answer
+            result = sr_result
+            answer = sr_answer
+            if gepa_answer is None:
+                print(f"GEPA couldn't parse answer, using SR: {sr_answer} for {ex.id}")
+            else:
+                print(f"GEPA no change, using SR: {sr_answer} for {ex.id}")
+    
+    # Calculate total tokens for both stages
+    total_input_tokens, total_output_tokens, total_tokens_all_calls = hybrid_token_totals(sr_result.usage, gepa_result.usage)
+    
+    # Calculate total latency
+    total_latency = sr_result.latency_sec + gepa_result.latency_sec
+    
+    # Store both outputs for analysis
+    sr_output = sr_result.text
+    gepa_output = gepa_result.text
+
+    usage_data = {
+        "sr_call": sr_result.usage,
+        "gepa_call": gepa_result.usage,
+        "sr_output": sr_output,
+        "gepa_output": gepa_output,
+        "total_input_tokens": total_input_tokens,
+        "total_output_tokens": total_output_tokens,
+        "total_tokens_all_calls": total_tokens_all_calls,
+        "gepa_confidence": gepa_confidence,  # PHASE 3.4: Log confidence for analysis
+        "gepa_skipped": should_skip_gepa,
+    }
+    latency_sec = total_latency
+    return _finish_row(ex_for_run, answer, result, usage_data, latency_sec, state["sr_prompt"])
+
+
+async def _aeval_example(provider: Provider, base_prompt: str, ex: Example, strategy: str) -> Dict[str, Any]:
+    """Evaluate a single example and return its record row."""
+    if strategy == "hybrid":
+        # The same two stages arun_eval pipelines across examples
+        return await _ahybrid_review_stage(provider, await _ahybrid_sr_stage(provider, ex))
+
+    ex_for_run = _example_for_run(ex)
+    prompt = render_mcq_prompt(base_prompt, ex_for_run)
+    rendered = prompt
+    
+    if strategy == "baseline":
+        result = await provider.agenerate(prompt, stop_at_answer=True)
+        answer = parse_answer_letter(result.text)
         
-        # Format linter: mark non-compliant outputs as incorrect even if letter is right
-        format_compliant = True
-        if answer is not None:
-            # Check if the final line follows the exact format
-            lines = result.text.strip().split('\n')
-            if lines:
-                final_line = lines[-1].strip()
-                if not re.match(r'^Answer:\s*[A-J]\s*$', final_line, re.IGNORECASE):
-                    format_compliant = False
-                    print(f"Format violation in {ex.id}: '{final_line}'")
+    elif strategy == "self_refine":
+        # 1) initial
+        r1 = await provider.agenerate(prompt, stop_at_answer=True)
+
+        # 2) critique + revise with full context
+        choices_text = "\n".join([f"{c['label']}. {c['text']}" for c in ex_for_run.choices])
+        crit = f"""You will critique and revise an answer to a multiple-choice question.
+
+PASSAGE:
+{ex.context or "(no passage)"}
+
+QUESTION:
+{ex.question}
+
+CHOICES:
+{choices_text}
+
+INITIAL ANSWER:
+{r1.text}
+
+Instructions:
+- If the initial answer is already correct and justified, you may keep it.
+- Otherwise, briefly state the likely mistake (one short line).
+- Then output a corrected final line strictly as: Answer: <LETTER>
+Only output at most two short lines and always include the final 'Answer: <LETTER>' line."""
+        r2 = await provider.agenerate(crit, stop_at_answer=True)
+        result = r2
+        answer = parse_answer_letter(result.text)
+
+        # Guardrail: if revision didn't yield a letter, fall back to initial
+        if answer is None:
+            answer = parse_answer_letter(r1.text)
+
+        # --- NEW: fair token & latency accounting ---
+        def _tok(u): 
+            if isinstance(u, dict):
+                return (u.get("input_tokens") or 0, u.get("output_tokens") or 0)
+            return (0, 0)
+
+        in1, out1 = _tok(r1.usage); in2, out2 = _tok(r2.usage)
+        total_in = in1 + in2
+        total_out = out1 + out2
+        total_tokens_all_calls = total_in + total_out
+        total_latency = r1.latency_sec + r2.latency_sec
+            
+    elif strategy == "distill_from_self_refine":
+        # Use Self-Refine's correct traces to distill into a single-call prompt
+        # This is a special mode that runs Self-Refine first, then distills the behavior
         
-        is_correct = 1 if (answer == ex.answer and format_compliant) else 0
-        correct += is_correct
+        # 1) Run Self-Refine to get correct traces
+        r1 = await provider.agenerate(prompt, stop_at_answer=True)
+        choices_text = "\n".join([f"{c['label']}. {c['text']}" for c in ex_for_run.choices])
+        crit = f"""You will critique and revise an answer to a multiple-choice question.
+
+PASSAGE:
+{ex.context or "(no passage)"}
+
+QUESTION:
+{ex.question}
+
+CHOICES:
+{choices_text}
+
+INITIAL ANSWER:
+{r1.text}
+
+Instructions:
+- If the initial answer is already correct and justified, you may keep it.
+- Otherwise, briefly state the likely mistake (one short line).
+- Then output a corrected final line strictly as: Answer: <LETTER>
+Only output at most two short lines and always include the final 'Answer: <LETTER>' line."""
+        r2 = await provider.agenerate(crit, stop_at_answer=True)
         
-        # Handle token accounting based on strategy
-        if strategy == "self_refine":
-            # Use total tokens from both calls for Self-Refine
-            tokens_out = total_tokens_all_calls
-            usage_data = {
-                "call1": r1.usage, 
-                "call2": r2.usage,
-                "total_input_tokens": total_in,
-                "total_output_tokens": total_out,
-                "total_tokens_all_calls": total_tokens_all_calls,
-            }
-            latency_sec = total_latency
-        elif strategy == "distill_from_self_refine":
-            # Use total tokens from all four calls for distillation
-            tokens_out = total_tokens_all_calls
-            usage_data = {
-                "call1": r1.usage,
-                "call2": r2.usage,
-                "distillation": distill_result.usage,
-                "final": result.usage,
-                "total_input_tokens": total_in,
-                "total_output_tokens": total_out,
-                "total_tokens_all_calls": total_tokens_all_calls,
-            }
-            latency_sec = total_latency
-        elif strategy == "hybrid":
-            # Use total tokens from both SR and GEPA calls for hybrid
-            tokens_out = total_tokens_all_calls
-            usage_data = {
-                "sr_call": sr_result.usage,
-                "gepa_call": gepa_result.usage,
-                "sr_output": sr_output,
-                "gepa_output": gepa_output,
-                "total_input_tokens": total_input_tokens,
-                "total_output_tokens": total_output_tokens,
-                "total_tokens_all_calls": total_tokens_all_calls,
-                "gepa_confidence": gepa_confidence,  # PHASE 3.4: Log confidence for analysis
-            }
-            latency_sec = total_latency
-        else:
-            # Single call for baseline/GEPA
-            if isinstance(result.usage, dict):
-                tokens_out = result.usage.get("output_tokens") or result.usage.get("total_tokens", 0)
-            else:
-                tokens_out = 0
-            usage_data = result.usage
-            latency_sec = result.latency_sec
+        # 2) Distill the behavior into rules
+        distill_prompt = f"""Analyze this Self-Refine correction and extract the implicit rules:
+
+INITIAL ANSWER: {r1.text}
+CORRECTED ANSWER: {r2.text}
+QUESTION: {ex.question}
+CHOICES: {choices_text}
+
+What rules did the model implicitly follow to fix the error? Make 3-5 concise, enforceable edits (≤3 lines each) that could be appended to the base prompt.
+
+Focus on:
+- Error detection patterns
+- Correction strategies  
+- Format enforcement
+- Reasoning improvements
+
+Output only the rules, one per line, starting with "- "."""
         
-        rows.append({
-            "id": ex.id,
-            "answer_gold": ex.answer,
-            "answer_pred": answer,
-            "correct": is_correct,
-            "latency_sec": latency_sec,
-            "usage": usage_data,
-            "raw_text": result.text,
-            "prompt_rendered": sr_prompt if strategy == "hybrid" else rendered
-        })
+        distill_result = await provider.agenerate(distill_prompt)
         
-        latency_list.append(latency_sec)
-        if tokens_out is not None:
-            tokens_list.append(tokens_out)
-    
-    acc = correct / len(examples) if examples else 0.0
-    avg_tokens = statistics.mean(tokens_list) if tokens_list else None
-    avg_latency = statistics.mean(latency_list) if latency_list else 0.0
-    rec_path = pathlib.Path(out_dir) / "records.jsonl"
-    write_jsonl(rec_path, rows)
-    
+        # 3) Use the distilled prompt for the final answer
+        enhanced_prompt = prompt + "\n\nDISTILLED RULES:\n" + distill_result.text
+        result = await provider.agenerate(enhanced_prompt, stop_at_answer=True)
+        answer = parse_answer_letter(result.text)
+        
+        # Fallback to Self-Refine if distillation fails
+        if answer is None:
+            answer = parse_answer_letter(r2.text)
+            result = r2
+        
+        # Token accounting: count distillation + final call
+        def _tok(u): 
+            if isinstance(u, dict):
+                return (u.get("input_tokens") or 0, u.get("output_tokens") or 0)
+            return (0, 0)
+        
+        # Count all calls: initial + critique + distillation + final
+        in1, out1 = _tok(r1.usage)
+        in2, out2 = _tok(r2.usage) 
+        in3, out3 = _tok(distill_result.usage)
+        in4, out4 = _tok(result.usage)
+        
+        total_in = in1 + in2 + in3 + in4
+        total_out = out1 + out2 + out3 + out4
+        total_tokens_all_calls = total_in + total_out
+        total_latency = r1.latency_sec + r2.latency_sec + distill_result.latency_sec + result.latency_sec
+
+    else:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    # Handle token accounting based on strategy (record_tokens_out reads total_tokens_all_calls)
+    if strategy == "self_refine":
+        # Use total tokens from both calls for Self-Refine
+        usage_data = {
+            "call1": r1.usage, 
+            "call2": r2.usage,
+            "total_input_tokens": total_in,
+            "total_output_tokens": total_out,
+            "total_tokens_all_calls": total_tokens_all_calls,
+        }
+        latency_sec = total_latency
+    elif strategy == "distill_from_self_refine":
+        # Use total tokens from all four calls for distillation
+        usage_data = {
+            "call1": r1.usage,
+            "call2": r2.usage,
+            "distillation": distill_result.usage,
+            "final": result.usage,
+            "total_input_tokens": total_in,
+            "total_output_tokens": total_out,
+            "total_tokens_all_calls": total_tokens_all_calls,
+        }
+        latency_sec = total_latency
+    else:
+        # Single call for baseline/GEPA
+        usage_data = result.usage
+        latency_sec = result.latency_sec
+
+    return _finish_row(ex_for_run, answer, result, usage_data, latency_sec, rendered)
+
+
+
+def record_tokens_out(row: Dict[str, Any]) -> float | None:
+    """Tokens an evaluated record counts toward avg_tokens_out (all calls for multi-call strategies)."""
+    usage = row.get("usage")
+    if not isinstance(usage, dict):
+        return 0
+    if "total_tokens_all_calls" in usage:
+        return usage["total_tokens_all_calls"]
+    # Single call for baseline/GEPA
+    return usage.get("output_tokens") or usage.get("total_tokens", 0)
+
+
+def summarize_records(rec_path: str | pathlib.Path) -> EvalResult:
+    """Recompute EvalResult aggregates from a records.jsonl file, one row at a time."""
+    n = correct = n_errors = 0
+    latency_total = 0.0
+    tokens_total, tokens_n = 0.0, 0
+    with open(rec_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if row.get("error"):
+                # Provider failures are not wrong answers; keep them out of every aggregate
+                n_errors += 1
+                continue
+            n += 1
+            correct += row["correct"]
+            latency_total += row["latency_sec"]
+            tokens_out = record_tokens_out(row)
+            if tokens_out is not None:
+                tokens_total += tokens_out
+                tokens_n += 1
     return EvalResult(
-        accuracy=acc, 
-        avg_tokens_out=avg_tokens, 
-        avg_latency_sec=avg_latency, 
-        records_path=str(rec_path)
+        accuracy=correct / n if n else 0.0, 
+        avg_tokens_out=tokens_total / tokens_n if tokens_n else None, 
+        avg_latency_sec=latency_total / n if n else 0.0, 
+        records_path=str(rec_path),
+        n_errors=n_errors
     )
+
+
+def error_record(ex: Example, exc: BaseException) -> Dict[str, Any]:
+    """Record for an example whose provider calls failed; summarize_records skips it and --resume retries it."""
+    return {
+        "id": ex.id,
+        "answer_gold": ex.answer,
+        "answer_pred": None,
+        "correct": 0,
+        "latency_sec": 0.0,
+        "usage": {},
+        "raw_text": "",
+        "prompt_rendered": "",
+        "error": f"{type(exc).__name__}: {exc}",
+    }
+
+
+class StageMetrics:
+    """Throughput bookkeeping for one stage of the hybrid pipeline."""
+    def __init__(self):
+        self.items = 0
+        self.calls = 0
+        self.busy_sec = 0.0
+        self.queue_wait_sec = 0.0
+        self.max_queue_depth = 0
+        self.first_start = None
+        self.last_end = None
+
+    def record(self, started: float, ended: float, queued_at: float, called: bool = True):
+        self.items += 1
+        self.calls += int(called)
+        self.busy_sec += ended - started
+        self.queue_wait_sec += started - queued_at
+        self.first_start = started if self.first_start is None else min(self.first_start, started)
+        self.last_end = ended if self.last_end is None else max(self.last_end, ended)
+
+    def summary(self) -> Dict[str, Any]:
+        span = (self.last_end - self.first_start) if self.items else 0.0
+        return {
+            "items": self.items,
+            "provider_calls": self.calls,
+            "active_sec": span,
+            "throughput_per_sec": self.items / span if span > 0 else None,
+            "avg_service_sec": self.busy_sec / self.items if self.items else None,
+            "avg_queue_wait_sec": self.queue_wait_sec / self.items if self.items else None,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+
+async def _arun_hybrid_pipeline(provider: Provider, pending: List[Example], workers: int, emit) -> Dict[str, Any]:
+    """Run the hybrid strategy as two stages with their own queues and worker pools.
+
+    SR workers feed finished SR outputs into a bounded review queue, so SR calls for upcoming
+    examples are in flight while GEPA reviews for earlier ones run. Each stage has `workers`
+    workers; emit(idx, row) receives rows as reviews finish.
+    """
+    sr_queue: asyncio.Queue = asyncio.Queue()
+    review_queue: asyncio.Queue = asyncio.Queue(maxsize=workers)  # backpressure: SR runs at most one batch ahead
+    sr_metrics, review_metrics = StageMetrics(), StageMetrics()
+    t0 = time.time()
+    for idx, ex in enumerate(pending):
+        sr_queue.put_nowait((idx, ex, t0))
+    sr_metrics.max_queue_depth = sr_queue.qsize()
+
+    async def sr_worker():
+        while True:
+            try:
+                idx, ex, queued_at = sr_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.time()
+            try:
+                state = await _ahybrid_sr_stage(provider, ex)
+            except ProviderError as e:
+                print(f"Example {ex.id} failed: {e}")
+                sr_metrics.record(started, time.time(), queued_at)
+                emit(idx, error_record(ex, e))
+                continue
+            ended = time.time()
+            sr_metrics.record(started, ended, queued_at)
+            await review_queue.put((idx, state, ended))
+            review_metrics.max_queue_depth = max(review_metrics.max_queue_depth, review_queue.qsize())
+
+    async def review_worker():
+        while True:
+            item = await review_queue.get()
+            if item is None:
+                return
+            idx, state, queued_at = item
+            started = time.time()
+            try:
+                row = await _ahybrid_review_stage(provider, state)
+            except ProviderError as e:
+                print(f"Example {state['ex'].id} failed: {e}")
+                row = error_record(state["ex"], e)
+            review_metrics.record(started, time.time(), queued_at, called=not state["skip_reasons"])
+            emit(idx, row)
+
+    producers = [asyncio.create_task(sr_worker()) for _ in range(workers)]
+    reviewers = [asyncio.create_task(review_worker()) for _ in range(workers)]
+
+    async def close_reviews():
+        await asyncio.gather(*producers)
+        for _ in reviewers:
+            await review_queue.put(None)
+
+    tasks = producers + reviewers + [asyncio.create_task(close_reviews())]
+    try:
+        # An unexpected error in either stage fails the run instead of leaving the other stage
+        # blocked on its queue: stop at the first one and cancel the remaining workers
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for t in tasks:
+            if t.done() and not t.cancelled() and t.exception() is not None:
+                raise t.exception()
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    wall = time.time() - t0
+    return {
+        "workers_per_stage": workers,
+        "wall_sec": wall,
+        "throughput_per_sec": len(pending) / wall if wall > 0 else None,
+        "sr": sr_metrics.summary(),
+        "review": review_metrics.summary(),
+    }
+
+
+async def arun_eval(provider: Provider, base_prompt: str, examples: List[Example], strategy: str = "baseline", self_refine_steps: int = 1, out_dir: str = "runs/tmp", max_concurrency: int = 1, resume: bool = False, controller: AIMDController | None = None, store: ResultStore | None = None) -> EvalResult:
+    ensure_dir(out_dir)
+    rec_path = pathlib.Path(out_dir) / "records.jsonl"
+
+    # Resume: keep the rows already on disk (minus any half-written tail and failed examples) and skip their ids
+    done_ids = set()
+    if resume and rec_path.exists():
+        done_rows = [r for r in read_jsonl(rec_path) if not r.get("error")]
+        write_jsonl(rec_path, done_rows)
+        done_ids = {r["id"] for r in done_rows}
+        del done_rows
+        print(f"Resuming {rec_path}: {len(done_ids)} records already complete")
+    else:
+        write_jsonl(rec_path, [])
+    pending = [ex for ex in examples if ex.id not in done_ids]
+
+    # Result store: (prompt, example) pairs already scored are written back without provider calls
+    keys, stored = [], {}
+    if store is not None and pending:
+        threshold_config = getattr(provider, "threshold_config", None) if strategy == "hybrid" else None
+        keys = [store.key(base_prompt, ex, strategy, threshold_config) for ex in pending]
+        stored = await asyncio.to_thread(store.get_many, keys)
+        if stored:
+            print(f"Result store: {len(stored)} of {len(pending)} examples already scored")
+    misses = [(idx, ex) for idx, ex in enumerate(pending) if not keys or keys[idx] not in stored]
+
+    # Keep up to max_concurrency examples in flight on this event loop. Finished rows are
+    # appended as soon as every earlier example is written, so the file keeps input order
+    # and only out-of-order completions are held in memory.
+    if controller is not None:
+        # Adaptive mode: the controller's window bounds in-flight provider calls;
+        # enough examples are started to fill its largest window
+        provider = ControlledProvider(provider, controller)
+        max_concurrency = controller.max_window
+    sem = asyncio.Semaphore(max(1, max_concurrency))
+    finished: Dict[int, Dict[str, Any]] = {}
+    next_idx = 0
+
+    stage_metrics = None
+
+    with JsonlAppender(rec_path) as writer:
+        def _emit(idx, row):
+            nonlocal next_idx
+            finished[idx] = row
+            while next_idx in finished:
+                writer.write(finished.pop(next_idx))
+                next_idx += 1
+
+        def _emit_new(idx, row):
+            if store is not None:
+                store.put(keys[idx], strategy, row)
+            _emit(idx, row)
+
+        for idx, key in enumerate(keys):
+            if key in stored:
+                _emit(idx, stored[key])
+
+        async def _one(idx, ex):
+            async with sem:
+                try:
+                    row = await _aeval_example(provider, base_prompt, ex, strategy)
+                except ProviderError as e:
+                    print(f"Example {ex.id} failed: {e}")
+                    row = error_record(ex, e)
+            _emit_new(idx, row)
+
+        if strategy == "hybrid":
+            # SR and GEPA review run as separate stages, max_concurrency workers each
+            stage_metrics = await _arun_hybrid_pipeline(provider, [ex for _, ex in misses], max(1, max_concurrency),
+                                                        lambda j, row: _emit_new(misses[j][0], row))
+        else:
+            await asyncio.gather(*[_one(i, ex) for i, ex in misses])
+
+    if store is not None:
+        # Commit this run's rows before reporting it, so the next run sees all of them
+        await asyncio.to_thread(store.flush)
+    result = summarize_records(rec_path)
+    result.stage_metrics = stage_metrics
+    return result
+
+
+def run_eval(provider: Provider, base_prompt: str, examples: List[Example], strategy: str = "baseline", self_refine_steps: int = 1, out_dir: str = "runs/tmp", max_concurrency: int = 1, resume: bool = False, controller: AIMDController | None = None, store: ResultStore | None = None) -> EvalResult:
+    return asyncio.run(run_and_close(provider, arun_eval(provider, base_prompt, examples, strategy=strategy, self_refine_steps=self_refine_steps, out_dir=out_dir, max_concurrency=max_concurrency, resume=resume, controller=controller, store=store)))
@@ -0,0 +1,92 @@
+"""
+Diverse failure selection for GEPA reflection.
+
+Failed rows are embedded as hashed TF-IDF vectors over their question and choices, then
+picked by farthest-point sampling: start from the failure closest to the centroid (the most
+typical one) and repeatedly add the failure least similar to everything picked so far,
+skipping any whose reflection snippet no longer fits the token budget. Hashing keeps memory
+at n x dims, so selection stays fast on tens of thousands of rows.
+
+The token budget, not a failure count, is what bounds reflection: map-reduce reflection
+splits whatever is selected into chunks, so k is only an optional cap on top of it.
+"""
+import json, math, re, zlib
+from collections import Counter
+from typing import List, Dict, Any
+from .reflect_and_edit import count_tokens, fail_snippets
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def failure_text(row: Dict[str, Any]) -> str:
+    choices = " ".join(c.get("text", "") for c in row.get("choices_parsed", []) or [])
+    return f"{row.get('question', '')} {choices}"
+
+
+def tfidf_vectors(texts: List[str], dims: int = 512):
+    """L2-normalized hashed TF-IDF rows (n x dims, float32)."""
+    import numpy as np  # only needed once GEPA reflects; keep it off the startup path
+    docs = [Counter(_WORD.findall(t.lower())) for t in texts]
+    df = Counter(w for d in docs for w in d)
+    n = len(docs)
+    idf = {w: math.log((1 + n) / (1 + c)) + 1.0 for w, c in df.items()}
+    # crc32, not hash(): str hashes are salted per process and selection must be reproducible
+    col = {w: zlib.crc32(w.encode("utf-8")) % dims for w in df}
+    X = np.zeros((n, dims), dtype=np.float32)
+    for i, d in enumerate(docs):
+        for w, tf in d.items():
+            X[i, col[w]] += (1.0 + math.log(tf)) * idf[w]
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    return X / np.maximum(norms, 1e-12)
+
+
+def snippet_costs(failed_rows: List[Dict[str, Any]], max_context_tokens: int | None = 400, model_id: str | None = None) -> List[int]:
+    """Tokens each failure costs as reflection will see it."""
+    return [count_tokens(json.dumps(s, ensure_ascii=False), model_id) + 1
+            for s in fail_snippets(failed_rows, max_context_tokens, model_id)]
+
+
+def first_failures(failed_rows: List[Dict[str, Any]], k: int | None = None, token_budget: int | None = None,
+                   max_context_tokens: int | None = 400, model_id: str | None = None) -> List[Dict[str, Any]]:
+    """The longest dev-order prefix of failures that fits token_budget (and k, when set)."""
+    rows = failed_rows if k is None else failed_rows[:k]
+    if not token_budget:
+        return rows
+    picked, used = [], 0
+    for row, cost in zip(rows, snippet_costs(rows, max_context_tokens, model_id)):
+        if used + cost > token_budget:
+            break
+        picked.append(row)
+        used += cost
+    return picked
+
+
+def select_failures(failed_rows: List[Dict[str, Any]], k: int | None = None, token_budget: int | None = None, dims: int = 512,
+                    max_context_tokens: int | None = 400, model_id: str | None = None) -> List[Dict[str, Any]]:
+    """Diverse failures whose reflection snippets fit token_budget together (at most k when set), in pick order."""
+    if k is None:
+        k = len(failed_rows)
+    if not failed_rows or k <= 0:
+        return []
+    import numpy as np
+    costs = np.array(snippet_costs(failed_rows, max_context_tokens, model_id), dtype=np.float64)
+    budget = float(token_budget) if token_budget else math.inf
+    X = tfidf_vectors([failure_text(r) for r in failed_rows], dims)
+    centroid = X.mean(axis=0)
+    # Distance of every row to its nearest picked row (cosine distance on unit vectors)
+    nearest = np.full(len(failed_rows), np.inf)
+    first = (X @ centroid).copy()
+    picked: List[int] = []
+    used = 0.0
+    while len(picked) < k:
+        score = first if not picked else nearest
+        score = np.where(costs <= budget - used, score, -np.inf)
+        if picked:
+            score[picked] = -np.inf
+        i = int(np.argmax(score))
+        if not np.isfinite(score[i]):
+            break
+        picked.append(i)
+        used += costs[i]
+        nearest = np.minimum(nearest, 1.0 - X @ X[i])
+    return [failed_rows[i] for i in picked]
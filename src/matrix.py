@@ -0,0 +1,187 @@
+"""
+Dataset x mode evaluation matrix in one process.
+
+Every (dataset, mode) job runs as a task on one event loop against one provider stack, so
+the rate limiter, retries, response cache and adaptive concurrency controller form a
+single budget for all jobs. A SharedCallProvider makes identical calls once across jobs
+(GEPA's round-0 baseline repeats the baseline dev pass, self_refine's first pass and
+distillation repeat earlier calls): concurrent repeats await the call in flight, and later
+ones are answered from a memo of the last evaluation.shared_memo_size outputs (default
+20000), dropped when the matrix ends. Each dataset is loaded once for all of its modes.
+evaluation.max_in_flight caps provider calls in flight across all jobs.
+
+Each job writes a normal run_loop run directory (resumable with `run_loop --resume`):
+
+    <runs_dir>/<timestamp>_matrix/<dataset>/<timestamp>_<mode>/
+    <runs_dir>/<timestamp>_matrix/matrix.json     # plan, per-job status and metrics, provider stats
+    <runs_dir>/<timestamp>_matrix/config.yaml     # the config the provider stack was built from
+
+    python -m src.matrix --config configs/config.yaml --datasets gpqa_diamond logiqa2 --modes baseline self_refine gepa
+"""
+import argparse, asyncio, copy, json, pathlib, time
+from dataclasses import dataclass
+from typing import List, Dict, Any
+import yaml
+from dotenv import load_dotenv
+from .utils import ensure_dir, config_seed, seed_everything, timestamp
+from .concurrency import ControlledProvider, make_controller
+from .models.provider import provider_stats, run_and_close
+from .models.shared_client import SharedCallProvider
+from .run_loop import make_provider, load_split, arun_mode
+
+MODES = ["baseline", "self_refine", "gepa", "distill_from_self_refine", "hybrid"]
+
+
+@dataclass
+class MatrixJob:
+    dataset: str
+    mode: str
+    run_dir: pathlib.Path
+    cfg: Dict[str, Any]
+    status: str = "pending"     # pending | ok | no_result | failed
+    summary: Dict[str, Any] | None = None
+    error: str | None = None
+    wall_sec: float | None = None
+
+    def report(self) -> Dict[str, Any]:
+        # Scalar metrics only; provider-wide stats are reported once for the whole matrix
+        metrics = {k: v for k, v in (self.summary or {}).items() if not isinstance(v, (dict, list))}
+        return {"dataset": self.dataset, "mode": self.mode, "run_dir": str(self.run_dir), "status": self.status,
+                "error": self.error, "wall_sec": self.wall_sec, **metrics}
+
+
+def job_config(cfg: Dict[str, Any], dataset: str, overrides: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    """A copy of cfg targeting one dataset; overrides update its dataset block (n_dev, subset, ...)."""
+    out = copy.deepcopy(cfg)
+    out["dataset"] = {**out.get("dataset", {}), **(overrides or {}), "name": dataset}
+    return out
+
+
+def _write_report(out_dir: pathlib.Path, jobs: List[MatrixJob], extra: Dict[str, Any] | None = None):
+    with open(out_dir / "matrix.json", "w") as f:
+        json.dump({"jobs": [j.report() for j in jobs], **(extra or {})}, f, indent=2)
+
+
+async def arun_matrix(cfg: Dict[str, Any], datasets: Dict[str, Dict[str, Any]] | List[str], modes: List[str],
+                      out_dir: str | pathlib.Path | None = None, max_jobs: int | None = None,
+                      resume: bool = False) -> List[MatrixJob]:
+    """Run the dataset x mode matrix concurrently; returns the jobs with their status and summaries.
+
+    datasets is a list of names or maps name -> dataset-block overrides. max_jobs bounds how
+    many jobs run at once (all by default). With resume, out_dir must hold a previous
+    matrix.json; its jobs are finished in their original run directories.
+    """
+    if not isinstance(datasets, dict):
+        datasets = {name: {} for name in datasets}
+    jobs: List[MatrixJob] = []
+    if resume:
+        out_dir = pathlib.Path(out_dir)
+        for j in json.load(open(out_dir / "matrix.json"))["jobs"]:
+            run_dir = pathlib.Path(j["run_dir"])
+            jobs.append(MatrixJob(dataset=j["dataset"], mode=j["mode"], run_dir=run_dir,
+                                  cfg=yaml.safe_load(open(run_dir / "config.yaml"))))
+    else:
+        stamp = timestamp()
+        if out_dir is None:
+            out_dir = pathlib.Path(cfg["logging"]["runs_dir"]) / f"{stamp}_matrix"
+        out_dir = ensure_dir(out_dir)
+        with open(out_dir / "config.yaml", "w") as f:
+            yaml.safe_dump(cfg, f, sort_keys=False)
+        for name, overrides in datasets.items():
+            for mode in modes:
+                if mode not in MODES:
+                    raise ValueError(f"Unknown mode: {mode}")
+                job_cfg = job_config(cfg, name, overrides)
+                # <timestamp>_<mode> so each job is also resumable with run_loop --resume
+                run_dir = ensure_dir(out_dir / name / f"{stamp}_{mode}")
+                with open(run_dir / "config.yaml", "w") as f:
+                    yaml.safe_dump(job_cfg, f, sort_keys=False)
+                jobs.append(MatrixJob(dataset=name, mode=mode, run_dir=run_dir, cfg=job_cfg))
+    # Record the plan up front so an interrupted matrix can be resumed
+    _write_report(out_dir, jobs)
+
+    provider = make_provider(cfg)
+    controller = make_controller(cfg.get("evaluation", {}))
+    running = min(max_jobs or len(jobs), len(jobs)) or 1
+    max_in_flight = cfg.get("evaluation", {}).get("max_in_flight") or cfg.get("evaluation", {}).get("max_concurrency", 1) * running
+    if controller is not None:
+        # Only calls that reach the provider take a controller slot; shared ones just wait
+        provider = ControlledProvider(provider, controller)
+    shared = SharedCallProvider(provider, max_in_flight=None if controller is not None else max_in_flight,
+                                memo_size=cfg.get("evaluation", {}).get("shared_memo_size", 20000))
+
+    # Each dataset is loaded once, by whichever of its jobs starts first
+    loads: Dict[str, asyncio.Future] = {}
+
+    async def _load(job_cfg):
+        return tuple([await asyncio.to_thread(load_split, job_cfg, split) for split in ("train", "dev", "test")])
+
+    job_sem = asyncio.Semaphore(running)
+
+    async def _run(job: MatrixJob):
+        async with job_sem:
+            t0 = time.time()
+            try:
+                if job.dataset not in loads:
+                    loads[job.dataset] = asyncio.ensure_future(_load(job.cfg))
+                splits = await asyncio.shield(loads[job.dataset])
+                job.summary = await arun_mode(job.cfg, job.mode, job.run_dir, shared, resume=resume, splits=splits)
+                job.status = "ok" if job.summary is not None else "no_result"
+            except Exception as e:
+                job.status = "failed"
+                job.error = f"{type(e).__name__}: {e}"
+                print(f"Job {job.dataset}/{job.mode} failed: {job.error}")
+            job.wall_sec = time.time() - t0
+            _write_report(out_dir, jobs)
+
+    t0 = time.time()
+    await run_and_close(shared, asyncio.gather(*[_run(job) for job in jobs]))
+    extra = {"wall_sec": time.time() - t0, "max_in_flight": None if controller is not None else max_in_flight}
+    extra.update(provider_stats(shared))
+    if controller is not None:
+        extra["adaptive_concurrency"] = controller.stats()
+    _write_report(out_dir, jobs, extra)
+    return jobs
+
+
+def run_matrix(cfg: Dict[str, Any], datasets: Dict[str, Dict[str, Any]] | List[str], modes: List[str],
+               out_dir: str | pathlib.Path | None = None, max_jobs: int | None = None,
+               resume: bool = False) -> List[MatrixJob]:
+    seed_everything(config_seed(cfg))
+    return asyncio.run(arun_matrix(cfg, datasets, modes, out_dir=out_dir, max_jobs=max_jobs, resume=resume))
+
+
+def print_matrix(jobs: List[MatrixJob]):
+    def _acc(v):
+        return "-" if v is None else f"{v:.3f}"
+    print(f"{'dataset':22} {'mode':26} {'status':9} {'dev_acc':>8} {'test_acc':>8} {'wall_s':>7}")
+    for j in jobs:
+        s = j.summary or {}
+        print(f"{j.dataset:22} {j.mode:26} {j.status:9} {_acc(s.get('dev_accuracy')):>8} "
+              f"{_acc(s.get('test_accuracy')):>8} {(j.wall_sec or 0.0):7.1f}")
+
+
+def main():
+    load_dotenv()
+
+    ap = argparse.ArgumentParser(description="Run a dataset x mode evaluation matrix in one process")
+    ap.add_argument("--config", type=str, default="configs/config.yaml")
+    ap.add_argument("--datasets", type=str, nargs="*", help="defaults to the config's dataset")
+    ap.add_argument("--modes", type=str, nargs="*", choices=MODES, default=["baseline", "self_refine", "gepa"])
+    ap.add_argument("--max_jobs", type=int, default=None, help="jobs running at once (default: all)")
+    ap.add_argument("--resume", type=str, default=None, help="finish an interrupted matrix in this directory")
+    args = ap.parse_args()
+
+    if args.resume:
+        # The snapshot and plan written at start win over --config/--datasets/--modes
+        snapshot = pathlib.Path(args.resume) / "config.yaml"
+        cfg = yaml.safe_load(open(snapshot if snapshot.exists() else args.config))
+        jobs = run_matrix(cfg, [], [], out_dir=args.resume, max_jobs=args.max_jobs, resume=True)
+    else:
+        cfg = yaml.safe_load(open(args.config))
+        jobs = run_matrix(cfg, args.datasets or [cfg["dataset"]["name"]], args.modes, max_jobs=args.max_jobs)
+    print_matrix(jobs)
+
+
+if __name__ == "__main__":
+    main()
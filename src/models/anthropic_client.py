@@ -1,29 +1,90 @@
-import os, time
+import os, time, asyncio
 from typing import Dict, Any, List
-from .provider import Provider, ModelOutput
+from .provider import Provider, ModelOutput, AnswerStream
 import anthropic
 
 class AnthropicProvider(Provider):
-    def __init__(self, model_id: str, temperature: float = 0.2, max_output_tokens: int = 256, request_timeout: int = 60):
-        self.client = anthropic.Anthropic()
+    def __init__(self, model_id: str, temperature: float = 0.2, max_output_tokens: int = 256, request_timeout: int = 60,
+                 stream_early_stop: bool = False):
+        # Retries and backoff are handled by RetryingProvider, not the SDK
+        self.client = anthropic.Anthropic(max_retries=0)
         self.model_id = model_id
         self.temperature = temperature
         self.max_output_tokens = max_output_tokens
         self.request_timeout = request_timeout
+        self.stream_early_stop = stream_early_stop
+        self._aclient = None
+        self._aclient_loop = None
 
-    def generate(self, prompt: str, stop: List[str] | None = None) -> ModelOutput:
-        t0 = time.time()
-        msg = self.client.messages.create(
+    def _async_client(self) -> anthropic.AsyncAnthropic:
+        # One async client per event loop; its connection pool cannot outlive the loop
+        loop = asyncio.get_running_loop()
+        if self._aclient is None or self._aclient_loop is not loop:
+            self._aclient = anthropic.AsyncAnthropic(max_retries=0)
+            self._aclient_loop = loop
+        return self._aclient
+
+    async def aclose(self):
+        # Close this loop's connection pool while the loop is still running (see run_and_close);
+        # a client bound to another loop is left to that loop's owner
+        if self._aclient is None or self._aclient_loop is not asyncio.get_running_loop():
+            return
+        client, self._aclient, self._aclient_loop = self._aclient, None, None
+        await client.close()
+
+    def _request_kwargs(self, prompt: str, stop: List[str] | None, max_output_tokens: int | None = None) -> Dict[str, Any]:
+        return dict(
             model=self.model_id,
-            max_tokens=self.max_output_tokens,
+            max_tokens=max_output_tokens or self.max_output_tokens,
             temperature=self.temperature,
             messages=[{"role":"user","content":prompt}],
             stop_sequences=stop or None,
             timeout=self.request_timeout
         )
-        latency = time.time() - t0
+
+    @staticmethod
+    def _to_output(msg, latency: float) -> ModelOutput:
         # Concatenate text parts
         text = "".join([b.text for b in msg.content if hasattr(b, "text")])
         usage = {"input_tokens": getattr(msg.usage, "input_tokens", None),
                  "output_tokens": getattr(msg.usage, "output_tokens", None)}
         return ModelOutput(text=text, usage=usage, latency_sec=latency)
+
+    def generate(self, prompt: str, stop: List[str] | None = None) -> ModelOutput:
+        t0 = time.time()
+        msg = self.client.messages.create(**self._request_kwargs(prompt, stop))
+        return self._to_output(msg, time.time() - t0)
+
+    async def agenerate(self, prompt: str, stop: List[str] | None = None, stop_at_answer: bool = False, json_mode: bool = False,
+                        max_output_tokens: int | None = None) -> ModelOutput:
+        if stop_at_answer and self.stream_early_stop:
+            return await self._astream_to_answer(prompt, stop)
+        t0 = time.time()
+        kwargs = self._request_kwargs(prompt, stop, max_output_tokens)
+        if json_mode:
+            # No native JSON mode: prefill the reply with "{" so the model continues a JSON object
+            kwargs["messages"] = kwargs["messages"] + [{"role": "assistant", "content": "{"}]
+        msg = await self._async_client().messages.create(**kwargs)
+        out = self._to_output(msg, time.time() - t0)
+        if json_mode:
+            out.text = "{" + out.text
+        return out
+
+    async def _astream_to_answer(self, prompt: str, stop: List[str] | None) -> ModelOutput:
+        # Leaving the stream context early closes the connection, which ends generation
+        acc = AnswerStream()
+        input_tokens, output_tokens = None, None
+        async with self._async_client().messages.stream(**self._request_kwargs(prompt, stop)) as stream:
+            async for event in stream:
+                if event.type == "message_start":
+                    input_tokens = getattr(event.message.usage, "input_tokens", None)
+                elif event.type == "message_delta":
+                    output_tokens = getattr(event.usage, "output_tokens", None)
+                elif event.type == "text" and acc.feed(event.text):
+                    break
+        usage = {"input_tokens": input_tokens, "output_tokens": output_tokens}
+        if acc.stopped_early:
+            # Final output counts arrive with message_delta at the end; estimate the cut stream
+            usage["output_tokens"] = len(acc.text) // 4
+            usage["usage_estimated"] = True
+        return ModelOutput(text=acc.text, usage={**usage, **acc.timing()}, latency_sec=acc.elapsed())
@@ -0,0 +1,145 @@
+import json, hashlib, sqlite3, threading, time, pathlib, asyncio
+from typing import Dict, Any, List
+from .provider import Provider, ProviderWrapper, ModelOutput
+from ..utils import BatchedWriter
+
+SCHEMA = """CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    provider TEXT,
+    model_id TEXT,
+    text TEXT NOT NULL,
+    usage TEXT NOT NULL,
+    latency_sec REAL NOT NULL,
+    created_at REAL NOT NULL
+)"""
+
+TRANSIENT_USAGE_KEYS = ("retries", "throttled", "timed_out", "cache_hit")
+
+class CachedProvider(ProviderWrapper):
+    """Disk-backed, content-addressed response cache around any Provider.
+
+    Entries are keyed on provider, model_id, temperature, max_output_tokens, stop
+    sequences, early answer stop, JSON mode, and a SHA-256 of the prompt. A hit returns the stored
+    text, usage and original latency (so run metrics stay comparable), with usage["cache_hit"] set.
+    Async lookups run in a worker thread and new entries are committed in batches by a
+    background writer, so SQLite never blocks the event loop.
+    """
+    stats_key = "cache"
+
+    def __init__(self, inner: Provider, path: str = ".cache/llm_responses.sqlite", provider_name: str | None = None):
+        super().__init__(inner)
+        self.path = str(path)
+        self.provider_name = provider_name or type(inner).__name__
+        pathlib.Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        # One connection shared across worker threads; the lock serialises access
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        # Entries queued for the writer but not yet committed; lookups see them too. Guarded by
+        # its own lock so storing from the event loop never waits on a commit
+        self._pending: Dict[str, tuple] = {}
+        self._pending_lock = threading.Lock()
+        self._writer = BatchedWriter(self._write_batch, name="response-cache-writer")
+        self.hits = 0
+        self.misses = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def cache_key(self, prompt: str, stop: List[str] | None = None, stop_at_answer: bool = False, json_mode: bool = False,
+                  max_output_tokens: int | None = None) -> str:
+        fields = {
+            "provider": self.provider_name,
+            "model_id": getattr(self.inner, "model_id", None),
+            "temperature": getattr(self.inner, "temperature", None),
+            "max_output_tokens": max_output_tokens or getattr(self.inner, "max_output_tokens", None),
+            "stop": list(stop) if stop else None,
+            "prompt_sha256": hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+        }
+        # Early-stopped completions are truncated, so they get their own entries; the field is
+        # only added when streaming is on so existing caches stay valid
+        if stop_at_answer and getattr(self.inner, "stream_early_stop", False):
+            fields["stop_at_answer"] = True
+        if json_mode:
+            fields["json_mode"] = True
+        return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> ModelOutput | None:
+        with self._pending_lock:
+            row = self._pending.get(key)
+        if row is not None:
+            row = row[3:6]
+        else:
+            with self._lock:
+                row = self._conn.execute("SELECT text, usage, latency_sec FROM responses WHERE key = ?", (key,)).fetchone()
+        with self._pending_lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.bytes_read += len(row[0].encode("utf-8")) + len(row[1].encode("utf-8"))
+        usage = json.loads(row[1])
+        if isinstance(usage, dict):
+            usage["cache_hit"] = True
+        return ModelOutput(text=row[0], usage=usage, latency_sec=row[2])
+
+    def _store(self, key: str, out: ModelOutput):
+        usage = out.usage
+        if isinstance(usage, dict):
+            # Retry/throttle counts describe this call, not the response; replaying them on
+            # every hit would make the concurrency controller back off for free calls
+            usage = {k: v for k, v in usage.items() if k not in TRANSIENT_USAGE_KEYS}
+        usage_json = json.dumps(usage, ensure_ascii=False)
+        row = (key, self.provider_name, str(getattr(self.inner, "model_id", None)), out.text, usage_json, out.latency_sec, time.time())
+        with self._pending_lock:
+            self._pending[key] = row
+            self.bytes_written += len(out.text.encode("utf-8")) + len(usage_json.encode("utf-8"))
+        self._writer.put(row)
+
+    def _write_batch(self, rows: List[tuple]):
+        try:
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO responses (key, provider, model_id, text, usage, latency_sec, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.commit()
+        finally:
+            with self._pending_lock:
+                for row in rows:
+                    if self._pending.get(row[0]) is row:
+                        del self._pending[row[0]]
+
+    def flush(self):
+        """Block until every stored response is committed."""
+        self._writer.flush()
+
+    def generate(self, prompt: str, stop: List[str] | None = None) -> ModelOutput:
+        key = self.cache_key(prompt, stop)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        out = self.inner.generate(prompt, stop)
+        self._store(key, out)
+        return out
+
+    async def agenerate(self, prompt: str, stop: List[str] | None = None, stop_at_answer: bool = False, json_mode: bool = False,
+                        max_output_tokens: int | None = None) -> ModelOutput:
+        key = self.cache_key(prompt, stop, stop_at_answer, json_mode, max_output_tokens)
+        cached = await asyncio.to_thread(self._lookup, key)
+        if cached is not None:
+            return cached
+        out = await self.inner.agenerate(prompt, stop, stop_at_answer=stop_at_answer, json_mode=json_mode, max_output_tokens=max_output_tokens)
+        self._store(key, out)
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+        }
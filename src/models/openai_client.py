@@ -1,47 +1,108 @@
-import os, time
+import os, time, asyncio
 from typing import Dict, Any, List
-from .provider import Provider, ModelOutput
+from .provider import Provider, ModelOutput, AnswerStream
 
 # OpenAI official SDK
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, BadRequestError
 
 class OpenAIProvider(Provider):
-    def __init__(self, model_id: str, temperature: float = 0.2, max_output_tokens: int = 256, request_timeout: int = 60):
-        self.client = OpenAI()
+    def __init__(self, model_id: str, temperature: float = 0.2, max_output_tokens: int = 256, request_timeout: int = 60,
+                 stream_early_stop: bool = False):
+        # Retries and backoff are handled by RetryingProvider, not the SDK
+        self.client = OpenAI(max_retries=0)
         self.model_id = model_id
         self.temperature = temperature
         self.max_output_tokens = max_output_tokens
         self.request_timeout = request_timeout
+        self.stream_early_stop = stream_early_stop
+        self._aclient = None
+        self._aclient_loop = None
+        # Cleared when the model rejects response_format (older snapshots)
+        self.supports_json_mode = True
+
+    def _async_client(self) -> AsyncOpenAI:
+        # The async client's connection pool is bound to the loop that first used it,
+        # so create one per event loop (each run_eval drives its own loop).
+        loop = asyncio.get_running_loop()
+        if self._aclient is None or self._aclient_loop is not loop:
+            self._aclient = AsyncOpenAI(max_retries=0)
+            self._aclient_loop = loop
+        return self._aclient
+
+    async def aclose(self):
+        # Close this loop's connection pool while the loop is still running (see run_and_close);
+        # a client bound to another loop is left to that loop's owner
+        if self._aclient is None or self._aclient_loop is not asyncio.get_running_loop():
+            return
+        client, self._aclient, self._aclient_loop = self._aclient, None, None
+        await client.close()
+
+    def _request_kwargs(self, prompt: str, stop: List[str] | None, json_mode: bool = False,
+                        max_output_tokens: int | None = None) -> Dict[str, Any]:
+        kwargs = dict(
+            model=self.model_id,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=self.temperature,
+            max_tokens=max_output_tokens or self.max_output_tokens,
+            stop=stop,
+            timeout=self.request_timeout
+        )
+        if json_mode and self.supports_json_mode:
+            # The prompt must mention JSON; reflection prompts do
+            kwargs["response_format"] = {"type": "json_object"}
+        return kwargs
+
+    @staticmethod
+    def _to_output(resp, latency: float) -> ModelOutput:
+        text = resp.choices[0].message.content
+        usage = {
+            "output_tokens": resp.usage.completion_tokens,
+            "input_tokens": resp.usage.prompt_tokens,
+            "total_tokens": resp.usage.total_tokens
+        }
+        return ModelOutput(text=text, usage=usage, latency_sec=latency)
 
     def generate(self, prompt: str, stop: List[str] | None = None) -> ModelOutput:
         t0 = time.time()
-        
+        resp = self.client.chat.completions.create(**self._request_kwargs(prompt, stop))
+        return self._to_output(resp, time.time() - t0)
+
+    async def agenerate(self, prompt: str, stop: List[str] | None = None, stop_at_answer: bool = False, json_mode: bool = False,
+                        max_output_tokens: int | None = None) -> ModelOutput:
+        if stop_at_answer and self.stream_early_stop:
+            return await self._astream_to_answer(prompt, stop)
+        t0 = time.time()
+        try:
+            resp = await self._async_client().chat.completions.create(**self._request_kwargs(prompt, stop, json_mode, max_output_tokens))
+        except BadRequestError as e:
+            if not (json_mode and self.supports_json_mode and "response_format" in str(e)):
+                raise
+            # Model without JSON mode: fall back to a plain completion from now on
+            self.supports_json_mode = False
+            t0 = time.time()
+            resp = await self._async_client().chat.completions.create(**self._request_kwargs(prompt, stop, max_output_tokens=max_output_tokens))
+        return self._to_output(resp, time.time() - t0)
+
+    async def _astream_to_answer(self, prompt: str, stop: List[str] | None) -> ModelOutput:
+        # Stream the completion and close the connection as soon as the answer line is complete;
+        # the server stops generating (and billing) once the stream is dropped.
+        acc = AnswerStream()
+        usage = None
+        stream = await self._async_client().chat.completions.create(
+            **self._request_kwargs(prompt, stop), stream=True, stream_options={"include_usage": True})
         try:
-            resp = self.client.chat.completions.create(
-                model=self.model_id,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=self.temperature,
-                max_tokens=self.max_output_tokens,
-                stop=stop,
-                timeout=self.request_timeout
-            )
-            
-            latency = time.time() - t0
-            text = resp.choices[0].message.content
-            usage = {
-                "output_tokens": resp.usage.completion_tokens,
-                "input_tokens": resp.usage.prompt_tokens,
-                "total_tokens": resp.usage.total_tokens
-            }
-            
-            return ModelOutput(text=text, usage=usage, latency_sec=latency)
-            
-        except Exception as e:
-            # Fallback to mock response if API call fails
-            print(f"OpenAI API error: {e}")
-            latency = time.time() - t0
-            return ModelOutput(
-                text="Error: API call failed. Using fallback response.\nAnswer: A",
-                usage={"output_tokens": 10, "input_tokens": 0, "total_tokens": 10},
-                latency_sec=latency
-            )
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if chunk.choices and acc.feed(chunk.choices[0].delta.content):
+                    break
+        finally:
+            await stream.close()
+        if usage is not None:
+            out_usage = {"output_tokens": usage.completion_tokens, "input_tokens": usage.prompt_tokens,
+                         "total_tokens": usage.total_tokens}
+        else:
+            # The usage chunk only arrives at the end of a full stream; estimate the cut one
+            out_usage = {"output_tokens": len(acc.text) // 4, "input_tokens": len(prompt) // 4, "usage_estimated": True}
+            out_usage["total_tokens"] = out_usage["output_tokens"] + out_usage["input_tokens"]
+        return ModelOutput(text=acc.text, usage={**out_usage, **acc.timing()}, latency_sec=acc.elapsed())
@@ -1,6 +1,8 @@
+import asyncio, time
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from typing import Dict, Any
+from ..utils import answer_line_end
 
 @dataclass
 class ModelOutput:
@@ -12,3 +14,101 @@ class Provider(ABC):
     @abstractmethod
     def generate(self, prompt: str, stop: list[str] | None = None) -> ModelOutput:
         ...
+
+    async def agenerate(self, prompt: str, stop: list[str] | None = None, stop_at_answer: bool = False, json_mode: bool = False,
+                        max_output_tokens: int | None = None) -> ModelOutput:
+        # Default shim for providers without a native async client: run generate() in a worker thread.
+        # stop_at_answer, json_mode and max_output_tokens are hints; providers that cannot stream,
+        # constrain or cap output return the plain completion.
+        return await asyncio.to_thread(self.generate, prompt, stop)
+
+    async def aclose(self):
+        # Providers holding per-event-loop async clients close this loop's client here
+        pass
+
+async def run_and_close(provider: Provider, aw):
+    """Await aw, then close provider's async clients for the running loop.
+
+    Wrap the work handed to asyncio.run with this so connection pools are closed while their
+    event loop is still alive instead of leaking when the loop is torn down.
+    """
+    try:
+        return await aw
+    finally:
+        await provider.aclose()
+
+class AnswerStream:
+    """Accumulates streamed text deltas and detects the first complete 'Answer: <LETTER>' line.
+
+    Streaming providers feed() each delta and cancel their stream once it returns True;
+    text is then cut at the end of the answer line. timing() reports time to first token
+    and time to answer (the full stream time when no early stop happened).
+    """
+    def __init__(self):
+        self.t0 = time.time()
+        self.text = ""
+        self.ttft = None
+        self.time_to_answer = None
+        self.stopped_early = False
+
+    def feed(self, delta: str | None) -> bool:
+        if not delta:
+            return False
+        if self.ttft is None:
+            self.ttft = time.time() - self.t0
+        self.text += delta
+        end = answer_line_end(self.text)
+        if end is None:
+            return False
+        self.text = self.text[:end]
+        self.time_to_answer = time.time() - self.t0
+        self.stopped_early = True
+        return True
+
+    def elapsed(self) -> float:
+        return time.time() - self.t0
+
+    def timing(self) -> Dict[str, Any]:
+        return {
+            "ttft_sec": self.ttft,
+            "time_to_answer_sec": self.time_to_answer if self.time_to_answer is not None else self.elapsed(),
+            "early_stop": self.stopped_early,
+        }
+
+class ProviderWrapper(Provider):
+    """Base for providers that add behaviour (caching, rate limiting, ...) around another provider."""
+    stats_key: str | None = None
+
+    def __init__(self, inner: Provider):
+        self.inner = inner
+
+    def generate(self, prompt: str, stop: list[str] | None = None) -> ModelOutput:
+        return self.inner.generate(prompt, stop)
+
+    async def agenerate(self, prompt: str, stop: list[str] | None = None, stop_at_answer: bool = False, json_mode: bool = False,
+                        max_output_tokens: int | None = None) -> ModelOutput:
+        return await self.inner.agenerate(prompt, stop, stop_at_answer=stop_at_answer, json_mode=json_mode, max_output_tokens=max_output_tokens)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+    def __getattr__(self, name):
+        # Forward model settings (model_id, temperature, ...) to the wrapped provider
+        if name == "inner":
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+def provider_stats(provider: Provider) -> Dict[str, Any]:
+    """Collect stats() from every wrapper in a provider chain, keyed by each wrapper's stats_key.
+
+    When a key repeats (a run's SharedCallProvider over a matrix-wide one), the outermost wins.
+    """
+    out = {}
+    while isinstance(provider, ProviderWrapper):
+        if provider.stats_key and provider.stats_key not in out:
+            out[provider.stats_key] = provider.stats()
+        provider = provider.inner
+    return out
@@ -0,0 +1,115 @@
+import time, asyncio, threading
+from typing import Dict, Any, List
+from .provider import Provider, ProviderWrapper, ModelOutput
+
+class TokenBucket:
+    """Token bucket refilled continuously at `per_minute / 60` units per second.
+
+    reserve() always debits immediately and returns how long the caller must wait
+    before using what it took; the balance may go negative, which queues later
+    callers behind earlier ones instead of letting them race for the refill.
+    """
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def adjust(self, delta: float):
+        # Positive delta debits more (call used more than estimated); negative refunds
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+class RateLimitedProvider(ProviderWrapper):
+    """Keeps calls under requests-per-minute and tokens-per-minute quotas.
+
+    Each call reserves one request and a pre-flight token estimate (prompt chars / 4 plus
+    max_output_tokens), waits until both buckets allow it, then corrects the token bucket
+    with the usage the provider actually reports.
+    """
+    stats_key = "rate_limit"
+
+    def __init__(self, inner: Provider, rpm: float | None = None, tpm: float | None = None):
+        super().__init__(inner)
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.calls = 0
+        self.delayed_calls = 0
+        self.total_wait_sec = 0.0
+        self.estimated_tokens = 0
+        self.actual_tokens = 0
+
+    def estimate_tokens(self, prompt: str, max_output_tokens: int | None = None) -> int:
+        return len(prompt) // 4 + (max_output_tokens or getattr(self.inner, "max_output_tokens", None) or 256)
+
+    def _reserve(self, prompt: str, max_output_tokens: int | None = None) -> tuple[int, float]:
+        estimate = self.estimate_tokens(prompt, max_output_tokens)
+        wait = 0.0
+        if self.requests:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens:
+            wait = max(wait, self.tokens.reserve(estimate))
+        self.calls += 1
+        self.estimated_tokens += estimate
+        if wait > 0:
+            self.delayed_calls += 1
+            self.total_wait_sec += wait
+        return estimate, wait
+
+    def _settle(self, estimate: int, out: ModelOutput | None):
+        actual = 0
+        if out is not None and isinstance(out.usage, dict):
+            actual = (out.usage.get("input_tokens") or 0) + (out.usage.get("output_tokens") or 0)
+        self.actual_tokens += actual
+        if self.tokens:
+            # Failed calls and providers without usage refund the whole estimate
+            self.tokens.adjust(actual - estimate)
+
+    def generate(self, prompt: str, stop: List[str] | None = None) -> ModelOutput:
+        estimate, wait = self._reserve(prompt)
+        if wait > 0:
+            time.sleep(wait)
+        out = None
+        try:
+            out = self.inner.generate(prompt, stop)
+            return out
+        finally:
+            self._settle(estimate, out)
+
+    async def agenerate(self, prompt: str, stop: List[str] | None = None, stop_at_answer: bool = False, json_mode: bool = False,
+                        max_output_tokens: int | None = None) -> ModelOutput:
+        estimate, wait = self._reserve(prompt, max_output_tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        out = None
+        try:
+            out = await self.inner.agenerate(prompt, stop, stop_at_answer=stop_at_answer, json_mode=json_mode, max_output_tokens=max_output_tokens)
+            return out
+        finally:
+            self._settle(estimate, out)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "calls": self.calls,
+            "delayed_calls": self.delayed_calls,
+            "total_wait_sec": self.total_wait_sec,
+            "estimated_tokens": self.estimated_tokens,
+            "actual_tokens": self.actual_tokens,
+        }
@@ -0,0 +1,168 @@
+import time, asyncio, threading, collections
+from typing import Dict, Any, List
+from tenacity import Retrying, AsyncRetrying, stop_after_attempt, wait_random_exponential, retry_if_exception
+from .provider import Provider, ProviderWrapper, ModelOutput
+
+class ProviderError(RuntimeError):
+    """A provider call that still failed after all retries (or was not retryable).
+
+    throttled / timed_out say whether any attempt hit a 429 or a timeout, so the adaptive
+    concurrency controller can back off on failures it only sees wrapped.
+    """
+    def __init__(self, message: str, throttled: bool = False, timed_out: bool = False):
+        super().__init__(message)
+        self.throttled = throttled
+        self.timed_out = timed_out
+
+def _status_code(exc: BaseException) -> int | None:
+    return getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+
+def is_throttle_error(exc: BaseException) -> bool:
+    return _status_code(exc) == 429 or "ratelimit" in type(exc).__name__.lower()
+
+def is_timeout_error(exc: BaseException) -> bool:
+    return isinstance(exc, (TimeoutError, asyncio.TimeoutError)) or "timeout" in type(exc).__name__.lower()
+
+def is_retryable_error(exc: BaseException) -> bool:
+    # Throttling, timeouts, dropped connections and server-side errors are transient;
+    # bad requests, auth and not-found errors will fail the same way again
+    if isinstance(exc, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    name = type(exc).__name__.lower()
+    if "timeout" in name or "connection" in name or "overloaded" in name:
+        return True
+    status = _status_code(exc)
+    return status is not None and (status in (408, 409, 429) or status >= 500)
+
+class CircuitBreaker:
+    """Pauses all calls for `cooldown_sec` once the error rate over the last `window` attempts spikes."""
+    def __init__(self, window: int = 20, error_rate: float = 0.5, min_calls: int = 10, cooldown_sec: float = 30.0):
+        self.outcomes = collections.deque(maxlen=window)
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.cooldown_sec = cooldown_sec
+        self.open_until = 0.0
+        self.trips = 0
+        self.paused_sec = 0.0
+        self._lock = threading.Lock()
+
+    def wait_time(self) -> float:
+        return max(0.0, self.open_until - time.monotonic())
+
+    def record(self, ok: bool):
+        with self._lock:
+            self.outcomes.append(ok)
+            if ok or time.monotonic() < self.open_until or len(self.outcomes) < self.min_calls:
+                return
+            failures = self.outcomes.count(False)
+            if failures / len(self.outcomes) >= self.error_rate:
+                self.open_until = time.monotonic() + self.cooldown_sec
+                self.trips += 1
+                # Half-open after the cooldown: the next failures re-trip against a fresh window
+                self.outcomes.clear()
+                print(f"Circuit breaker open: {failures} failed calls, pausing provider calls for {self.cooldown_sec:.0f}s")
+
+class RetryingProvider(ProviderWrapper):
+    """Retries transient provider errors with jittered exponential backoff behind a circuit breaker.
+
+    Retried outputs carry usage["retries"] (and usage["throttled"] / usage["timed_out"] counts for
+    429s and timeouts) so callers such as the adaptive concurrency controller can react;
+    exhausted or non-retryable failures raise ProviderError instead of returning a fabricated answer.
+    """
+    stats_key = "retry"
+
+    def __init__(self, inner: Provider, max_attempts: int = 5, base_delay_sec: float = 1.0, max_delay_sec: float = 60.0,
+                 breaker: CircuitBreaker | None = None):
+        super().__init__(inner)
+        self.max_attempts = max_attempts
+        self.base_delay_sec = base_delay_sec
+        self.max_delay_sec = max_delay_sec
+        self.breaker = breaker or CircuitBreaker()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.throttled = 0
+
+    def _retry_kwargs(self) -> Dict[str, Any]:
+        return dict(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=wait_random_exponential(multiplier=self.base_delay_sec, max=self.max_delay_sec),
+            retry=retry_if_exception(is_retryable_error),
+            reraise=True,
+        )
+
+    def _after_attempt(self, ok: bool, exc: BaseException | None, counters: Dict[str, int]):
+        self.breaker.record(ok)
+        if exc is not None:
+            counters["errors"] += 1
+            if is_throttle_error(exc):
+                counters["throttled"] += 1
+                self.throttled += 1
+            if is_timeout_error(exc):
+                counters["timed_out"] += 1
+            print(f"Provider error ({type(exc).__name__}): {exc}")
+
+    def _annotate(self, out: ModelOutput, counters: Dict[str, int]) -> ModelOutput:
+        if counters["errors"] and isinstance(out.usage, dict):
+            out.usage = {**out.usage, "retries": counters["errors"]}
+            if counters["throttled"]:
+                out.usage["throttled"] = counters["throttled"]
+            if counters["timed_out"]:
+                out.usage["timed_out"] = counters["timed_out"]
+        self.retries += counters["errors"]
+        return out
+
+    def generate(self, prompt: str, stop: List[str] | None = None) -> ModelOutput:
+        self.calls += 1
+        counters = {"errors": 0, "throttled": 0, "timed_out": 0}
+        try:
+            for attempt in Retrying(**self._retry_kwargs()):
+                with attempt:
+                    pause = self.breaker.wait_time()
+                    if pause > 0:
+                        self.breaker.paused_sec += pause
+                        time.sleep(pause)
+                    try:
+                        out = self.inner.generate(prompt, stop)
+                    except Exception as e:
+                        self._after_attempt(False, e, counters)
+                        raise
+                    self._after_attempt(True, None, counters)
+        except Exception as e:
+            self.failures += 1
+            raise ProviderError(f"{type(e).__name__}: {e}", throttled=counters["throttled"] > 0,
+                                timed_out=counters["timed_out"] > 0) from e
+        return self._annotate(out, counters)
+
+    async def agenerate(self, prompt: str, stop: List[str] | None = None, stop_at_answer: bool = False, json_mode: bool = False,
+                        max_output_tokens: int | None = None) -> ModelOutput:
+        self.calls += 1
+        counters = {"errors": 0, "throttled": 0, "timed_out": 0}
+        try:
+            async for attempt in AsyncRetrying(**self._retry_kwargs()):
+                with attempt:
+                    pause = self.breaker.wait_time()
+                    if pause > 0:
+                        self.breaker.paused_sec += pause
+                        await asyncio.sleep(pause)
+                    try:
+                        out = await self.inner.agenerate(prompt, stop, stop_at_answer=stop_at_answer, json_mode=json_mode, max_output_tokens=max_output_tokens)
+                    except Exception as e:
+                        self._after_attempt(False, e, counters)
+                        raise
+                    self._after_attempt(True, None, counters)
+        except Exception as e:
+            self.failures += 1
+            raise ProviderError(f"{type(e).__name__}: {e}", throttled=counters["throttled"] > 0,
+                                timed_out=counters["timed_out"] > 0) from e
+        return self._annotate(out, counters)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "failed_calls": self.failures,
+            "breaker_trips": self.breaker.trips,
+            "breaker_paused_sec": self.breaker.paused_sec,
+        }
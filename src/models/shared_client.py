@@ -0,0 +1,71 @@
+import asyncio, collections
+from typing import Dict, Any, List
+from .provider import Provider, ProviderWrapper, ModelOutput
+
+class SharedCallProvider(ProviderWrapper):
+    """Makes each distinct call once and hands its output to every evaluation that asks for it.
+
+    A request for a call already in flight awaits the same task. With memo_size set, the last
+    memo_size successful outputs are also kept (least recently used evicted), so a repeat after
+    the call finished is answered without a provider call; the memo lives as long as this
+    wrapper. Failed calls are never kept, so a later request retries them. Shared outputs keep
+    the original usage and latency, like CachedProvider hits, so each evaluation's records
+    read as if it had run alone.
+    """
+    stats_key = "shared_calls"
+
+    def __init__(self, inner: Provider, max_in_flight: int | None = None, memo_size: int = 0):
+        super().__init__(inner)
+        self.sem = asyncio.Semaphore(max_in_flight) if max_in_flight else None
+        self.tasks: Dict[tuple, asyncio.Future] = {}
+        self.memo_size = memo_size
+        self.memo: collections.OrderedDict[tuple, ModelOutput] = collections.OrderedDict()
+        self.calls = 0
+        self.shared = 0
+        self.memo_hits = 0
+
+    def _finished(self, key: tuple, task: asyncio.Future):
+        if self.tasks.get(key) is task:
+            del self.tasks[key]
+        if self.memo_size and not task.cancelled() and task.exception() is None:
+            self.memo[key] = task.result()
+            while len(self.memo) > self.memo_size:
+                self.memo.popitem(last=False)
+
+    async def _call(self, prompt: str, stop: List[str] | None, stop_at_answer: bool, json_mode: bool,
+                    max_output_tokens: int | None) -> ModelOutput:
+        if self.sem is None:
+            return await self.inner.agenerate(prompt, stop, stop_at_answer=stop_at_answer, json_mode=json_mode, max_output_tokens=max_output_tokens)
+        async with self.sem:
+            return await self.inner.agenerate(prompt, stop, stop_at_answer=stop_at_answer, json_mode=json_mode, max_output_tokens=max_output_tokens)
+
+    async def agenerate(self, prompt: str, stop: List[str] | None = None, stop_at_answer: bool = False, json_mode: bool = False,
+                        max_output_tokens: int | None = None) -> ModelOutput:
+        key = (prompt, tuple(stop) if stop else None, stop_at_answer, json_mode, max_output_tokens)
+        out = self.memo.get(key)
+        if out is not None:
+            self.memo.move_to_end(key)
+            self.memo_hits += 1
+        else:
+            task = self.tasks.get(key)
+            if task is None:
+                self.calls += 1
+                task = self.tasks[key] = asyncio.ensure_future(self._call(prompt, stop, stop_at_answer, json_mode, max_output_tokens))
+                # Finished calls leave the in-flight map (into the bounded memo, if any)
+                task.add_done_callback(lambda t, key=key: self._finished(key, t))
+            else:
+                self.shared += 1
+            # Shielded so one cancelled caller does not cancel the call for the others
+            out = await asyncio.shield(task)
+        usage = dict(out.usage) if isinstance(out.usage, dict) else out.usage
+        return ModelOutput(text=out.text, usage=usage, latency_sec=out.latency_sec)
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.calls + self.shared + self.memo_hits
+        return {
+            "calls": self.calls,
+            "shared": self.shared,
+            "memo_hits": self.memo_hits,
+            "memo_size": self.memo_size,
+            "share_rate": (self.shared + self.memo_hits) / requests if requests else 0.0,
+        }
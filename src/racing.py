@@ -0,0 +1,125 @@
+"""
+Successive-halving racing for GEPA prompt variants.
+
+Variants are scored on a growing prefix of dev (min_batch, min_batch*eta, ... up to the
+full set); each rung only evaluates the examples the previous rung had not reached. After
+every rung a variant is eliminated when another is statistically better on the
+(avg_tokens_out, accuracy) Pareto objectives, using Wilson bounds on accuracy and normal
+bounds on mean tokens at the configured confidence. Only survivors reach the full dev set,
+so the Pareto selection over them matches a full evaluation whenever the bounds hold.
+"""
+import math
+from dataclasses import dataclass, asdict
+from statistics import NormalDist
+from typing import Awaitable, Callable, Dict, List, Any
+from .evaluator import EvalResult, record_tokens_out
+from .utils import read_jsonl
+
+
+@dataclass
+class RaceScore:
+    name: str
+    n: int
+    accuracy: float
+    acc_lo: float
+    acc_hi: float
+    avg_tokens_out: float
+    tok_lo: float
+    tok_hi: float
+
+
+def wilson_interval(k: int, n: int, z: float) -> tuple[float, float]:
+    if n == 0:
+        return 0.0, 1.0
+    p = k / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def mean_interval(values: List[float], z: float) -> tuple[float, float, float]:
+    """(mean, lower, upper) with a normal approximation; unbounded with fewer than two values."""
+    n = len(values)
+    if n == 0:
+        return 0.0, 0.0, math.inf
+    mean = sum(values) / n
+    if n < 2:
+        return mean, 0.0, math.inf
+    sd = math.sqrt(sum((v - mean) ** 2 for v in values) / (n - 1))
+    half = z * sd / math.sqrt(n)
+    return mean, max(0.0, mean - half), mean + half
+
+
+def race_score(name: str, records_path: str, ids: set, z: float) -> RaceScore:
+    """Bounds from the variant's records for the given example ids (failed calls excluded)."""
+    rows = [r for r in read_jsonl(records_path) if r["id"] in ids and not r.get("error")]
+    correct = sum(r["correct"] for r in rows)
+    acc_lo, acc_hi = wilson_interval(correct, len(rows), z)
+    tokens = [t for t in (record_tokens_out(r) for r in rows) if t is not None]
+    tok_mean, tok_lo, tok_hi = mean_interval(tokens, z)
+    return RaceScore(name=name, n=len(rows), accuracy=correct / len(rows) if rows else 0.0, acc_lo=acc_lo, acc_hi=acc_hi,
+                     avg_tokens_out=tok_mean, tok_lo=tok_lo, tok_hi=tok_hi)
+
+
+def dominates(a: RaceScore, b: RaceScore, token_slack: float = 0.1) -> bool:
+    """a is confidently more accurate at no confidently higher cost (up to token_slack),
+    or confidently cheaper and no less accurate."""
+    more_accurate = a.acc_lo > b.acc_hi and a.tok_hi <= b.tok_lo * (1 + token_slack)
+    cheaper = a.tok_hi < b.tok_lo and a.acc_lo >= b.acc_hi
+    return more_accurate or cheaper
+
+
+def rung_sizes(n_total: int, min_batch: int, eta: float) -> List[int]:
+    sizes, n = [], max(1, min_batch)
+    while n < n_total:
+        sizes.append(n)
+        n = max(n + 1, int(math.ceil(n * eta)))
+    return sizes + [n_total]
+
+
+async def arace(evaluate: Callable[[List[str], int, bool], Awaitable[Dict[str, EvalResult]]], names: List[str],
+                example_ids: List[str], min_batch: int = 8, eta: float = 2.0, confidence: float = 0.95,
+                token_slack: float = 0.1, resume: bool = False) -> tuple[Dict[str, EvalResult], Dict[str, Any]]:
+    """Race variants over growing prefixes of example_ids.
+
+    evaluate(names, n, resume) scores those variants on the first n examples, appending to
+    their existing records (resume=True) so each rung only pays for the new examples.
+    Returns the survivors' full-set results and a log of rungs, eliminations and calls saved.
+    """
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    n_total = len(example_ids)
+    alive = list(names)
+    rungs, eliminated = [], []
+    results: Dict[str, EvalResult] = {}
+    for r, n in enumerate(rung_sizes(n_total, min_batch, eta)):
+        # The first rung starts fresh unless the whole run is being resumed
+        results = await evaluate(alive, n, resume or r > 0)
+        ids = set(example_ids[:n])
+        scores = {name: race_score(name, results[name].records_path, ids, z) for name in alive}
+        dropped = []
+        if n < n_total:
+            for name in alive:
+                winner = next((o for o in alive if o != name and dominates(scores[o], scores[name], token_slack)), None)
+                if winner is not None:
+                    dropped.append({"name": name, "dominated_by": winner})
+        for d in dropped:
+            eliminated.append({**d, "rung": r, **asdict(scores[d["name"]])})
+            print(f"Racing: dropped variant {d['name']} after {n} examples (dominated by {d['dominated_by']})")
+        rungs.append({"n": n, "scores": [asdict(scores[name]) for name in alive], "eliminated": [d["name"] for d in dropped]})
+        alive = [name for name in alive if name not in {d["name"] for d in dropped}]
+
+    # Racing uses single-call (baseline) evaluation, so examples evaluated == provider calls;
+    # a variant dropped at a rung was evaluated on that rung's prefix
+    evaluated = sum(rungs[e["rung"]]["n"] for e in eliminated) + len(alive) * n_total
+    full_cost = len(names) * n_total
+    log = {
+        "config": {"min_batch": min_batch, "eta": eta, "confidence": confidence, "token_slack": token_slack},
+        "rungs": rungs,
+        "survivors": alive,
+        "eliminated": eliminated,
+        "calls_made": evaluated,
+        "calls_full_evaluation": full_cost,
+        "calls_saved": full_cost - evaluated,
+    }
+    return {name: results[name] for name in alive}, log
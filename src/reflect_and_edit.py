@@ -1,6 +1,7 @@
-import json, pathlib
+import asyncio, json, pathlib
+from functools import lru_cache
 from typing import List, Dict, Any
-from .models.provider import Provider
+from .models.provider import Provider, run_and_close
 from .utils import write_jsonl
 
 REFLECTION_PROMPT = """You are improving a system prompt for a multiple-choice tutor.
@@ -23,6 +24,41 @@ Return **valid JSON** only in this schema:
   ]
 }}"""
 
+REDUCE_PROMPT = """You are improving a system prompt for a multiple-choice tutor.
+Failures were reflected on in {num_chunks} batches; each batch produced candidate rules and prompt edits (below).
+
+1) Merge the rules: combine duplicates, keep the failure modes that recur across batches.
+2) Propose the {num_edits} strongest prompt edits, merging or rewriting the candidates. Each edit must be:
+   - Self-contained (can be appended to the base prompt)
+   - Max 5 lines, imperative, testable
+   - Include any verification/check steps
+3) For each edit, state which failure modes it addresses.
+
+IMPORTANT: Do not remove or change the formatting rules above. If you add steps, they must keep the final line requirement intact.
+
+Return **valid JSON** only in this schema:
+{{
+  "rules": ["..."],
+  "edits": [
+     {{"name":"A","text":"<edit text>","why":"<which failures it fixes>"}}
+  ]
+}}"""
+
+REPAIR_PROMPT = """The text below was supposed to be a single valid JSON object in this schema:
+{{
+  "rules": ["..."],
+  "edits": [
+     {{"name":"A","text":"<edit text>","why":"<which failures it fixes>"}}
+  ]
+}}
+It failed validation with: {error}
+
+Return **valid JSON** only: the same content as one corrected JSON object in that schema, completing it if it was cut off.
+
+TEXT:
+{text}
+"""
+
 def build_fail_snippet(row: Dict[str, Any]) -> str:
     ctx = row.get("context","")
     q = row.get("question","")
@@ -31,24 +67,121 @@ def build_fail_snippet(row: Dict[str, Any]) -> str:
     gold = row.get("answer_gold","")
     return f"Context: {ctx}\nQuestion: {q}\nChoices: {ch}\nYour answer: {your}\nCorrect answer: {gold}"
 
-def reflect(provider: Provider, failed_rows: List[Dict[str, Any]], num_edits: int, out_path: str, base_prompt: str) -> Dict[str, Any]:
-    # Construct reflection prompt
+@lru_cache(maxsize=None)
+def _encoding(model_id: str | None):
+    # tiktoken is only needed once reflection runs; keep it off the startup path
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model_id or "")
+    except KeyError:
+        pass
+    except Exception as e:
+        # Encodings are downloaded on first use; budget by characters when that fails
+        print(f"tiktoken encoding unavailable ({type(e).__name__}); estimating tokens from characters")
+        return None
+    try:
+        # Non-OpenAI models: cl100k_base is a close enough budget estimate
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"tiktoken encoding unavailable ({type(e).__name__}); estimating tokens from characters")
+        return None
+
+def count_tokens(text: str, model_id: str | None = None) -> int:
+    """Token count under the model's tiktoken encoding (about 4 characters per token without tiktoken)."""
+    enc = _encoding(model_id)
+    return len(enc.encode(text, disallowed_special=())) if enc is not None else len(text) // 4 + 1
+
+def truncate_tokens(text: str, max_tokens: int, model_id: str | None = None) -> str:
+    enc = _encoding(model_id)
+    if enc is None:
+        return text if len(text) <= max_tokens * 4 else text[:max_tokens * 4] + " ..."
+    ids = enc.encode(text, disallowed_special=())
+    return text if len(ids) <= max_tokens else enc.decode(ids[:max_tokens]) + " ..."
+
+def fail_snippets(failed_rows: List[Dict[str, Any]], max_context_tokens: int | None = None, model_id: str | None = None) -> List[Dict[str, Any]]:
     snippets = []
     for r in failed_rows:
         # compact choices
         ch_txt = " ".join([f"{c['label']}. {c['text']}" for c in r.get("choices_parsed", [])]) if r.get("choices_parsed") else ""
-        s = {
-            "context": r.get("context",""),
+        ctx = r.get("context","") or ""
+        if max_context_tokens and ctx:
+            # Long passages (RACE) say little about the failure mode; keep their opening
+            ctx = truncate_tokens(ctx, max_context_tokens, model_id)
+        snippets.append({
+            "context": ctx,
             "question": r.get("question",""),
             "choices": ch_txt,
             "answer_pred": r.get("answer_pred",""),
             "answer_gold": r.get("answer_gold",""),
-        }
-        snippets.append(s)
-    # Truncate to a reasonable size
-    snippets = snippets[:50]
-    fail_block = json.dumps(snippets, ensure_ascii=False, indent=2)
-    prompt = REFLECTION_PROMPT.format(num_edits=num_edits) + f"""
+        })
+    return snippets
+
+def chunk_snippets(snippets: List[Dict[str, Any]], budget_tokens: int, model_id: str | None = None) -> List[List[Dict[str, Any]]]:
+    """Pack snippets in order into chunks whose serialized failures fit budget_tokens (at least one per chunk)."""
+    chunks, current, used = [], [], 0
+    for s in snippets:
+        n = count_tokens(json.dumps(s, ensure_ascii=False), model_id) + 1
+        if current and used + n > budget_tokens:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(s)
+        used += n
+    if current:
+        chunks.append(current)
+    return chunks
+
+@lru_cache(maxsize=None)
+def _schema():
+    # pydantic is only needed once reflection runs; keep it off the startup path
+    from pydantic import BaseModel
+
+    class Edit(BaseModel):
+        name: str | None = None
+        text: str
+        why: str = ""
+
+    class Reflection(BaseModel):
+        rules: List[str] = []
+        edits: List[Edit] = []
+
+    return Reflection
+
+def parse_reflection(text: str) -> tuple[Dict[str, Any] | None, str | None]:
+    """(validated {"rules", "edits"}, None), or (None, error) when text is not a valid reflection."""
+    text = (text or "").strip()
+    # Tolerate code fences or prose around the object
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        text = text[start:end + 1]
+    try:
+        return _schema().model_validate_json(text).model_dump(exclude_none=True), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {str(e)[:500]}"
+
+async def _agenerate_reflection(provider: Provider, prompt: str, max_output_tokens: int | None = None) -> Dict[str, Any]:
+    """One JSON-mode reflection call plus at most one repair call; returns the call record."""
+    result = await provider.agenerate(prompt, json_mode=True, max_output_tokens=max_output_tokens)
+    data, error = parse_reflection(result.text)
+    record = {"prompt": prompt, "raw_response": result.text}
+    if error is not None:
+        # One cheap repair pass instead of losing the round
+        repair_prompt = REPAIR_PROMPT.format(error=error, text=result.text)
+        repaired = await provider.agenerate(repair_prompt, json_mode=True, max_output_tokens=max_output_tokens)
+        data, repair_error = parse_reflection(repaired.text)
+        record["repair"] = {"error": error, "prompt": repair_prompt, "raw_response": repaired.text}
+        if repair_error is not None:
+            print(f"Reflection output invalid after repair: {repair_error}")
+            record["repair"]["repair_error"] = repair_error
+            data = {"rules": [], "edits": []}
+    record["parsed"] = data
+    return record
+
+def _map_prompt(chunk: List[Dict[str, Any]], num_edits: int, base_prompt: str) -> str:
+    fail_block = json.dumps(chunk, ensure_ascii=False)
+    return REFLECTION_PROMPT.format(num_edits=num_edits) + f"""
 
 BASE PROMPT:
 ---
@@ -57,14 +190,59 @@ BASE PROMPT:
 FAILED EXAMPLES (JSON):
 {fail_block}
 """
-    result = provider.generate(prompt)
-    # Try parse JSON
-    try:
-        data = json.loads(result.text)
-    except Exception:
-        data = {"rules": [], "edits": []}
+
+async def areflect(provider: Provider, failed_rows: List[Dict[str, Any]], num_edits: int, out_path: str, base_prompt: str,
+                   chunk_tokens: int = 6000, max_context_tokens: int | None = 400, max_output_tokens: int | None = 2048) -> Dict[str, Any]:
+    """Map-reduce reflection over failed rows.
+
+    Failures are packed into chunks of at most chunk_tokens (counted with tiktoken), each chunk
+    is reflected on concurrently, and when there is more than one chunk a final call merges
+    their rules and edits into num_edits edits. Every call gets max_output_tokens (the model's
+    answer-sized limit would cut the JSON off). Everything is saved to out_path.
+    """
+    model_id = getattr(provider, "model_id", None)
+    snippets = fail_snippets(failed_rows, max_context_tokens, model_id)
+    chunks = chunk_snippets(snippets, chunk_tokens, model_id) or [[]]
+    prompts = [_map_prompt(chunk, num_edits, base_prompt) for chunk in chunks]
+    outcomes = await asyncio.gather(*[_agenerate_reflection(provider, p, max_output_tokens) for p in prompts], return_exceptions=True)
+    if all(isinstance(o, BaseException) for o in outcomes):
+        raise outcomes[0]
+    mapped = []
+    for chunk, p, o in zip(chunks, prompts, outcomes):
+        if isinstance(o, BaseException):
+            print(f"Reflection chunk of {len(chunk)} failures failed: {type(o).__name__}: {o}")
+            mapped.append({"n_failures": len(chunk), "prompt": p, "error": f"{type(o).__name__}: {o}", "parsed": {"rules": [], "edits": []}})
+        else:
+            mapped.append({"n_failures": len(chunk), **o})
+
+    if len(chunks) == 1:
+        record = {k: v for k, v in mapped[0].items() if k != "n_failures"}
+    else:
+        candidates = [m["parsed"] for m in mapped if not m.get("error")]
+        prompt = REDUCE_PROMPT.format(num_chunks=len(candidates), num_edits=num_edits) + f"""
+
+BASE PROMPT:
+---
+{base_prompt}
+---
+CANDIDATES (JSON, one entry per batch):
+{json.dumps(candidates, ensure_ascii=False)}
+"""
+        reduced = await _agenerate_reflection(provider, prompt, max_output_tokens)
+        data = reduced["parsed"]
+        if not data.get("edits"):
+            # Reduce output unusable: fall back to the batches' own edits, uniquely named
+            edits = [dict(e, name=f"{e.get('name', chr(ord('A')+j))}{i}") for i, c in enumerate(candidates) for j, e in enumerate(c.get("edits", []))]
+            data = {"rules": [r for c in candidates for r in c.get("rules", [])], "edits": edits[:num_edits]}
+        record = {**reduced, "parsed": data, "chunks": mapped}
+    data = record["parsed"]
     # Save raw + parsed
     pathlib.Path(out_path).parent.mkdir(parents=True, exist_ok=True)
     with open(out_path, "w", encoding="utf-8") as f:
-        json.dump({"prompt": prompt, "raw_response": result.text, "parsed": data}, f, ensure_ascii=False, indent=2)
+        json.dump(record, f, ensure_ascii=False, indent=2)
     return data
+
+def reflect(provider: Provider, failed_rows: List[Dict[str, Any]], num_edits: int, out_path: str, base_prompt: str,
+            chunk_tokens: int = 6000, max_context_tokens: int | None = 400, max_output_tokens: int | None = 2048) -> Dict[str, Any]:
+    return asyncio.run(run_and_close(provider, areflect(provider, failed_rows, num_edits, out_path, base_prompt, chunk_tokens=chunk_tokens,
+                                                        max_context_tokens=max_context_tokens, max_output_tokens=max_output_tokens)))
@@ -0,0 +1,172 @@
+"""
+Offline threshold replay over recorded hybrid runs.
+
+Re-applies conditional gating, calculate_gepa_confidence and the explicit-invalidation
+rule to the sr_output/gepa_output stored in a hybrid run's records.jsonl, for a whole
+grid of confidence thresholds at once, without any API calls.
+
+    python -m src.replay --run_dir runs/<id>_hybrid --config configs/threshold_experiments.yaml
+"""
+import argparse, json, re, pathlib
+from dataclasses import dataclass
+from typing import List, Dict, Any
+import numpy as np
+import yaml
+from .evaluator import (calculate_gepa_confidence, gepa_skip_reasons, has_explicit_invalidation,
+                        format_violation, hybrid_token_totals, threshold_config_from_cfg)
+from .utils import parse_answer_letter
+
+
+@dataclass
+class ReplayResult:
+    thresholds: np.ndarray      # (T,)
+    override: np.ndarray        # (N, T) bool: GEPA's answer replaces SR's
+    correct: np.ndarray         # (N, T) int
+    skipped: np.ndarray         # (N,) bool: gating skips the GEPA review
+    missing_gepa: np.ndarray    # (N,) bool: review would run but was not recorded
+    tokens: np.ndarray          # (N,) tokens_out under this gating config
+    correct_sr: np.ndarray      # (N,) int
+    correct_gepa: np.ndarray    # (N,) int
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """One stats dict per threshold, matching the accuracy/override stats of a live run."""
+        n = len(self.skipped)
+        overrides = self.override.sum(axis=0)
+        successful = (self.override & (self.correct_gepa[:, None] == 1)).sum(axis=0)
+        harmful = (self.override & (self.correct_sr[:, None] == 1) & (self.correct_gepa[:, None] == 0)).sum(axis=0)
+        accuracy = self.correct.mean(axis=0) if n else np.zeros(len(self.thresholds))
+        out = []
+        for t, thr in enumerate(self.thresholds):
+            out.append({
+                "threshold": float(thr),
+                "accuracy": float(accuracy[t]),
+                "avg_tokens_out": float(self.tokens.mean()) if n else None,
+                "total_examples": n,
+                "overrides": int(overrides[t]),
+                "successful_overrides": int(successful[t]),
+                "harmful_overrides": int(harmful[t]),
+                "override_success_rate": float(successful[t] / overrides[t]) if overrides[t] else 0.0,
+                "skipped_gepa": int(self.skipped.sum()),
+                "gepa_skip_rate": float(self.skipped.mean()) if n else 0.0,
+                "missing_gepa": int(self.missing_gepa.sum()),
+            })
+        return out
+
+
+def load_records(path: str | pathlib.Path) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(l) for l in f if l.strip()]
+
+
+def _allowed_letters(row: Dict[str, Any]) -> set[str]:
+    # Hybrid prompts end with "Allowed answer letters: A, B, C, D"
+    m = re.search(r"Allowed answer letters:\s*([A-J](?:\s*[,/]\s*[A-J])*)", row.get("prompt_rendered") or "")
+    if not m:
+        return set("ABCDEFGHIJ")
+    return set(re.findall(r"[A-J]", m.group(1)))
+
+
+def _correct(text: str, gold: str) -> int:
+    answer = parse_answer_letter(text)
+    return int(answer is not None and answer == gold and format_violation(text) is None)
+
+
+def replay(records: List[Dict[str, Any]], thresholds: List[float], threshold_config: Dict[str, Any] | None = None) -> ReplayResult:
+    """Replay the hybrid decision for every record under every threshold in one pass.
+
+    threshold_config supplies the gating, keyword and invalidation settings (as built by
+    threshold_config_from_cfg); its confidence_threshold is ignored in favour of `thresholds`.
+    Records whose GEPA review was skipped at record time fall back to SR if the replayed
+    gating would run it, and are counted in missing_gepa. Failed (error) records are ignored.
+    """
+    cfg = threshold_config or {}
+    records = [r for r in records if not r.get("error")]
+    thr = np.asarray(thresholds, dtype=float)
+    n = len(records)
+    conf = np.zeros(n)
+    eligible = np.zeros(n, dtype=bool)      # GEPA changed to a valid letter (and invalidated SR if required)
+    skipped = np.zeros(n, dtype=bool)
+    missing = np.zeros(n, dtype=bool)
+    correct_sr = np.zeros(n, dtype=int)
+    correct_gepa = np.zeros(n, dtype=int)
+    tokens = np.zeros(n)
+    require_invalidation = cfg.get('explicit_invalidation_required', True)
+
+    for i, row in enumerate(records):
+        usage = row.get("usage") or {}
+        sr_text = usage.get("sr_output") or ""
+        gepa_text = usage.get("gepa_output") or ""
+        gold = row["answer_gold"]
+        recorded_gepa = not usage.get("gepa_skipped", False) and bool(gepa_text)
+
+        correct_sr[i] = _correct(sr_text, gold)
+        skipped[i] = bool(gepa_skip_reasons(sr_text, cfg))
+        missing[i] = not skipped[i] and not recorded_gepa
+        gepa_usage = usage.get("gepa_call") if not skipped[i] and recorded_gepa else None
+        tokens[i] = hybrid_token_totals(usage.get("sr_call"), gepa_usage)[2]
+        if skipped[i] or missing[i]:
+            continue
+
+        correct_gepa[i] = _correct(gepa_text, gold)
+        sr_answer = parse_answer_letter(sr_text)
+        gepa_answer = parse_answer_letter(gepa_text)
+        conf[i] = calculate_gepa_confidence(gepa_text, sr_text, sr_answer, gepa_answer)
+        eligible[i] = (gepa_answer is not None and gepa_answer != sr_answer
+                       and gepa_answer in _allowed_letters(row)
+                       and (not require_invalidation or has_explicit_invalidation(gepa_text, cfg)))
+
+    override = eligible[:, None] & (conf[:, None] >= thr[None, :])
+    correct = np.where(override, correct_gepa[:, None], correct_sr[:, None])
+    return ReplayResult(thresholds=thr, override=override, correct=correct, skipped=skipped,
+                        missing_gepa=missing, tokens=tokens, correct_sr=correct_sr, correct_gepa=correct_gepa)
+
+
+def replay_grid(records: List[Dict[str, Any]], thresholds: List[float], variants: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Replay each named threshold_config variant (keyword sets, gating rules) over all thresholds."""
+    rows = []
+    for name, cfg in variants.items():
+        for stats in replay(records, thresholds, cfg).summary():
+            rows.append({"variant": name, **stats})
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay hybrid threshold decisions from recorded runs (no API calls)")
+    ap.add_argument("--run_dir", type=str, required=True, help="hybrid run directory containing <split>/records.jsonl")
+    ap.add_argument("--config", type=str, default="configs/threshold_experiments.yaml")
+    ap.add_argument("--thresholds", type=float, nargs="*", help="defaults to the config's confidence levels")
+    ap.add_argument("--variants", type=str, help="YAML mapping variant name -> threshold_config overrides")
+    ap.add_argument("--splits", type=str, nargs="*", default=["dev", "test"])
+    ap.add_argument("--out", type=str, help="defaults to <run_dir>/replay.json")
+    args = ap.parse_args()
+
+    cfg = yaml.safe_load(open(args.config))
+    base_cfg = threshold_config_from_cfg(cfg)
+    thresholds = args.thresholds
+    if not thresholds:
+        th = cfg.get("thresholds", {})
+        thresholds = th.get("dataset_specific", {}).get(cfg["dataset"]["name"], th.get("confidence_levels", [0.80]))
+    variants = {"config": base_cfg}
+    if args.variants:
+        for name, overrides in (yaml.safe_load(open(args.variants)) or {}).items():
+            variants[name] = {**base_cfg, **(overrides or {})}
+
+    run_dir = pathlib.Path(args.run_dir)
+    results = {}
+    for split in args.splits:
+        rec_path = run_dir / split / "records.jsonl"
+        if not rec_path.exists():
+            continue
+        results[split] = replay_grid(load_records(rec_path), thresholds, variants)
+        for r in results[split]:
+            print(f"{split:5} {r['variant']:12} thr={r['threshold']:.2f} acc={r['accuracy']:.3f} "
+                  f"overrides={r['overrides']} success={r['override_success_rate']:.3f} skip_rate={r['gepa_skip_rate']:.3f}")
+
+    out_path = pathlib.Path(args.out) if args.out else run_dir / "replay.json"
+    with open(out_path, "w") as f:
+        json.dump({"thresholds": list(thresholds), "results": results}, f, indent=2)
+    print("Wrote", out_path)
+
+
+if __name__ == "__main__":
+    main()
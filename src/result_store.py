@@ -0,0 +1,125 @@
+import json, hashlib, sqlite3, threading, time, pathlib
+from typing import Dict, Any, List
+from .utils import BatchedWriter
+
+SCHEMA = """CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    example_id TEXT,
+    strategy TEXT,
+    row TEXT NOT NULL,
+    created_at REAL NOT NULL
+)"""
+
+# Bump when evaluator prompts or record fields change so stale rows stop matching
+STORE_VERSION = 1
+
+
+class ResultStore:
+    """Disk-backed per-example evaluation results.
+
+    Rows are keyed on a SHA-256 of the prompt, the example id and its choice permutation,
+    the strategy, the model settings (provider, model_id, temperature, max_output_tokens,
+    stream_early_stop) and, for hybrid, the threshold config. arun_eval returns stored rows
+    for pairs it has already scored, with result_store_hit set, and only evaluates the rest;
+    failed examples are never stored. New rows are committed in batches by a background
+    writer; flush() waits for them.
+    """
+    stats_key = "result_store"
+
+    def __init__(self, path: str = ".cache/eval_results.sqlite", model: Dict[str, Any] | None = None):
+        self.path = str(path)
+        self.model = dict(model or {})
+        pathlib.Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        # One connection shared across worker threads; the lock serialises access
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        # Rows queued for the writer but not yet committed; lookups see them too
+        self._pending: Dict[str, tuple] = {}
+        self._pending_lock = threading.Lock()
+        self._writer = BatchedWriter(self._write_batch, name="result-store-writer")
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def key(self, prompt: str, ex, strategy: str, threshold_config: Dict[str, Any] | None = None) -> str:
+        fields = {
+            "version": STORE_VERSION,
+            "model": self.model,
+            "strategy": strategy,
+            "example_id": ex.id,
+            "perm": ex.perm,
+            "prompt_sha256": hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+        }
+        if strategy == "hybrid":
+            fields["threshold_config"] = threshold_config or {}
+        return hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Stored rows for whichever of keys are present (key -> row)."""
+        with self._pending_lock:
+            raw = {k: self._pending[k][3] for k in keys if k in self._pending}
+        rest = [k for k in keys if k not in raw]
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(rest), 500):
+                chunk = rest[i:i + 500]
+                q = f"SELECT key, row FROM results WHERE key IN ({','.join('?' * len(chunk))})"
+                raw.update(self._conn.execute(q, chunk))
+        found = {key: json.loads(row) for key, row in raw.items()}
+        with self._pending_lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        for row in found.values():
+            row["result_store_hit"] = True
+        return found
+
+    def put(self, key: str, strategy: str, row: Dict[str, Any]):
+        """Queue row for the writer; returns without touching disk."""
+        if row.get("error"):
+            return
+        stored = {k: v for k, v in row.items() if k != "result_store_hit"}
+        entry = (key, str(row.get("id")), strategy, json.dumps(stored, ensure_ascii=False), time.time())
+        with self._pending_lock:
+            self._pending[key] = entry
+            self.writes += 1
+        self._writer.put(entry)
+
+    def _write_batch(self, entries: List[tuple]):
+        try:
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO results (key, example_id, strategy, row, created_at) VALUES (?, ?, ?, ?, ?)",
+                    entries,
+                )
+                self._conn.commit()
+        finally:
+            with self._pending_lock:
+                for entry in entries:
+                    if self._pending.get(entry[0]) is entry:
+                        del self._pending[entry[0]]
+
+    def flush(self):
+        """Block until every queued row is committed."""
+        self._writer.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+        }
+
+
+def make_result_store(cfg: Dict[str, Any]) -> ResultStore | None:
+    """The store configured under result_store (opt-in), or None."""
+    store_cfg = cfg.get("result_store", {}) or {}
+    if not store_cfg.get("enabled", False):
+        return None
+    m = cfg.get("model", {})
+    model = {k: m.get(k) for k in ("provider", "model_id", "temperature", "max_output_tokens", "stream_early_stop")}
+    return ResultStore(store_cfg.get("path", ".cache/eval_results.sqlite"), model=model)
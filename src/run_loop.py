@@ -1,135 +1,254 @@
-import argparse, yaml, pathlib, shutil, time, json, random
+import argparse, asyncio, yaml, pathlib, shutil, time, json, random
 from typing import List, Dict, Any
 from dotenv import load_dotenv
-from .utils import ensure_dir, seed_everything, timestamp, write_jsonl
-from .evaluator import run_eval, EvalResult, Example
-from .reflect_and_edit import reflect
+from .utils import ensure_dir, config_seed, seed_everything, timestamp, write_jsonl, read_jsonl
+from .evaluator import arun_eval, EvalResult, Example, threshold_config_from_cfg, shuffle_examples
+from .reflect_and_edit import areflect
+from .failure_selection import select_failures, first_failures
 from .pareto import pareto_frontier
+from .racing import arace
+from .result_store import make_result_store
+from .concurrency import make_controller
 from .models.mock_client import MockProvider
 from .models.always_a_client import AlwaysAProvider
-try:
-    from .models.openai_client import OpenAIProvider
-except Exception:
-    OpenAIProvider = None
-try:
-    from .models.anthropic_client import AnthropicProvider
-except Exception:
-    AnthropicProvider = None
+from .models.cached_client import CachedProvider
+from .models.rate_limited_client import RateLimitedProvider
+from .models.resilient_client import RetryingProvider, CircuitBreaker
+from .models.provider import ProviderWrapper, provider_stats, run_and_close
+from .models.shared_client import SharedCallProvider
+# Provider SDKs (openai, anthropic) are imported in make_base_provider, only for the provider selected
 
 from .data_loader import load_synthetic, load_race, load_arc, load_mmlu, load_mmlu_pro, load_truthfulqa_mc, load_openbookqa, load_gpqa_diamond, load_agieval_lsat_ar, load_agieval_lsat_lr, load_agieval_sat_math, load_logiqa2, load_truthfulqa_official
 from pathlib import Path
 
-def make_provider(cfg):
+def make_base_provider(cfg):
     prov = cfg["model"]["provider"]
     mid = cfg["model"]["model_id"]
     temp = cfg["model"]["temperature"]
     max_toks = cfg["model"]["max_output_tokens"]
     tout = cfg["model"]["request_timeout"]
+    early_stop = cfg["model"].get("stream_early_stop", False)
     if prov == "mock":
         return MockProvider()
     if prov == "always_a":
         return AlwaysAProvider()
-    if prov == "openai" and OpenAIProvider is not None:
-        return OpenAIProvider(model_id=mid, temperature=temp, max_output_tokens=max_toks, request_timeout=tout)
-    if prov == "anthropic" and AnthropicProvider is not None:
-        return AnthropicProvider(model_id=mid, temperature=temp, max_output_tokens=max_toks, request_timeout=tout)
-    raise ValueError(f"Unknown or unavailable provider: {prov}")
+    if prov == "openai":
+        from .models.openai_client import OpenAIProvider
+        return OpenAIProvider(model_id=mid, temperature=temp, max_output_tokens=max_toks, request_timeout=tout,
+                              stream_early_stop=early_stop)
+    if prov == "anthropic":
+        from .models.anthropic_client import AnthropicProvider
+        return AnthropicProvider(model_id=mid, temperature=temp, max_output_tokens=max_toks, request_timeout=tout,
+                                 stream_early_stop=early_stop)
+    raise ValueError(f"Unknown provider: {prov}")
+
+def make_provider(cfg):
+    provider = make_base_provider(cfg)
+    rpm = cfg["model"].get("rpm")
+    tpm = cfg["model"].get("tpm")
+    if rpm or tpm:
+        # Stay under the API key's requests/tokens-per-minute quota
+        provider = RateLimitedProvider(provider, rpm=rpm, tpm=tpm)
+    # Retry transient errors outside the rate limiter so every attempt is paced
+    retry_cfg = cfg["model"].get("retry", {}) or {}
+    breaker_cfg = cfg["model"].get("circuit_breaker", {}) or {}
+    provider = RetryingProvider(
+        provider,
+        max_attempts=retry_cfg.get("max_attempts", 5),
+        base_delay_sec=retry_cfg.get("base_delay_sec", 1.0),
+        max_delay_sec=retry_cfg.get("max_delay_sec", 60.0),
+        breaker=CircuitBreaker(
+            window=breaker_cfg.get("window", 20),
+            error_rate=breaker_cfg.get("error_rate", 0.5),
+            min_calls=breaker_cfg.get("min_calls", 10),
+            cooldown_sec=breaker_cfg.get("cooldown_sec", 30.0),
+        ),
+    )
+    cache_cfg = cfg.get("cache", {})
+    if cache_cfg.get("enabled", False):
+        # Opt-in: reuse stored responses for identical (provider, model, sampling, prompt) calls
+        provider = CachedProvider(provider, path=cache_cfg.get("path", ".cache/llm_responses.sqlite"), provider_name=cfg["model"]["provider"])
+    return provider
 
 def load_split(cfg, split):
     name = cfg["dataset"]["name"]
     n = cfg["dataset"][f"n_{split}"]
+    # Normalized rows are cached here per dataset/config/split; warm runs skip the HF load
+    cache_dir = cfg["dataset"].get("cache_dir")
+    # Loaders draw a seeded index sample and only decode the rows it selects
+    seed = config_seed(cfg)
     if name == "synthetic":
         path = Path("sample_data") / f"synthetic_{split}.jsonl"
         items = load_synthetic(path)
     elif name == "race":
         subset = cfg["dataset"]["subset"]
-        items = load_race(split, subset, n)
+        items = load_race(split, subset, n, seed=seed, cache_dir=cache_dir)
     elif name == "arc_easy":
-        items = load_arc(split, "easy", n)
+        items = load_arc(split, "easy", n, seed=seed, cache_dir=cache_dir)
     elif name == "arc_challenge":
-        items = load_arc(split, "challenge", n)
+        items = load_arc(split, "challenge", n, seed=seed, cache_dir=cache_dir)
     elif name == "mmlu":
         # Default to challenging subjects if not specified
         subjects = ["high_school_physics", "high_school_chemistry", "high_school_biology", 
                    "college_mathematics", "formal_logic"]
-        items = load_mmlu(subjects, split, n)
+        items = load_mmlu(subjects, split, n, seed=seed, cache_dir=cache_dir)
     elif name == "mmlu_pro":
-        items = load_mmlu_pro(split, n)
+        items = load_mmlu_pro(split, n, seed=seed, cache_dir=cache_dir)
     elif name == "truthfulqa_mc":
-        items = load_truthfulqa_mc(split, n)
+        items = load_truthfulqa_mc(split, n, seed=seed, cache_dir=cache_dir)
     elif name == "openbookqa":
-        items = load_openbookqa(split, n)
+        items = load_openbookqa(split, n, seed=seed, cache_dir=cache_dir)
     elif name == "gpqa_diamond":
-        items = load_gpqa_diamond(split, n)
+        items = load_gpqa_diamond(split, n, seed=seed, cache_dir=cache_dir)
     elif name == "agieval_lsat_ar":
-        items = load_agieval_lsat_ar(split, n)
+        items = load_agieval_lsat_ar(split, n, seed=seed, cache_dir=cache_dir)
     elif name == "agieval_lsat_lr":
-        items = load_agieval_lsat_lr(split, n)
+        items = load_agieval_lsat_lr(split, n, seed=seed, cache_dir=cache_dir)
     elif name == "agieval_sat_math":
-        items = load_agieval_sat_math(split, n)
+        items = load_agieval_sat_math(split, n, seed=seed, cache_dir=cache_dir)
     elif name == "logiqa2":
-        items = load_logiqa2(split, n)
+        items = load_logiqa2(split, n, seed=seed, cache_dir=cache_dir)
     elif name == "truthfulqa_official":
-        items = load_truthfulqa_official(split, n)
+        items = load_truthfulqa_official(split, n, seed=seed, cache_dir=cache_dir)
     else:
         raise ValueError(f"Unknown dataset: {name}")
-    # Cast to evaluator.Example
-    return [Example(id=ex.id, context=ex.context, question=ex.question, choices=ex.choices, answer=ex.answer) for ex in items[:n]]
+    # Cast to evaluator.Example, with choices in their stable per-split display order
+    examples = [Example(id=ex.id, context=ex.context, question=ex.question, choices=ex.choices, answer=ex.answer) for ex in items[:n]]
+    perm_path = Path(cache_dir) / "permutations" / f"{name}__{split}__seed{seed}.json" if cache_dir else None
+    return shuffle_examples(examples, seed=seed, path=perm_path)
 
 def save_prompt(path, text):
     Path(path).parent.mkdir(parents=True, exist_ok=True)
     with open(path, "w", encoding="utf-8") as f:
         f.write(text)
 
-def main():
-    # Load environment variables from .env file
-    load_dotenv()
-    
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--config", type=str, default="configs/config.yaml")
-    ap.add_argument("--mode", type=str, choices=["baseline","self_refine","gepa","distill_from_self_refine","hybrid"], default="baseline")
-    args = ap.parse_args()
-    cfg = yaml.safe_load(open(args.config))
-    seed_everything(cfg.get("seed", 42))
+def split_summary(split: str, res: EvalResult) -> Dict[str, Any]:
+    """The <split>_* fields a mode summary reports for one evaluated split."""
+    out = {
+        f"{split}_accuracy": res.accuracy,
+        f"{split}_avg_tokens_out": res.avg_tokens_out,
+        f"{split}_avg_latency_sec": res.avg_latency_sec,
+        f"{split}_errors": res.n_errors,
+    }
+    if res.stage_metrics is not None:
+        out[f"{split}_pipeline"] = res.stage_metrics
+    return out
+
+async def aeval_splits(provider, prompt: str, splits: Dict[str, List[Example]], out_dir: Path, **eval_kwargs) -> Dict[str, EvalResult]:
+    """Evaluate independent splits concurrently into out_dir/<split>.
+
+    Records stream to disk per split as usual, and each split's summary.json is written as
+    soon as that split finishes. max_concurrency (or the shared controller window) applies
+    per split.
+    """
+    async def _one(split, examples):
+        res = await arun_eval(provider, prompt, examples, out_dir=str(out_dir / split), **eval_kwargs)
+        with open(out_dir / split / "summary.json", "w") as f:
+            json.dump(split_summary(split, res), f, indent=2)
+        print(f"Finished {split}: accuracy {res.accuracy:.3f} ({res.n_errors} errors)")
+        return split, res
+    return dict(await asyncio.gather(*[_one(split, examples) for split, examples in splits.items()]))
+
+async def aeval_prompts(provider, prompts: Dict[str, tuple[str, Path]], examples: List[Example], **eval_kwargs) -> Dict[str, EvalResult]:
+    """Evaluate several prompts (name -> (prompt, out_dir)) on the same examples concurrently.
+
+    Their requests interleave on one event loop and every evaluation keeps max_concurrency
+    examples in flight; pass the run's SharedCallProvider (see arun_mode) to cap provider
+    calls across all of them. Returns once all finish.
+    """
+    async def _one(name, prompt, vdir):
+        return name, await arun_eval(provider, prompt, examples, out_dir=str(vdir), **eval_kwargs)
+    return dict(await asyncio.gather(*[_one(name, prompt, vdir) for name, (prompt, vdir) in prompts.items()]))
+
+async def ascore_variants(provider, prompts: Dict[str, tuple[str, Path]], dev: List[Example], round_dir: Path, racing: Dict[str, Any],
+                          resume: bool = False, **eval_kwargs) -> tuple[Dict[str, EvalResult], List[str] | None]:
+    """Score prompt variants on dev; returns the fully evaluated ones and, when racing, the eliminated names.
+
+    With racing.enabled, variants race on growing dev prefixes and only survivors reach the
+    full dev set; the race log goes to round_dir/racing.json.
+    """
+    if not racing.get("enabled", False):
+        return await aeval_prompts(provider, prompts, dev, resume=resume, **eval_kwargs), None
+    # Successive halving: only variants not statistically dominated on a dev prefix reach the full dev set
+    async def _evaluate(names, n, rung_resume):
+        return await aeval_prompts(provider, {name: prompts[name] for name in names}, dev[:n], resume=rung_resume, **eval_kwargs)
+    results, race_log = await arace(_evaluate, list(prompts), [ex.id for ex in dev], min_batch=racing.get("min_batch", 8), eta=racing.get("eta", 2),
+                                    confidence=racing.get("confidence", 0.95), token_slack=racing.get("token_slack", 0.1), resume=resume)
+    with open(round_dir / "racing.json", "w") as f:
+        json.dump(race_log, f, indent=2)
+    print(f"Racing: {len(results)}/{len(prompts)} variants reached full dev; {race_log['calls_saved']} of {race_log['calls_full_evaluation']} calls saved")
+    return results, [e["name"] for e in race_log["eliminated"]]
 
-    runs_dir = Path(cfg["logging"]["runs_dir"])
-    run_id = timestamp() + f"_{args.mode}"
-    out_dir = runs_dir / run_id
+def failed_rows(records_path: str | Path, examples: List[Example]) -> List[Dict[str, Any]]:
+    """Wrong answers from a records file, enriched with the question text to reflect on; failed calls are skipped."""
+    by_id = {ex.id: ex for ex in examples}
+    rows = []
+    for row in read_jsonl(records_path):
+        ex = by_id.get(row["id"])
+        if ex is None or row.get("error") or row["correct"] != 0:
+            continue
+        row["context"] = ex.context
+        row["question"] = ex.question
+        row["choices_parsed"] = ex.choices
+        rows.append(row)
+    return rows
+
+def new_run_dir(cfg: Dict[str, Any], mode: str, runs_dir: str | Path | None = None) -> Path:
+    """Create <runs_dir>/<timestamp>_<mode> and snapshot cfg into it."""
+    out_dir = Path(runs_dir or cfg["logging"]["runs_dir"]) / (timestamp() + f"_{mode}")
     ensure_dir(out_dir)
+    with open(out_dir / "config.yaml", "w") as f:
+        yaml.safe_dump(cfg, f, sort_keys=False)
+    return out_dir
+
+async def arun_mode(cfg: Dict[str, Any], mode: str, out_dir: Path, provider, controller=None, resume: bool = False,
+                    splits: tuple[List[Example], List[Example], List[Example]] | None = None) -> Dict[str, Any] | None:
+    """Run one mode into out_dir and write its summary.json; returns the summary (None if GEPA found no variant).
 
+    splits is (train, dev, test) when the caller already loaded them; the provider stack and
+    controller may be shared with other runs on the same event loop.
+    """
     base_prompt = Path("src/base_tutor_prompt.txt").read_text(encoding="utf-8")
     save_prompt(out_dir / "base_prompt.txt", base_prompt)
 
-    provider = make_provider(cfg)
+    max_conc = cfg.get("evaluation", {}).get("max_concurrency", 1)
+    # Global cap on provider calls when several evaluations run at once (prompt variants)
+    max_in_flight = cfg.get("evaluation", {}).get("max_in_flight")
+    # One wrapper per run for the concurrent variant evaluations (GEPA, distill), so the cap
+    # spans all of them and its shared_calls stats land in summary.json; the AIMD controller
+    # already bounds in-flight calls when one is passed
+    variant_provider = provider
+    if max_in_flight and controller is None:
+        variant_provider = SharedCallProvider(provider, max_in_flight=max_in_flight)
+    # Per-example results already scored for the same prompt and settings are reused (opt-in)
+    store = make_result_store(cfg)
 
-    train = load_split(cfg, "train")
-    dev = load_split(cfg, "dev")
-    test = load_split(cfg, "test")
+    if splits is None:
+        splits = tuple([await asyncio.to_thread(load_split, cfg, split) for split in ("train", "dev", "test")])
+    train, dev, test = splits
 
-    if args.mode in ["baseline", "self_refine"]:
-        strat = "baseline" if args.mode=="baseline" else "self_refine"
-        res_dev = run_eval(provider, base_prompt, dev, strategy=strat, self_refine_steps=cfg["evaluation"]["self_refine_steps"], out_dir=str(out_dir / "dev"))
-        res_test = run_eval(provider, base_prompt, test, strategy=strat, self_refine_steps=cfg["evaluation"]["self_refine_steps"], out_dir=str(out_dir / "test"))
-        summary = {
-            "mode": args.mode,
-            "dev_accuracy": res_dev.accuracy,
-            "dev_avg_tokens_out": res_dev.avg_tokens_out,
-            "dev_avg_latency_sec": res_dev.avg_latency_sec,
-            "test_accuracy": res_test.accuracy,
-            "test_avg_tokens_out": res_test.avg_tokens_out,
-            "test_avg_latency_sec": res_test.avg_latency_sec,
-        }
+    if mode in ["baseline", "self_refine"]:
+        strat = "baseline" if mode=="baseline" else "self_refine"
+        # dev and test are independent: evaluate them concurrently
+        res = await aeval_splits(provider, base_prompt, {"dev": dev, "test": test}, out_dir, strategy=strat, self_refine_steps=cfg["evaluation"]["self_refine_steps"], max_concurrency=max_conc, resume=resume, controller=controller, store=store)
+        summary = {"mode": mode, **split_summary("dev", res["dev"]), **split_summary("test", res["test"])}
+        summary.update(provider_stats(provider))
+        if store is not None:
+            summary["result_store"] = store.stats()
+        if controller is not None:
+            summary["adaptive_concurrency"] = controller.stats()
         with open(out_dir / "summary.json", "w") as f:
             json.dump(summary, f, indent=2)
         print("Wrote", out_dir)
+        return summary
 
-    elif args.mode == "distill_from_self_refine":
+    elif mode == "distill_from_self_refine":
         # Distill Self-Refine behavior into a single-call prompt (TRAINING TIME ONLY)
         print("Running distillation from Self-Refine...")
         
         # TRAINING PHASE: Run Self-Refine on dev to collect correct examples and their revisions
         print("Phase 1: Collecting Self-Refine traces...")
-        res_dev = run_eval(provider, base_prompt, dev, strategy="self_refine", self_refine_steps=cfg["evaluation"]["self_refine_steps"], out_dir=str(out_dir / "training" / "self_refine"))
+        res_dev = await arun_eval(provider, base_prompt, dev, strategy="self_refine", self_refine_steps=cfg["evaluation"]["self_refine_steps"], out_dir=str(out_dir / "training" / "self_refine"), max_concurrency=max_conc, resume=resume, controller=controller, store=store)
         
         # Load Self-Refine records to analyze successful corrections
         dev_records = [json.loads(l) for l in open(out_dir / "training" / "self_refine" / "records.jsonl", "r")]
@@ -154,32 +273,43 @@ Focus on:
 
 IMPORTANT: Preserve the final-line format requirement. Output only the rules, one per line, starting with "- "."""
         
-        distill_result = provider.generate(distill_prompt)
+        rules_path = out_dir / "training" / "distilled_rules.txt"
+        if resume and rules_path.exists():
+            # Reuse the rules the partial variant evaluations were built from
+            distill_result = None
+            distilled_rules = rules_path.read_text(encoding="utf-8")
+        else:
+            distill_result = await provider.agenerate(distill_prompt)
+            distilled_rules = distill_result.text.strip()
+            save_prompt(rules_path, distilled_rules)
         
         # TRAINING PHASE: Build prompt variants by appending distilled rules
         print("Phase 3: Building prompt variants...")
-        distilled_rules = distill_result.text.strip()
         
         # Create 2-4 variants with different rule combinations
         rules_lines = [line.strip() for line in distilled_rules.split('\n') if line.strip().startswith('-')]
-        variants = []
+        prompts, variant_rules = {}, {}
         
         for i in range(min(3, len(rules_lines))):
-            variant_rules = rules_lines[:i+1]
-            variant_prompt = base_prompt + "\n\nDISTILLED RULES:\n" + "\n".join(variant_rules)
+            name = chr(ord('A')+i)
+            variant_rules[name] = rules_lines[:i+1]
+            variant_prompt = base_prompt + "\n\nDISTILLED RULES:\n" + "\n".join(variant_rules[name])
             
-            vdir = out_dir / "training" / f"variant_{chr(ord('A')+i)}"
+            vdir = out_dir / "training" / f"variant_{name}"
             save_prompt(vdir / "prompt.txt", variant_prompt)
-            
-            # Evaluate variant on dev (single call only)
-            res = run_eval(provider, variant_prompt, dev, strategy="baseline", out_dir=str(vdir / "dev"))
+            prompts[name] = (variant_prompt, vdir / "dev")
+        
+        # Evaluate all variants on dev concurrently (single call only)
+        results = await aeval_prompts(variant_provider, prompts, dev, strategy="baseline", max_concurrency=max_conc, resume=resume, controller=controller, store=store)
+        variants = []
+        for name, res in results.items():
             variants.append({
-                "name": chr(ord('A')+i),
+                "name": name,
                 "accuracy": res.accuracy,
                 "avg_tokens_out": res.avg_tokens_out if res.avg_tokens_out is not None else 0.0,
                 "avg_latency_sec": res.avg_latency_sec,
-                "prompt_path": str(vdir / "prompt.txt"),
-                "rules": variant_rules
+                "prompt_path": str(out_dir / "training" / f"variant_{name}" / "prompt.txt"),
+                "rules": variant_rules[name]
             })
         
         # TRAINING PHASE: Pareto-select best variant
@@ -199,11 +329,11 @@ IMPORTANT: Preserve the final-line format requirement. Output only the rules, on
         # INFERENCE PHASE: Evaluate best distilled prompt on test (single call only)
         print("Phase 5: Evaluating distilled prompt on test...")
         best_prompt = Path(best["prompt_path"]).read_text(encoding="utf-8")
-        res_test = run_eval(provider, best_prompt, test, strategy="baseline", out_dir=str(out_dir / "test"))
+        res_test = await arun_eval(provider, best_prompt, test, strategy="baseline", out_dir=str(out_dir / "test"), max_concurrency=max_conc, resume=resume, controller=controller, store=store)
         
         # Calculate training overhead
         training_tokens = sum([
-            distill_result.usage.get("total_tokens", 0) if hasattr(distill_result, 'usage') else 0
+            distill_result.usage.get("total_tokens", 0) if distill_result is not None else 0
         ])
         
         summary = {
@@ -214,122 +344,211 @@ IMPORTANT: Preserve the final-line format requirement. Output only the rules, on
             "test_accuracy": res_test.accuracy,
             "test_avg_tokens_out": res_test.avg_tokens_out,
             "test_avg_latency_sec": res_test.avg_latency_sec,
+            "test_errors": res_test.n_errors,
             "training_tokens_total": training_tokens,
             "best_variant": best["name"],
             "distilled_rules": best["rules"]
         }
+        summary.update(provider_stats(variant_provider))
+        if store is not None:
+            summary["result_store"] = store.stats()
+        if controller is not None:
+            summary["adaptive_concurrency"] = controller.stats()
         with open(out_dir / "summary.json", "w") as f:
             json.dump(summary, f, indent=2)
         print("Wrote", out_dir)
+        return summary
 
-    elif args.mode == "gepa":
-        # Round 0: baseline on dev to collect failures
-        base_dev = run_eval(provider, base_prompt, dev, strategy="baseline", out_dir=str(out_dir / "round0" / "dev"))
-        # Load records; enrich with question data for reflection
-        dev_records = [json.loads(l) for l in open(out_dir / "round0" / "dev" / "records.jsonl", "r")]
-        # enrich with text to reflect on (choices, etc.)
-        enriched = []
-        for ex, row in zip(dev, dev_records):
-            row["context"] = ex.context
-            row["question"] = ex.question
-            row["choices_parsed"] = ex.choices
-            enriched.append(row)
-        failed = [r for r in enriched if r["correct"] == 0]
-        # Reflect to propose edits
+    elif mode == "gepa":
         ge_cfg = cfg["gepa"]
-        data = reflect(provider, failed_rows=failed[:ge_cfg["num_reflection_examples"]], num_edits=ge_cfg["num_edits"], out_path=str(out_dir / "round1" / "reflection.json"), base_prompt=base_prompt)
-        edits = data.get("edits", [])
-        # Materialize variants
-        variants = []
-        for i, e in enumerate(edits):
-            name = e.get("name", chr(ord('A')+i))
-            text = e.get("text","").strip()
-            if not text: 
-                continue
-            variant_prompt = base_prompt + "\n\n" + text
-            vdir = out_dir / "round1" / f"variant_{name}"
-            save_prompt(vdir / "prompt.txt", variant_prompt)
-            res = run_eval(provider, variant_prompt, dev, strategy="baseline", out_dir=str(vdir / "dev"))
-            variants.append({
-                "name": name,
-                "accuracy": res.accuracy,
-                "avg_tokens_out": res.avg_tokens_out if res.avg_tokens_out is not None else 0.0,
-                "avg_latency_sec": res.avg_latency_sec,
-                "prompt_path": str(vdir / "prompt.txt")
-            })
-        # Pareto filter
-        frontier = pareto_frontier(variants, x_key=cfg["gepa"]["pareto_metric_x"], y_key=cfg["gepa"]["pareto_metric_y"])
-        with open(out_dir / "round1" / "variants.json", "w") as f:
-            json.dump({"variants": variants, "pareto": frontier}, f, indent=2)
+        x_key, y_key = ge_cfg["pareto_metric_x"], ge_cfg["pareto_metric_y"]
+        reflection_cfg = ge_cfg.get("reflection", {}) or {}
+        selection_cfg = ge_cfg.get("failure_selection", {}) or {}
+        # Round 0: baseline on dev to collect failures
+        base_dev = await arun_eval(provider, base_prompt, dev, strategy="baseline", out_dir=str(out_dir / "round0" / "dev"), max_concurrency=max_conc, resume=resume, controller=controller, store=store)
+        # Candidate pool across rounds. Prompts already scored are never evaluated again and
+        # their dev records are reused for reflection; the base prompt seeds round 1 only.
+        pool, rounds, frontier = [], [], []
+        records = {"base": base_dev.records_path}
+        prompt_paths = {"base": str(out_dir / "base_prompt.txt")}
+        seen = {base_prompt}
+        parents, expanded = ["base"], set()
+        stop_reason = "max_rounds"
+        for rnd in range(1, max(1, ge_cfg.get("max_rounds", 1)) + 1):
+            round_dir = out_dir / f"round{rnd}"
+
+            async def _reflect(parent):
+                reflection_path = round_dir / ("reflection.json" if parent == "base" else f"reflection_{parent}.json")
+                if resume and reflection_path.exists():
+                    # Reuse the edits the partial variant evaluations were built from
+                    return json.load(open(reflection_path))["parsed"]
+                failed = failed_rows(records[parent], dev)
+                if not failed:
+                    # Nothing to reflect on; skip the call
+                    return {"rules": [], "edits": []}
+                # Failures are bounded by the token budget; map-reduce reflection chunks them, so
+                # num_reflection_examples is only an optional cap on top (null = budget only)
+                select = select_failures if selection_cfg.get("method", "diverse") == "diverse" else first_failures
+                select_kwargs = dict(token_budget=selection_cfg.get("token_budget", 24000),
+                                     max_context_tokens=reflection_cfg.get("max_context_tokens", 400),
+                                     model_id=getattr(provider, "model_id", None))
+                if select is select_failures:
+                    # Most diverse failures first (TF-IDF farthest-point sampling)
+                    select_kwargs["dims"] = selection_cfg.get("dims", 512)
+                failed = await asyncio.to_thread(select, failed, ge_cfg.get("num_reflection_examples"), **select_kwargs)
+                parent_prompt = Path(prompt_paths[parent]).read_text(encoding="utf-8")
+                return await areflect(provider, failed_rows=failed, num_edits=ge_cfg["num_edits"], out_path=str(reflection_path), base_prompt=parent_prompt,
+                                      chunk_tokens=reflection_cfg.get("chunk_tokens", 6000), max_context_tokens=reflection_cfg.get("max_context_tokens", 400),
+                                      max_output_tokens=reflection_cfg.get("max_output_tokens", 2048))
+
+            # Reflect on the failures of frontier candidates not expanded yet, concurrently
+            reflections = await asyncio.gather(*[_reflect(parent) for parent in parents])
+            # Materialize variants: each edit is appended to the prompt it was reflected on
+            prompts, lineage = {}, {}
+            for parent, data in zip(parents, reflections):
+                parent_prompt = Path(prompt_paths[parent]).read_text(encoding="utf-8")
+                for i, e in enumerate(data.get("edits", [])):
+                    name = e.get("name", chr(ord('A')+i))
+                    text = e.get("text","").strip()
+                    if not text: 
+                        continue
+                    if parent != "base":
+                        name = f"{parent}.{name}"
+                    if name in prompts or name in prompt_paths:
+                        # Variants are evaluated concurrently, so each needs its own directory
+                        name = f"{name}_{i}"
+                    variant_prompt = parent_prompt + "\n\n" + text
+                    if variant_prompt in seen:
+                        continue
+                    seen.add(variant_prompt)
+                    vdir = round_dir / f"variant_{name}"
+                    save_prompt(vdir / "prompt.txt", variant_prompt)
+                    prompts[name] = (variant_prompt, vdir / "dev")
+                    lineage[name] = parent
+            expanded.update(parents)
+            if not prompts:
+                stop_reason = "no_new_variants"
+                break
+            # Evaluate the new variants on dev concurrently (racing them when enabled)
+            results, eliminated = await ascore_variants(variant_provider, prompts, dev, round_dir, ge_cfg.get("racing", {}) or {}, resume=resume,
+                                                        strategy="baseline", max_concurrency=max_conc, controller=controller, store=store)
+            variants = []
+            for name, res in results.items():
+                variants.append({
+                    "name": name,
+                    "accuracy": res.accuracy,
+                    "avg_tokens_out": res.avg_tokens_out if res.avg_tokens_out is not None else 0.0,
+                    "avg_latency_sec": res.avg_latency_sec,
+                    "prompt_path": str(round_dir / f"variant_{name}" / "prompt.txt"),
+                    "round": rnd,
+                    "parent": lineage[name],
+                })
+                records[name] = res.records_path
+                prompt_paths[name] = variants[-1]["prompt_path"]
+            pool.extend(variants)
+            # Pareto filter over the whole pool
+            previous = {v["name"] for v in frontier}
+            frontier = pareto_frontier(pool, x_key=x_key, y_key=y_key)
+            with open(round_dir / "variants.json", "w") as f:
+                json.dump({"variants": variants, "pareto": frontier, **({"eliminated": eliminated} if eliminated is not None else {})}, f, indent=2)
+            rounds.append({"round": rnd, "parents": parents, "variants": [v["name"] for v in variants], "pareto": [v["name"] for v in frontier]})
+            print(f"GEPA round {rnd}: {len(variants)} new variants, frontier {rounds[-1]['pareto']}")
+            if {v["name"] for v in frontier} == previous:
+                stop_reason = "frontier_converged"
+                break
+            parents = [v["name"] for v in frontier if v["name"] not in expanded]
+        with open(out_dir / "pool.json", "w") as f:
+            json.dump({"candidates": pool, "pareto": frontier, "rounds": rounds, "stop_reason": stop_reason}, f, indent=2)
         # Choose best by accuracy then tokens
-        best = sorted(frontier, key=lambda r: (-r["accuracy"], r["avg_tokens_out"]))[0] if frontier else (sorted(variants, key=lambda r: (-r["accuracy"]))[0] if variants else None)
+        best = sorted(frontier, key=lambda r: (-r["accuracy"], r["avg_tokens_out"]))[0] if frontier else (sorted(pool, key=lambda r: (-r["accuracy"]))[0] if pool else None)
         # Evaluate on test
         if best:
             prompt_text = Path(best["prompt_path"]).read_text(encoding="utf-8")
-            res_test = run_eval(provider, prompt_text, test, strategy="baseline", out_dir=str(out_dir / "round1" / "test"))
+            res_test = await arun_eval(provider, prompt_text, test, strategy="baseline", out_dir=str(out_dir / "test"), max_concurrency=max_conc, resume=resume, controller=controller, store=store)
             summary = {
                 "mode": "gepa",
-                "round1_best": best,
+                "best": best,
+                "rounds": len(rounds),
+                "stop_reason": stop_reason,
                 "test_accuracy": res_test.accuracy,
                 "test_avg_tokens_out": res_test.avg_tokens_out,
                 "test_avg_latency_sec": res_test.avg_latency_sec,
+                "test_errors": res_test.n_errors,
             }
+            summary.update(provider_stats(variant_provider))
+            if store is not None:
+                summary["result_store"] = store.stats()
+            if controller is not None:
+                summary["adaptive_concurrency"] = controller.stats()
             with open(out_dir / "summary.json", "w") as f:
                 json.dump(summary, f, indent=2)
         print("Wrote", out_dir)
+        return summary if best else None
 
-    elif args.mode == "hybrid":
+    elif mode == "hybrid":
         # Hybrid: SR → GEPA Review (2-stage chain) with Enhanced Threshold Management
         print("Running hybrid mode: SR → GEPA Review with Enhanced Threshold Management...")
         
         # Load threshold configuration if available
-        threshold_config = {}
-        if 'thresholds' in cfg:
-            threshold_config = {
-                'confidence_threshold': cfg['thresholds'].get('current_threshold', 0.80),
-                'conditional_gepa_enabled': cfg.get('conditional_gepa', {}).get('enabled', True),
-                'explicit_invalidation_required': cfg.get('explicit_invalidation', {}).get('required', True),
-                'uncertainty_signals': cfg.get('conditional_gepa', {}).get('uncertainty_signals', [
-                    "maybe", "uncertain", "not sure", "could be", "might be", 
-                    "possibly", "i think", "i believe", "seems like", "appears to"
-                ]),
-                'min_tokens': cfg.get('conditional_gepa', {}).get('length_thresholds', {}).get('min_tokens', 30),
-                'max_tokens': cfg.get('conditional_gepa', {}).get('length_thresholds', {}).get('max_tokens', 200),
-                'reasoning_indicators': cfg.get('conditional_gepa', {}).get('reasoning_indicators', [
-                    "because", "since", "as", "due to", "reason", "logic", 
-                    "therefore", "thus", "hence"
-                ]),
-                'invalidation_keywords': cfg.get('explicit_invalidation', {}).get('keywords', [
-                    "incorrect", "wrong", "not supported", "invalid", "false", 
-                    "misleading", "unsupported", "factually wrong", "logically flawed",
-                    "error", "mistake"
-                ])
-            }
-            
+        threshold_config = threshold_config_from_cfg(cfg)
+        if threshold_config:
             print(f"🔧 Threshold Configuration:")
             print(f"   Confidence Threshold: {threshold_config['confidence_threshold']:.2f}")
             print(f"   Conditional GEPA: {'Enabled' if threshold_config['conditional_gepa_enabled'] else 'Disabled'}")
             print(f"   Explicit Invalidation: {'Required' if threshold_config['explicit_invalidation_required'] else 'Optional'}")
         
-        # Attach threshold config to provider for evaluator access
+        # Attach threshold config to this run's view of the provider for evaluator access;
+        # the provider stack itself may be shared with other concurrent runs
+        provider = ProviderWrapper(provider)
         provider.threshold_config = threshold_config
         
-        # Run hybrid evaluation on both dev and test
-        res_dev = run_eval(provider, base_prompt, dev, strategy="hybrid", out_dir=str(out_dir / "dev"))
-        res_test = run_eval(provider, base_prompt, test, strategy="hybrid", out_dir=str(out_dir / "test"))
-        
-        summary = {
-            "mode": "hybrid",
-            "dev_accuracy": res_dev.accuracy,
-            "dev_avg_tokens_out": res_dev.avg_tokens_out,
-            "dev_avg_latency_sec": res_dev.avg_latency_sec,
-            "test_accuracy": res_test.accuracy,
-            "test_avg_tokens_out": res_test.avg_tokens_out,
-            "test_avg_latency_sec": res_test.avg_latency_sec,
-        }
+        # Run hybrid evaluation on dev and test concurrently
+        res = await aeval_splits(provider, base_prompt, {"dev": dev, "test": test}, out_dir, strategy="hybrid", max_concurrency=max_conc, resume=resume, controller=controller, store=store)
+        summary = {"mode": "hybrid", **split_summary("dev", res["dev"]), **split_summary("test", res["test"])}
+        summary.update(provider_stats(provider))
+        if store is not None:
+            summary["result_store"] = store.stats()
+        if controller is not None:
+            summary["adaptive_concurrency"] = controller.stats()
         with open(out_dir / "summary.json", "w") as f:
             json.dump(summary, f, indent=2)
         print("Wrote", out_dir)
+        return summary
+
+    return None
+
+def main():
+    # Load environment variables from .env file
+    load_dotenv()
+    
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--config", type=str, default="configs/config.yaml")
+    modes = ["baseline","self_refine","gepa","distill_from_self_refine","hybrid"]
+    ap.add_argument("--mode", type=str, choices=modes, default="baseline")
+    ap.add_argument("--resume", type=str, default=None, help="finish an interrupted run in this run directory, skipping completed examples")
+    args = ap.parse_args()
+
+    resume = args.resume is not None
+    if resume:
+        # Run directories are named <timestamp>_<mode>; the config snapshot taken at start wins over --config
+        out_dir = Path(args.resume)
+        args.mode = out_dir.name.split("_", 1)[1]
+        if args.mode not in modes:
+            raise ValueError(f"Cannot infer mode from run directory: {out_dir}")
+        snapshot = out_dir / "config.yaml"
+        cfg = yaml.safe_load(open(snapshot if snapshot.exists() else args.config))
+    else:
+        cfg = yaml.safe_load(open(args.config))
+    seed_everything(config_seed(cfg))
+
+    if not resume:
+        out_dir = new_run_dir(cfg, args.mode)
+
+    provider = make_provider(cfg)
+    # One AIMD controller for the whole run, so the learned window carries across evaluations
+    controller = make_controller(cfg.get("evaluation", {}))
+
+    asyncio.run(run_and_close(provider, arun_mode(cfg, args.mode, out_dir, provider, controller=controller, resume=resume)))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,189 @@
+"""
+In-process hybrid threshold sweeps.
+
+Evaluates every confidence threshold for a dataset in one process against one provider
+stack: each split is loaded once and all thresholds run concurrently. SR and GEPA review
+prompts and the conditional gating do not depend on the threshold (only the override
+decision does), so every distinct call is made once and shared by all thresholds.
+Datasets are swept concurrently on the same event loop and share the provider's rate
+limits, retries and response cache.
+
+Run directories are created by the sweep and returned, one per (dataset, threshold):
+
+    <runs_dir>/<timestamp>_sweep/<dataset>/thr_<threshold>/{config.yaml, dev/, test/, summary.json}
+
+    python -m src.sweep --config configs/threshold_experiments.yaml --datasets gpqa_diamond logiqa2
+"""
+import argparse, asyncio, copy, json, pathlib
+from dataclasses import dataclass
+from typing import List, Dict, Any
+import yaml
+from dotenv import load_dotenv
+from .utils import ensure_dir, config_seed, seed_everything, timestamp
+from .evaluator import threshold_config_from_cfg
+from .concurrency import ControlledProvider, make_controller
+from .models.provider import Provider, ProviderWrapper, provider_stats, run_and_close
+from .models.shared_client import SharedCallProvider
+from .result_store import ResultStore, make_result_store
+from .run_loop import make_provider, load_split, aeval_splits, split_summary
+
+
+@dataclass
+class SweepRun:
+    dataset: str
+    threshold: float
+    run_dir: pathlib.Path
+    summary: Dict[str, Any]
+
+
+def thresholds_for(cfg: Dict[str, Any], dataset: str) -> List[float]:
+    """The dataset's entry in thresholds.dataset_specific, else thresholds.confidence_levels."""
+    th = cfg.get("thresholds", {}) or {}
+    return list(th.get("dataset_specific", {}).get(dataset) or th.get("confidence_levels", [0.80]))
+
+
+def dataset_config(cfg: Dict[str, Any], dataset: str, threshold: float | None = None) -> Dict[str, Any]:
+    """A copy of cfg targeting one dataset (and one confidence threshold), runnable by run_loop."""
+    out = copy.deepcopy(cfg)
+    out["dataset"]["name"] = dataset
+    if threshold is not None:
+        out.setdefault("thresholds", {})["current_threshold"] = threshold
+    return out
+
+
+async def asweep_dataset(provider: Provider, cfg: Dict[str, Any], dataset: str, thresholds: List[float],
+                         base_prompt: str, out_dir: str | pathlib.Path, resume: bool = False,
+                         controller=None, store: ResultStore | None = None) -> tuple[List[SweepRun], Dict[str, Any]]:
+    """Sweep one dataset; returns its runs (in threshold order) and its shared-call stats."""
+    ds_cfg = dataset_config(cfg, dataset)
+    # Hybrid only evaluates dev and test; load both once for every threshold. One after the
+    # other, like run_loop: carved splits share a source and its cache file
+    dev = await asyncio.to_thread(load_split, ds_cfg, "dev")
+    test = await asyncio.to_thread(load_split, ds_cfg, "test")
+    max_conc = cfg.get("evaluation", {}).get("max_concurrency", 1)
+    if controller is not None:
+        # Only calls that reach the provider take a controller slot; shared ones just wait
+        provider = ControlledProvider(provider, controller)
+        max_conc = controller.max_window
+    shared = SharedCallProvider(provider, max_in_flight=None if controller is not None else max_conc)
+
+    async def _one(threshold: float) -> SweepRun:
+        run_cfg = dataset_config(cfg, dataset, threshold)
+        run_dir = ensure_dir(pathlib.Path(out_dir) / dataset / f"thr_{threshold:.2f}")
+        with open(run_dir / "config.yaml", "w") as f:
+            yaml.safe_dump(run_cfg, f, sort_keys=False)
+        # Each threshold sees the shared calls through its own threshold_config
+        view = ProviderWrapper(shared)
+        view.threshold_config = threshold_config_from_cfg(run_cfg)
+        res = await aeval_splits(view, base_prompt, {"dev": dev, "test": test}, run_dir, strategy="hybrid", max_concurrency=max_conc, resume=resume, store=store)
+        summary = {"mode": "hybrid", "dataset": dataset, "threshold": threshold,
+                   **split_summary("dev", res["dev"]), **split_summary("test", res["test"])}
+        with open(run_dir / "summary.json", "w") as f:
+            json.dump(summary, f, indent=2)
+        return SweepRun(dataset=dataset, threshold=threshold, run_dir=run_dir, summary=summary)
+
+    runs = await asyncio.gather(*[_one(t) for t in thresholds])
+    return list(runs), shared.stats()
+
+
+async def asweep(cfg: Dict[str, Any], datasets: Dict[str, List[float]] | List[str] | None = None,
+                 out_dir: str | pathlib.Path | None = None, resume: bool = False) -> Dict[str, List[SweepRun]]:
+    """Sweep thresholds for several datasets concurrently on one provider stack.
+
+    datasets maps dataset name -> thresholds; a list of names uses thresholds_for(), and None
+    sweeps cfg's own dataset. Results are written under out_dir (a new <timestamp>_sweep
+    directory by default) along with sweep.json. A dataset that fails to load is reported
+    there and maps to an empty list.
+    """
+    if datasets is None:
+        datasets = [cfg["dataset"]["name"]]
+    if not isinstance(datasets, dict):
+        datasets = {name: thresholds_for(cfg, name) for name in datasets}
+    if out_dir is None:
+        # Sweeps started within the same second get distinct directories
+        base = pathlib.Path(cfg["logging"]["runs_dir"]) / (timestamp() + "_sweep")
+        out_dir, n = base, 1
+        while out_dir.exists():
+            n += 1
+            out_dir = base.with_name(f"{base.name}{n}")
+    out_dir = ensure_dir(out_dir)
+    with open(out_dir / "config.yaml", "w") as f:
+        yaml.safe_dump(cfg, f, sort_keys=False)
+    # Record the plan up front so an interrupted sweep can be resumed; completed below
+    report = {"datasets": {name: {"thresholds": list(ths)} for name, ths in datasets.items()}}
+    with open(out_dir / "sweep.json", "w") as f:
+        json.dump(report, f, indent=2)
+
+    base_prompt = pathlib.Path("src/base_tutor_prompt.txt").read_text(encoding="utf-8")
+    provider = make_provider(cfg)
+    controller = make_controller(cfg.get("evaluation", {}))
+    store = make_result_store(cfg)
+
+    names = list(datasets)
+    outcomes = await run_and_close(provider, asyncio.gather(*[asweep_dataset(provider, cfg, name, list(datasets[name]), base_prompt, out_dir,
+                                                                             resume=resume, controller=controller, store=store) for name in names],
+                                                            return_exceptions=True))
+    results: Dict[str, List[SweepRun]] = {}
+    for name, outcome in zip(names, outcomes):
+        if isinstance(outcome, BaseException):
+            print(f"Sweep for {name} failed: {type(outcome).__name__}: {outcome}")
+            results[name] = []
+            report["datasets"][name] = {"thresholds": list(datasets[name]), "error": f"{type(outcome).__name__}: {outcome}"}
+            continue
+        runs, shared_stats = outcome
+        results[name] = runs
+        report["datasets"][name] = {
+            "thresholds": list(datasets[name]),
+            "runs": {f"{r.threshold:.2f}": str(r.run_dir) for r in runs},
+            "shared_calls": shared_stats,
+        }
+    report.update(provider_stats(provider))
+    if store is not None:
+        report["result_store"] = store.stats()
+    if controller is not None:
+        report["adaptive_concurrency"] = controller.stats()
+    with open(out_dir / "sweep.json", "w") as f:
+        json.dump(report, f, indent=2)
+    return results
+
+
+def sweep(cfg: Dict[str, Any], datasets: Dict[str, List[float]] | List[str] | None = None,
+          out_dir: str | pathlib.Path | None = None, resume: bool = False) -> Dict[str, List[SweepRun]]:
+    seed_everything(config_seed(cfg))
+    return asyncio.run(asweep(cfg, datasets, out_dir=out_dir, resume=resume))
+
+
+def main():
+    load_dotenv()
+
+    ap = argparse.ArgumentParser(description="Sweep hybrid confidence thresholds in one process")
+    ap.add_argument("--config", type=str, default="configs/threshold_experiments.yaml")
+    ap.add_argument("--datasets", type=str, nargs="*", help="defaults to the config's dataset")
+    ap.add_argument("--thresholds", type=float, nargs="*", help="defaults to thresholds_for() per dataset")
+    ap.add_argument("--resume", type=str, default=None, help="finish an interrupted sweep in this directory")
+    args = ap.parse_args()
+
+    out_dir = None
+    plan = None
+    if args.resume:
+        # The snapshot and plan written at start win over --config/--datasets
+        out_dir = pathlib.Path(args.resume)
+        snapshot = out_dir / "config.yaml"
+        cfg = yaml.safe_load(open(snapshot if snapshot.exists() else args.config))
+        if (out_dir / "sweep.json").exists():
+            plan = {name: d["thresholds"] for name, d in json.load(open(out_dir / "sweep.json"))["datasets"].items()}
+    else:
+        cfg = yaml.safe_load(open(args.config))
+    if plan is None:
+        names = args.datasets or [cfg["dataset"]["name"]]
+        plan = {name: args.thresholds or thresholds_for(cfg, name) for name in names}
+
+    results = sweep(cfg, plan, out_dir=out_dir, resume=args.resume is not None)
+    for name, runs in results.items():
+        for r in runs:
+            print(f"{name:20} thr={r.threshold:.2f} dev={r.summary['dev_accuracy']:.3f} "
+                  f"test={r.summary['test_accuracy']:.3f} -> {r.run_dir}")
+
+
+if __name__ == "__main__":
+    main()
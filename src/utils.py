@@ -1,4 +1,4 @@
-import os, json, re, time, uuid, pathlib, difflib, random
+import os, json, re, time, uuid, pathlib, difflib, random, queue, threading, atexit
 from typing import Any, Dict, List
 
 def ensure_dir(p: str | pathlib.Path) -> pathlib.Path:
@@ -11,18 +11,104 @@ def write_jsonl(path: str | pathlib.Path, rows: List[Dict[str, Any]]):
         for r in rows:
             f.write(json.dumps(r, ensure_ascii=False) + "\n")
 
+class JsonlAppender:
+    """Append rows to a JSONL file, flushing each one to disk so a crash loses at most the row in flight."""
+    def __init__(self, path: str | pathlib.Path, mode: str = "a"):
+        self.f = open(path, mode, encoding="utf-8")
+
+    def write(self, row: Dict[str, Any]):
+        self.f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class BatchedWriter:
+    """Hands queued items to write_batch on one background thread, many per call.
+
+    put() never blocks on disk, so SQLite-backed stores can be written from the event loop;
+    the thread takes everything queued so far (up to max_batch) per write_batch call, so a
+    burst of rows costs one commit. flush() waits for everything queued so far and also
+    runs at interpreter exit.
+    """
+    def __init__(self, write_batch, max_batch: int = 256, name: str = "batched-writer"):
+        self.write_batch = write_batch
+        self.max_batch = max_batch
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def put(self, item: Any):
+        self._queue.put(item)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.write_batch(batch)
+            except Exception as e:
+                print(f"Batched write of {len(batch)} rows failed ({type(e).__name__}): {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        self._queue.join()
+
+def read_jsonl(path: str | pathlib.Path) -> List[Dict[str, Any]]:
+    """Read a JSONL file, dropping a truncated final line left by an interrupted write."""
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return rows
+
 def parse_answer_letter(text: str) -> str | None:
     # Strict: require explicit 'Answer: <LETTER>' with A-J support
     # No fallback to "last capital letter." If the model doesn't follow the format, it gets scored wrong.
     m = re.search(r"(?im)^\s*Answer\s*:\s*([A-J])\b", text)
     return m.group(1).upper() if m else None
 
+# A complete final answer line: exactly 'Answer: <LETTER>' terminated by a newline
+ANSWER_LINE_RE = re.compile(r"(?im)^[ \t]*Answer[ \t]*:[ \t]*[A-J][ \t]*\r?$\n")
+
+def answer_line_end(text: str) -> int | None:
+    """Offset just past the first complete 'Answer: <LETTER>' line (newline excluded), or None."""
+    m = ANSWER_LINE_RE.search(text)
+    if not m:
+        return None
+    return m.start() + len(m.group(0).rstrip("\r\n"))
+
 def diff_text(a: str, b: str) -> str:
     return "".join(difflib.unified_diff(a.splitlines(True), b.splitlines(True), lineterm=""))
 
 def timestamp() -> str:
     return time.strftime("%Y%m%d-%H%M%S")
 
+DEFAULT_SEED = 42
+
+def config_seed(cfg: Dict[str, Any]) -> int:
+    """The experiment's seed; RNG seeding and dataset sampling must both read it from here."""
+    return cfg.get("seed", DEFAULT_SEED)
+
 def seed_everything(seed: int):
     random.seed(seed)
     try: